@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 
 # On Windows it's easier to use PyMySQL instead of compiling mysqlclient.
 # If PyMySQL is installed, register it as MySQLdb so Django's MySQL backend can import it.
@@ -57,6 +58,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    # Renovación deslizante de la sesión (sustituye a SESSION_SAVE_EVERY_REQUEST)
+    'core.middleware.SessionRefreshMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -68,21 +71,48 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'calidadsoftware.urls'
 
-TEMPLATES = [
-    {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+# Perfil de templates: 'dev' usa APP_DIRS (Django cachea los templates y los
+# recarga al cambiar con el autoreloader) y todos los context processors;
+# 'prod' fija explícitamente el loader cacheado (templates compilados una vez
+# por proceso) y prescinde del processor `request`, que ningún template usa. `auth` se mantiene porque lo exige el admin (admin.E402) y no consulta
+# la BD salvo que un template lea `user`.
+TEMPLATE_PROFILE = os.environ.get('TEMPLATE_PROFILE', 'dev' if DEBUG else 'prod')
+
+_TEMPLATE_CONTEXT_PROCESSORS = [
+    'django.template.context_processors.request',
+    'django.contrib.auth.context_processors.auth',
+    'django.contrib.messages.context_processors.messages',
+    'system.context_processors.session_data',
+]
+_TEMPLATE_LOADERS = ['django.template.loaders.app_directories.Loader']
+
+TEMPLATE_PROFILES = {
+    'dev': {
+        # DjangoTemplates + un span de traza por render (ver core.tracing)
+        'BACKEND': 'core.tracing.TracingDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
-            'context_processors': [
-                'django.template.context_processors.request',
-                'django.contrib.auth.context_processors.auth',
-                'django.contrib.messages.context_processors.messages',
-                'system.context_processors.session_data',
-            ],
+            'context_processors': _TEMPLATE_CONTEXT_PROCESSORS,
         },
     },
-]
+    'prod': {
+        'BACKEND': 'core.tracing.TracingDjangoTemplates',
+        'DIRS': [],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            'context_processors': [cp for cp in _TEMPLATE_CONTEXT_PROCESSORS
+                                   if cp != 'django.template.context_processors.request'],
+            'loaders': [('django.template.loaders.cached.Loader', _TEMPLATE_LOADERS)],
+        },
+    },
+}
+TEMPLATES = [TEMPLATE_PROFILES[TEMPLATE_PROFILE]]
+# Sin el processor `request` el admin desactiva su barra lateral de navegación
+SILENCED_SYSTEM_CHECKS = ['admin.W411'] if TEMPLATE_PROFILE == 'prod' else []
+# Índices parciales de Producto (borrado lógico): MySQL no los admite y Django
+# los omite al migrar; el listado usa allí el índice único de codigo_producto
+SILENCED_SYSTEM_CHECKS += ['models.W037']
 
 WSGI_APPLICATION = 'calidadsoftware.wsgi.application'
 
@@ -105,6 +135,49 @@ DATABASES = {
 }
 
 
+# Cache: el limitador de login (core.throttling) guarda aquí sus contadores.
+# En producción con varios workers debe ser una cache compartida (Redis,
+# Memcached o DatabaseCache); LocMemCache cuenta por proceso.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Límite de intentos de login fallidos por ventana deslizante (segundos)
+LOGIN_THROTTLE_WINDOW_S = 5 * 60
+LOGIN_THROTTLE_MAX_PER_USERNAME = 5
+LOGIN_THROTTLE_MAX_PER_IP = 20
+# Sólo True detrás de un proxy de confianza que fije X-Forwarded-For
+LOGIN_THROTTLE_TRUST_FORWARDED = False
+
+
+# Política de hashing de contraseñas por entorno (variable PASSWORD_HASH_POLICY).
+# El primer hasher de la lista se usa para hashes nuevos; los demás sólo para
+# verificar hashes existentes, que se rehashean al hacer login (Usuario.check_password).
+#   fast   -> MD5, sólo para tests (por defecto con `manage.py test`)
+#   pbkdf2 -> PBKDF2-SHA256 con PBKDF2_ITERATIONS (por defecto)
+#   argon2 -> requiere argon2-cffi
+#   bcrypt -> requiere bcrypt
+_VERIFY_HASHERS = [
+    'core.hashers.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_HASHER_POLICIES = {
+    'fast': ['django.contrib.auth.hashers.MD5PasswordHasher'] + _VERIFY_HASHERS,
+    'pbkdf2': _VERIFY_HASHERS,
+    'argon2': ['django.contrib.auth.hashers.Argon2PasswordHasher'] + _VERIFY_HASHERS,
+    'bcrypt': ['django.contrib.auth.hashers.BCryptSHA256PasswordHasher'] + _VERIFY_HASHERS,
+}
+PASSWORD_HASH_POLICY = os.environ.get('PASSWORD_HASH_POLICY') or ('fast' if sys.argv[1:2] == ['test'] else 'pbkdf2')
+PASSWORD_HASHERS = PASSWORD_HASHER_POLICIES[PASSWORD_HASH_POLICY]
+# Iteraciones PBKDF2; None usa las de la versión de Django instalada
+PBKDF2_ITERATIONS = int(os.environ['PBKDF2_ITERATIONS']) if os.environ.get('PBKDF2_ITERATIONS') else None
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -156,10 +229,101 @@ MESSAGE_TAGS = {
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Sesión: expirar por inactividad después de 15 minutos
 SESSION_COOKIE_AGE = 15*60  # 10 segundos para pruebas de expiración
-# Al poner True, la cookie de sesión se renueva en cada petición activa (sliding expiration)
-SESSION_SAVE_EVERY_REQUEST = True
-
-# Logging para métricas de request
+# Sesiones leídas desde cache (write-through a la BD) para no consultar MySQL en
+# cada request, sólo con una cache compartida: con LocMemCache cada worker
+# seguiría sirviendo su copia de una sesión cerrada o modificada en otro
+_CACHE_COMPARTIDA = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+SESSION_ENGINE = ('django.contrib.sessions.backends.cached_db' if _CACHE_COMPARTIDA
+                  else 'django.contrib.sessions.backends.db')
+# Expiración deslizante sin escribir la sesión en cada petición: SessionRefreshMiddleware
+# la renueva sólo cuando ha pasado esta fracción de SESSION_COOKIE_AGE
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_FRACTION = 0.1
+# Barrido en proceso de sesiones expiradas cada N segundos (None = desactivado;
+# alternativa: `python manage.py limpiar_sesiones` desde cron)
+SESSION_SWEEP_INTERVAL_S = None
+
+# Métricas de request: cuántas queries más lentas incluir en cada línea y umbral
+# (ms) a partir del cual la request se vuelca completa en slow_requests.log.
+# Usar None para desactivar el log de requests lentas.
+REQUEST_METRICS_TOP_QUERIES = 3
+REQUEST_METRICS_SLOW_MS = 500
+# Detector N+1 de la suite de tests: una request falla el test si ejecuta la
+# misma forma de query este número de veces o más (None para desactivar).
+NPLUSONE_THRESHOLD = 5
+
+# Trazas por request (core.tracing): fracción de requests muestreadas y tamaño
+# del buffer circular visible en /core/debug/traces/ (sólo con DEBUG).
+TRACING_SAMPLE_RATE = 1.0 if DEBUG else 0.01
+TRACING_BUFFER_SIZE = 200
+
+# Perfilado cProfile por request (core.profiling): desactivado por defecto.
+# Con ENABLED, se perfila la request con header `X-Profile: 1` o `?__profile=1`
+# y una fracción aleatoria SAMPLE_RATE. Los .prof se podan por tamaño total.
+REQUEST_PROFILING_ENABLED = False
+REQUEST_PROFILING_SAMPLE_RATE = 0.0
+REQUEST_PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+REQUEST_PROFILING_MAX_BYTES = 50 * 1024 * 1024
+
+# Auditoría write-behind (core.auditoria): con True, los MovimientoInventario se
+# escriben a un journal local al confirmar la transacción y un drenador en
+# segundo plano los inserta en la BD cada AUDIT_DRAIN_INTERVAL_S segundos en
+# lotes de AUDIT_DRAIN_BATCH_SIZE. fsync del journal agrupado cada
+# AUDIT_JOURNAL_FSYNC_INTERVAL_S. Tras un reinicio: `manage.py drenar_auditoria`.
+AUDIT_WRITE_BEHIND = False
+AUDIT_JOURNAL_DIR = os.path.join(BASE_DIR, 'audit_journal')
+AUDIT_JOURNAL_FSYNC_INTERVAL_S = 0.2
+AUDIT_DRAIN_INTERVAL_S = 2
+AUDIT_DRAIN_BATCH_SIZE = 500
+
+# Archivado de movimientos (core.archivado): los MovimientoInventario con más de
+# MOVIMIENTOS_RETENCION_DIAS días se mueven a archivos mensuales .jsonl.gz en
+# lotes de MOVIMIENTOS_ARCHIVO_LOTE (None = sin archivado). Se ejecuta con
+# `python manage.py archivar_movimientos` o en proceso cada
+# MOVIMIENTOS_ARCHIVO_INTERVAL_S segundos (None = desactivado).
+MOVIMIENTOS_RETENCION_DIAS = None
+MOVIMIENTOS_ARCHIVO_DIR = os.path.join(BASE_DIR, 'archivo_movimientos')
+MOVIMIENTOS_ARCHIVO_LOTE = 1000
+MOVIMIENTOS_ARCHIVO_INTERVAL_S = None
+# Máximo de movimientos que devuelve el historial (core.archivado.historial,
+# endpoint movimientos/json/)
+MOVIMIENTOS_HISTORIAL_LIMITE = 200
+
+# Borrado en lote de productos (core.views.eliminar_productos): productos por
+# transacción, cada lote con un bulk_create de sus movimientos BAJA.
+PRODUCTOS_BAJA_LOTE = 200
+
+# Borrado lógico de productos: con True, eliminar archiva el producto (se puede
+# restaurar) y el purgado (core.purga) lo borra de verdad pasados
+# PRODUCTOS_PURGA_DIAS días, en lotes de PRODUCTOS_PURGA_LOTE, con
+# `python manage.py purgar_productos` o en proceso cada
+# PRODUCTOS_PURGA_INTERVAL_S segundos (None = desactivado).
+PRODUCTOS_BORRADO_LOGICO = True
+PRODUCTOS_PURGA_DIAS = 30
+PRODUCTOS_PURGA_LOTE = 200
+PRODUCTOS_PURGA_INTERVAL_S = None
+
+# Listado de productos (core.catalogo): productos por página y segundos que se
+# guarda cada página en la cache (se invalida al modificar productos).
+PRODUCTOS_POR_PAGINA = 50
+CATALOGO_CACHE_TIMEOUT = 60
+# Sugerencias de la búsqueda (core.catalogo.sugerencias): máximo de resultados
+# y segundos en cache por texto normalizado.
+SUGERENCIAS_LIMITE = 8
+SUGERENCIAS_CACHE_TIMEOUT = 30
+# Índice del catálogo en memoria de cada proceso (core.indice): listado y
+# sugerencias sin consultas mientras no cambie la versión del catálogo. Requiere
+# una cache compartida con varios procesos. No se construye con más de
+# CATALOGO_INDICE_MAX_PRODUCTOS productos activos.
+CATALOGO_INDICE_ENABLED = False
+CATALOGO_INDICE_MAX_PRODUCTOS = 10000
+
+# Logging para métricas de request: JSON lines, rotación por tamaño (10 MB) o
+# por día y compresión gzip de los segmentos rotados en segundo plano.
+# `python manage.py analizar_metricas` calcula percentiles por ruta desde ellos.
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -167,14 +331,37 @@ LOGGING = {
         'request': {
             'format': '%(asctime)s | %(message)s',
         },
+        'json': {
+            '()': 'core.metrics_log.JsonLinesFormatter',
+        },
     },
     'handlers': {
         'request_file': {
-            'class': 'logging.FileHandler',
+            'class': 'core.metrics_log.CompressedRotatingFileHandler',
             'level': 'INFO',
-            'formatter': 'request',
+            'formatter': 'json',
             'filename': os.path.join(BASE_DIR, 'request_metrics.log'),
+            'maxBytes': 10 * 1024 * 1024,
+            'interval': 24 * 60 * 60,
+            'backupCount': 30,
+            'encoding': 'utf-8',
+            'delay': True,
+        },
+        'slow_request_file': {
+            'class': 'core.metrics_log.CompressedRotatingFileHandler',
+            'level': 'WARNING',
+            'formatter': 'json',
+            'filename': os.path.join(BASE_DIR, 'slow_requests.log'),
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 10,
             'encoding': 'utf-8',
+            'delay': True,
+        },
+        # Tareas en segundo plano, auditoría e índice (logger `core.*`)
+        'console': {
+            'class': 'logging.StreamHandler',
+            'level': 'INFO',
+            'formatter': 'request',
         },
     },
     'loggers': {
@@ -183,5 +370,15 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'request_metrics.slow': {
+            'handlers': ['slow_request_file'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'core': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
@@ -1,6 +1,29 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from .tasks import background_tasks_allowed, start_periodic_task
+
+        if not background_tasks_allowed():
+            return
+        interval = getattr(settings, 'SESSION_SWEEP_INTERVAL_S', None)
+        if interval:
+            from .session_cleanup import sweep_expired_sessions
+            start_periodic_task('limpiar_sesiones', interval, sweep_expired_sessions)
+        if getattr(settings, 'AUDIT_WRITE_BEHIND', False):
+            from .auditoria import drenar_auditoria
+            start_periodic_task('drenar_auditoria', getattr(settings, 'AUDIT_DRAIN_INTERVAL_S', 2),
+                                drenar_auditoria)
+        interval = getattr(settings, 'MOVIMIENTOS_ARCHIVO_INTERVAL_S', None)
+        if interval and getattr(settings, 'MOVIMIENTOS_RETENCION_DIAS', None):
+            from .archivado import archivar_movimientos
+            start_periodic_task('archivar_movimientos', interval, archivar_movimientos)
+        interval = getattr(settings, 'PRODUCTOS_PURGA_INTERVAL_S', None)
+        if interval and getattr(settings, 'PRODUCTOS_BORRADO_LOGICO', True):
+            from .purga import purgar_productos
+            start_periodic_task('purgar_productos', interval, purgar_productos)
@@ -0,0 +1,246 @@
+"""Archivado por meses de los movimientos de inventario antiguos.
+
+`archivar_movimientos` mueve los `MovimientoInventario` con `fecha` anterior al
+horizonte de retención (`MOVIMIENTOS_RETENCION_DIAS`) a archivos JSON lines
+comprimidos por mes en `MOVIMIENTOS_ARCHIVO_DIR`. Trabaja en lotes pequeños:
+cada lote se escribe en un archivo propio por mes
+(`movimientos-AAAA-MM.<primer id>.jsonl.gz`), primero en un temporal que se
+sincroniza y se renombra de forma atómica, y después se borra de la tabla en
+una transacción corta, sin bloqueos largos. Un archivo a medias nunca queda
+con el nombre definitivo.
+
+Sólo un proceso archiva a la vez: la ejecución toma un lock del sistema
+operativo sobre `<MOVIMIENTOS_ARCHIVO_DIR>/.archivando.lock` (se libera solo si
+el proceso muere) y, si otro proceso lo tiene, no hace nada.
+
+Si el proceso se interrumpe entre la escritura y el borrado, el siguiente
+lote vuelve a archivar esas filas (con el mismo tamaño de lote, en el mismo
+archivo); la lectura descarta los ids repetidos.
+
+`historial` devuelve los movimientos de un rango uniendo la tabla y, si el
+rango llega a fechas archivadas, los archivos mensuales que lo cubren.
+"""
+import glob
+import gzip
+import json
+import os
+import re
+import time
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import MovimientoInventario
+from .serializers import dumps
+
+# Columnas que se conservan en el archivo (nombres de atributo del modelo)
+_CAMPOS = ('id', 'producto_id', 'usuario_id', 'categoria_id', 'cantidad', 'producto_nombre',
+           'producto_codigo', 'resumen_operacion', 'cambios', 'tipo', 'fecha', 'evento')
+# `movimientos-AAAA-MM.jsonl.gz` (formato anterior, un archivo por mes) o
+# `movimientos-AAAA-MM.<primer id>.jsonl.gz` (un archivo por lote y mes)
+_ARCHIVO_RE = re.compile(r'movimientos-(\d{4})-(\d{2})(?:\.\d+)?\.jsonl\.gz$')
+_BLOQUEO = '.archivando.lock'
+
+
+def archivo_dir():
+    return str(getattr(settings, 'MOVIMIENTOS_ARCHIVO_DIR', os.path.join(settings.BASE_DIR, 'archivo_movimientos')))
+
+
+def horizonte(ahora=None):
+    """Fecha a partir de la cual los movimientos siguen en la tabla, o None si no hay retención."""
+    dias = getattr(settings, 'MOVIMIENTOS_RETENCION_DIAS', None)
+    if not dias:
+        return None
+    return (ahora or timezone.now()) - timedelta(days=dias)
+
+
+def _ruta_lote(anio, mes, primer_id):
+    return os.path.join(archivo_dir(), f'movimientos-{anio:04d}-{mes:02d}.{primer_id}.jsonl.gz')
+
+
+def _mes(fecha):
+    fecha = timezone.localtime(fecha) if timezone.is_aware(fecha) else fecha
+    return fecha.year, fecha.month
+
+
+def _escribir(ruta, filas):
+    """Escribe `filas` en un temporal, lo sincroniza a disco y lo renombra a `ruta`."""
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    tmp = f'{ruta}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as gz:
+            for fila in filas:
+                gz.write(dumps(fila) + b'\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, ruta)
+
+
+def _tomar_bloqueo():
+    """Lock exclusivo del archivado (archivo abierto) o None si otro proceso o hebra lo tiene."""
+    os.makedirs(archivo_dir(), exist_ok=True)
+    fh = open(os.path.join(archivo_dir(), _BLOQUEO), 'a+b')
+    try:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        fh.close()
+        return None
+    return fh
+
+
+def _soltar_bloqueo(fh):
+    if fcntl is None:
+        fh.seek(0)
+        msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+    fh.close()
+
+
+def archivar_movimientos(antes_de=None, batch_size=None, max_batches=None, pause_s=0.0):
+    """Archiva los movimientos con `fecha < antes_de` (por defecto, el horizonte).
+
+    Devuelve {'archivados', 'lotes', 'meses', 'segundos', 'omitido'}; `omitido`
+    es True si otro proceso estaba archivando y no se hizo nada.
+    """
+    antes_de = antes_de or horizonte()
+    batch_size = batch_size or getattr(settings, 'MOVIMIENTOS_ARCHIVO_LOTE', 1000)
+    stats = {'archivados': 0, 'lotes': 0, 'meses': set(), 'segundos': 0.0, 'omitido': False}
+    if antes_de is None:
+        return dict(stats, meses=[])
+    bloqueo = _tomar_bloqueo()
+    if bloqueo is None:
+        return dict(stats, meses=[], omitido=True)
+    try:
+        _archivar(stats, antes_de, batch_size, max_batches, pause_s)
+    finally:
+        _soltar_bloqueo(bloqueo)
+    stats['meses'] = sorted(stats['meses'])
+    return stats
+
+
+def _archivar(stats, antes_de, batch_size, max_batches, pause_s):
+    inicio = time.perf_counter()
+    qs = MovimientoInventario.objects.filter(fecha__lt=antes_de).order_by('id').values(*_CAMPOS)
+    ultimo_id = 0
+    while max_batches is None or stats['lotes'] < max_batches:
+        filas = list(qs.filter(id__gt=ultimo_id)[:batch_size])
+        if not filas:
+            break
+        ultimo_id = filas[-1]['id']
+        por_mes = {}
+        for fila in filas:
+            por_mes.setdefault(_mes(fila['fecha']), []).append(fila)
+        for (anio, mes), filas_mes in sorted(por_mes.items()):
+            _escribir(_ruta_lote(anio, mes, filas_mes[0]['id']), filas_mes)
+            stats['meses'].add(f'{anio:04d}-{mes:02d}')
+        # Borrar sólo lo que ya está a salvo en el archivo, en una transacción corta
+        with transaction.atomic():
+            MovimientoInventario.objects.filter(id__in=[f['id'] for f in filas]).delete()
+        stats['archivados'] += len(filas)
+        stats['lotes'] += 1
+        if pause_s:
+            time.sleep(pause_s)
+    stats['segundos'] = round(time.perf_counter() - inicio, 3)
+
+
+def _archivos_en_rango(desde, hasta):
+    """(clave (año, mes), ruta) de los archivos que pueden tener movimientos del rango."""
+    for ruta in sorted(glob.glob(os.path.join(glob.escape(archivo_dir()), 'movimientos-*.jsonl.gz'))):
+        match = _ARCHIVO_RE.search(ruta)
+        if match is None:
+            continue
+        clave = (int(match.group(1)), int(match.group(2)))
+        if desde is not None and clave < _mes(desde):
+            continue
+        if hasta is not None and clave > _mes(hasta):
+            continue
+        yield clave, ruta
+
+
+def _leer(ruta, desde, hasta, vistos):
+    """Movimientos de un archivo con `desde <= fecha < hasta` cuyo id no está en `vistos`."""
+    with gzip.open(ruta, 'rt', encoding='utf-8') as fh:
+        for linea in fh:
+            try:
+                datos = json.loads(linea)
+            except ValueError:
+                continue
+            if datos['id'] in vistos:
+                continue
+            datos['fecha'] = datetime.fromisoformat(datos['fecha'])
+            if desde is not None and datos['fecha'] < desde:
+                continue
+            if hasta is not None and datos['fecha'] >= hasta:
+                continue
+            vistos.add(datos['id'])
+            mov = MovimientoInventario(**{campo: datos.get(campo) for campo in _CAMPOS})
+            mov.archivado = True
+            yield mov
+
+
+def iter_archivados(desde=None, hasta=None):
+    """Movimientos archivados (instancias sin guardar) con `desde <= fecha < hasta`."""
+    vistos = set()
+    for _, ruta in _archivos_en_rango(desde, hasta):
+        yield from _leer(ruta, desde, hasta, vistos)
+
+
+def _inicio_mes_siguiente(anio, mes):
+    anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+    inicio = datetime(anio, mes, 1)
+    return timezone.make_aware(inicio) if settings.USE_TZ else inicio
+
+
+def historial(desde=None, hasta=None, producto_codigo=None, tipo=None, limite=None):
+    """Los `limite` movimientos más recientes del rango, de la tabla y, si hace falta, del archivo.
+
+    `limite` es por defecto `MOVIMIENTOS_HISTORIAL_LIMITE`. El archivo sólo se
+    lee cuando `desde` no se indica, es anterior al horizonte de retención o
+    no hay horizonte configurado; los meses archivados se leen del más
+    reciente al más antiguo y se deja de leer en cuanto los `limite`
+    movimientos reunidos son posteriores al mes que tocaría leer.
+    """
+    limite = limite or getattr(settings, 'MOVIMIENTOS_HISTORIAL_LIMITE', 200)
+    qs = MovimientoInventario.objects.all()
+    if desde is not None:
+        qs = qs.filter(fecha__gte=desde)
+    if hasta is not None:
+        qs = qs.filter(fecha__lt=hasta)
+    if producto_codigo is not None:
+        qs = qs.filter(producto_codigo=producto_codigo)
+    if tipo is not None:
+        qs = qs.filter(tipo=tipo)
+    movimientos = list(qs.recientes()[:limite])
+    for mov in movimientos:
+        mov.archivado = False
+
+    retencion = horizonte()
+    if desde is None or retencion is None or desde < retencion:
+        vistos = {mov.id for mov in movimientos}
+        meses = {}
+        for clave, ruta in _archivos_en_rango(desde, hasta):
+            meses.setdefault(clave, []).append(ruta)
+        for clave in sorted(meses, reverse=True):
+            if len(movimientos) >= limite and movimientos[limite - 1].fecha >= _inicio_mes_siguiente(*clave):
+                break
+            for ruta in meses[clave]:
+                for mov in _leer(ruta, desde, hasta, vistos):
+                    if producto_codigo is not None and mov.producto_codigo != producto_codigo:
+                        continue
+                    if tipo is not None and mov.tipo != tipo:
+                        continue
+                    movimientos.append(mov)
+            movimientos.sort(key=lambda m: (m.fecha, m.id), reverse=True)
+        del movimientos[limite:]
+    return movimientos
@@ -0,0 +1,321 @@
+"""Registro de movimientos de inventario (auditoría), síncrono o write-behind.
+
+Por defecto `registrar_movimiento` inserta el `MovimientoInventario` dentro de
+la transacción de la vista, como siempre. Con `AUDIT_WRITE_BEHIND = True` el
+movimiento se añade, al confirmarse la transacción, a un journal local
+append-only (JSON lines) y un drenador en segundo plano lo inserta en la BD
+con `bulk_create`; la request ya no espera el INSERT en la BD remota.
+
+Durabilidad y recuperación:
+- Cada escritura al journal se hace con `flush()` (sobrevive a la caída del
+  proceso); `fsync` se agrupa como mucho cada `AUDIT_JOURNAL_FSYNC_INTERVAL_S`
+  y siempre antes de drenar, así que ante un corte de energía se pierde como
+  mucho esa ventana.
+- El avance del drenador se guarda en un checkpoint (`<journal>.offset`)
+  escrito de forma atómica. Tras una caída, el siguiente drenado continúa
+  desde el checkpoint.
+- Cada movimiento lleva un identificador `evento` único, así que re-insertar
+  un lote cuyo checkpoint no llegó a guardarse no duplica filas.
+
+Cada proceso escribe su propio journal (`movimientos-<pid>.jsonl`). El
+drenador de un proceso procesa el suyo y los journals huérfanos de procesos
+que ya no existen; `python manage.py drenar_auditoria` drena los huérfanos
+(p. ej. tras un reinicio).
+"""
+import glob
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import psutil
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+
+from .models import Categoria, MovimientoInventario, Producto, Usuario
+from .serializers import dumps
+
+logger = logging.getLogger('core.auditoria')
+
+_JOURNAL_RE = re.compile(r'movimientos-(\d+)\.jsonl$')
+_journals = {}
+_journals_lock = threading.Lock()
+
+
+def write_behind_enabled():
+    return getattr(settings, 'AUDIT_WRITE_BEHIND', False)
+
+
+def journal_dir():
+    return str(getattr(settings, 'AUDIT_JOURNAL_DIR', os.path.join(settings.BASE_DIR, 'audit_journal')))
+
+
+def registrar_movimiento(producto=None, **campos):
+    """Registra un `MovimientoInventario` con los campos dados.
+
+    Síncrono: lo crea en la transacción actual y lo devuelve. Write-behind:
+    lo encola en el journal cuando la transacción actual se confirma (si se
+    revierte, no se registra) y devuelve None.
+    """
+    if not write_behind_enabled():
+        return MovimientoInventario.objects.create(producto=producto, **campos)
+    registro = _registro(producto, campos)
+    transaction.on_commit(lambda: journal_actual().append(registro))
+    return None
+
+
+def registrar_movimientos(movimientos):
+    """Versión en lote de `registrar_movimiento`: `movimientos` es una lista de dicts de campos.
+
+    Síncrono: un solo `bulk_create` en la transacción actual. Write-behind:
+    todos los registros se añaden juntos al journal al confirmarse.
+    """
+    if not movimientos:
+        return []
+    if not write_behind_enabled():
+        return MovimientoInventario.objects.bulk_create([MovimientoInventario(**campos) for campos in movimientos])
+    registros = [_registro(campos.pop('producto', None), campos) for campos in map(dict, movimientos)]
+    transaction.on_commit(lambda: journal_actual().extend(registros))
+    return []
+
+
+def _registro(producto, campos):
+    registro = {
+        'evento': uuid.uuid4().hex,
+        'producto_id': producto.pk if producto is not None else campos.pop('producto_id', None),
+        'fecha': timezone.now().isoformat(),
+    }
+    for campo, valor in campos.items():
+        # Relaciones (p. ej. `categoria`) se guardan por id
+        if isinstance(valor, models.Model):
+            registro[f'{campo}_id'] = valor.pk
+        else:
+            registro[campo] = valor
+    return registro
+
+
+def journal_actual():
+    """Journal de este proceso (uno por directorio y pid)."""
+    path = os.path.join(journal_dir(), f'movimientos-{os.getpid()}.jsonl')
+    with _journals_lock:
+        journal = _journals.get(path)
+        if journal is None:
+            journal = _journals[path] = AuditJournal(path)
+        return journal
+
+
+class AuditJournal:
+    """Archivo JSON lines append-only con checkpoint del último byte drenado."""
+
+    def __init__(self, path, fsync_interval=None):
+        self.path = path
+        self.checkpoint_path = path[:-len('.jsonl')] + '.offset' if path.endswith('.jsonl') else path + '.offset'
+        self.fsync_interval = (fsync_interval if fsync_interval is not None
+                               else getattr(settings, 'AUDIT_JOURNAL_FSYNC_INTERVAL_S', 0.2))
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._fh = None
+        self._last_fsync = 0.0
+        self._dirty = False
+
+    # -- escritura -------------------------------------------------------
+    def append(self, registro):
+        self.extend([registro])
+
+    def extend(self, registros):
+        data = b''.join(dumps(registro) + b'\n' for registro in registros)
+        with self._lock:
+            if self._fh is None:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                self._fh = open(self.path, 'ab')
+            self._fh.write(data)
+            self._fh.flush()
+            self._dirty = True
+            if time.monotonic() - self._last_fsync >= self.fsync_interval:
+                self._fsync_locked()
+
+    def sync(self):
+        with self._lock:
+            if self._dirty:
+                self._fsync_locked()
+
+    def _fsync_locked(self):
+        if self._fh is not None:
+            os.fsync(self._fh.fileno())
+        self._last_fsync = time.monotonic()
+        self._dirty = False
+
+    def close(self):
+        with self._lock:
+            if self._fh is not None:
+                if self._dirty:
+                    self._fsync_locked()
+                self._fh.close()
+                self._fh = None
+
+    # -- checkpoint ------------------------------------------------------
+    def read_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, 'r', encoding='ascii') as fh:
+                return int(fh.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def write_checkpoint(self, offset):
+        tmp = self.checkpoint_path + '.tmp'
+        with open(tmp, 'w', encoding='ascii') as fh:
+            fh.write(str(offset))
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, self.checkpoint_path)
+
+    # -- drenado ---------------------------------------------------------
+    def pending(self, offset, limit):
+        """Hasta `limit` registros completos desde `offset`. Devuelve (registros, nuevo_offset)."""
+        registros = []
+        try:
+            fh = open(self.path, 'rb')
+        except OSError:
+            return registros, offset
+        with fh:
+            fh.seek(offset)
+            while len(registros) < limit:
+                line = fh.readline()
+                # Una línea sin '\n' es una escritura a medias: se reintenta en el próximo drenado
+                if not line or not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                try:
+                    registros.append(json.loads(line))
+                except ValueError:
+                    logger.error('Línea corrupta en %s (offset %s); se omite', self.path, offset - len(line))
+        return registros, offset
+
+    def drain(self, batch_size=None, max_batches=None):
+        """Inserta en la BD los movimientos pendientes. Devuelve el número insertado."""
+        batch_size = batch_size or getattr(settings, 'AUDIT_DRAIN_BATCH_SIZE', 500)
+        total = 0
+        with self._drain_lock:
+            self.sync()
+            offset = self.read_checkpoint()
+            batches = 0
+            while max_batches is None or batches < max_batches:
+                registros, nuevo_offset = self.pending(offset, batch_size)
+                if nuevo_offset == offset:
+                    break
+                total += _insertar(registros)
+                self.write_checkpoint(nuevo_offset)
+                offset = nuevo_offset
+                batches += 1
+            self._truncate_if_drained(offset)
+        return total
+
+    def _truncate_if_drained(self, offset):
+        """Vacía el journal cuando todo lo escrito ya está en la BD."""
+        with self._lock:
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                return
+            if offset and size == offset:
+                if self._fh is not None:
+                    self._fh.close()
+                    self._fh = None
+                # Checkpoint antes de truncar: si el proceso cae entre los dos
+                # pasos, el siguiente drenado re-lee el journal desde el
+                # principio (los `evento` ya insertados se saltan) en lugar de
+                # quedar con un checkpoint más allá del final del archivo.
+                self.write_checkpoint(0)
+                os.truncate(self.path, 0)
+
+    def remove(self):
+        """Borra el journal y su checkpoint (sólo para journals huérfanos ya drenados)."""
+        self.close()
+        for path in (self.path, self.checkpoint_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+_CAMPOS = ('evento', 'producto_id', 'usuario_id', 'categoria_id', 'cantidad', 'tipo', 'cambios',
+           'resumen_operacion', 'producto_nombre', 'producto_codigo')
+# Claves foráneas que se ponen a NULL si la fila referenciada ya no existe al drenar
+_FKS = (('producto_id', Producto), ('usuario_id', Usuario), ('categoria_id', Categoria))
+
+
+def _insertar(registros):
+    """Inserta los registros cuyo `evento` aún no está en la BD. Devuelve cuántos insertó.
+
+    Sin `ignore_conflicts` (INSERT IGNORE en MySQL): un registro que falle por
+    otro motivo hace fallar el lote, que no se marca como drenado.
+    """
+    if not registros:
+        return 0
+    # Lote re-drenado tras una caída: los `evento` ya insertados se saltan
+    ya_insertados = set(MovimientoInventario.objects.filter(
+        evento__in=[r['evento'] for r in registros if r.get('evento')]).values_list('evento', flat=True))
+    vistos = set()
+    nuevos = []
+    for r in registros:
+        evento = r.get('evento')
+        if evento in ya_insertados or evento in vistos:
+            continue
+        if evento:
+            vistos.add(evento)
+        nuevos.append(r)
+    registros = nuevos
+    if not registros:
+        return 0
+    # El producto (p. ej. en una BAJA), el usuario o la categoría pueden haberse
+    # borrado antes del drenado: la FK queda a NULL, igual que con on_delete=SET_NULL.
+    existentes = {}
+    for fk, modelo in _FKS:
+        ids = {r.get(fk) for r in registros} - {None}
+        existentes[fk] = set(modelo.objects.filter(pk__in=ids).values_list('pk', flat=True)) if ids else set()
+    objs = []
+    for r in registros:
+        datos = {campo: r.get(campo) for campo in _CAMPOS}
+        for fk, _ in _FKS:
+            if datos[fk] not in existentes[fk]:
+                datos[fk] = None
+        datos['fecha'] = datetime.fromisoformat(r['fecha']) if r.get('fecha') else timezone.now()
+        objs.append(MovimientoInventario(**datos))
+    with transaction.atomic():
+        MovimientoInventario.objects.bulk_create(objs)
+    return len(objs)
+
+
+def _pid_vivo(pid):
+    # psutil y no os.kill(pid, 0): en Windows os.kill termina el proceso
+    return pid == os.getpid() or psutil.pid_exists(pid)
+
+
+def drenar_auditoria(incluir_propio=True, batch_size=None):
+    """Drena el journal de este proceso y los huérfanos. Devuelve {'insertados', 'journals'}."""
+    base = journal_dir()
+    insertados = 0
+    journals = 0
+    propio = journal_actual().path if incluir_propio else None
+    for path in sorted(glob.glob(os.path.join(glob.escape(base), 'movimientos-*.jsonl'))):
+        match = _JOURNAL_RE.search(path)
+        if match is None:
+            continue
+        if path == propio:
+            journal = journal_actual()
+        elif _pid_vivo(int(match.group(1))):
+            # Journal de otro proceso vivo: lo drena su propio drenador
+            continue
+        else:
+            journal = AuditJournal(path)
+        insertados += journal.drain(batch_size=batch_size)
+        journals += 1
+        if path != propio and journal.read_checkpoint() == 0 and not os.path.getsize(path):
+            journal.remove()
+    return {'insertados': insertados, 'journals': journals}
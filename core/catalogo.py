@@ -0,0 +1,167 @@
+"""Listado de productos de `main.html`, común a `/core/producto/` y `/main`.
+
+`listar_productos` resuelve búsqueda (`q`, por código o nombre), filtro por
+categoría y paginación con dos consultas: la página de productos
+(`para_listado`, ordenada por código) y las categorías con su número de
+productos (`con_total_productos`), del que sale también el total para el
+paginador, sin un COUNT aparte.
+
+El resultado se guarda en la cache con una clave que incluye un contador de
+versión del catálogo. Las vistas que modifican productos llaman a
+`invalidar()` al confirmar la transacción, lo que deja obsoletas todas las
+entradas de golpe. Los cambios hechos por otras vías (shell, fixtures) se ven
+al expirar las entradas (`CATALOGO_CACHE_TIMEOUT`).
+
+Con `CATALOGO_INDICE_ENABLED`, ambos se sirven del índice en memoria del
+proceso (`core.indice`), que usa la misma versión para saber cuándo recargar.
+
+`sugerencias` alimenta la búsqueda mientras se escribe: los primeros
+productos cuyo código o nombre empieza por el texto, con una consulta sobre
+índices y una cache corta por texto normalizado (`SUGERENCIAS_CACHE_TIMEOUT`).
+"""
+import hashlib
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+from . import indice
+from .models import Categoria, Producto
+
+VERSION_KEY = 'catalogo:version'
+_ESPACIOS_RE = re.compile(r'\s+')
+
+
+def version():
+    """Versión actual del catálogo (se crea si no existe)."""
+    actual = cache.get(VERSION_KEY)
+    if actual is None:
+        # Valor inicial basado en el reloj: si la cache perdió la clave, no se
+        # reutilizan versiones anteriores cuyas entradas sigan guardadas
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        actual = cache.get(VERSION_KEY)
+    return actual
+
+
+def invalidar():
+    """Deja obsoletos todos los listados en cache (incrementa la versión)."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        version()
+
+
+def _clave(*partes):
+    digest = hashlib.sha1(repr(partes).encode('utf-8')).hexdigest()
+    return f'catalogo:{version()}:{digest}'
+
+
+def _datos_bd(q, categoria_id, pagina, por_pagina):
+    categorias = list(Categoria.objects.con_total_productos(q))
+    total = sum(c.total_productos for c in categorias)
+    if categoria_id is not None:
+        total = next((c.total_productos for c in categorias if c.id_categoria == categoria_id), 0)
+
+    productos = Producto.objects.activos().para_listado()
+    if q:
+        productos = productos.filter(Q(codigo_producto__icontains=q) | Q(nombre__icontains=q))
+    # Filtro por categoría: usa el índice (categoria, codigo_producto)
+    if categoria_id is not None:
+        productos = productos.filter(categoria_id=categoria_id)
+    paginator = Paginator(productos.order_by('codigo_producto'), por_pagina)
+    # Cada producto tiene categoría: el total sale de los conteos por categoría
+    paginator.count = total
+    page = paginator.get_page(pagina)
+    return {
+        'productos': list(page.object_list),
+        'numero': page.number,
+        'total': total,
+        'categorias': categorias,
+    }
+
+
+def _datos_indice(indice_actual, q, categoria_id, pagina, por_pagina):
+    page = Paginator(indice_actual.buscar(q, categoria_id), por_pagina).get_page(pagina)
+    return {
+        'productos': list(page.object_list),
+        'numero': page.number,
+        'total': page.paginator.count,
+        'categorias': indice_actual.categorias_con_total(q),
+    }
+
+
+def listar_productos(q='', categoria_id=None, pagina=1, por_pagina=None):
+    """Contexto de `main.html`: página de productos, categorías con conteos y filtros.
+
+    Con el índice en memoria (`core.indice`) activo, se resuelve sin consultas.
+    """
+    por_pagina = por_pagina or getattr(settings, 'PRODUCTOS_POR_PAGINA', 50)
+    indice_actual = indice.obtener()
+    if indice_actual is not None:
+        datos = _datos_indice(indice_actual, q, categoria_id, pagina, por_pagina)
+    else:
+        clave = _clave(q, categoria_id, pagina, por_pagina)
+        datos = cache.get(clave)
+        if datos is None:
+            datos = _datos_bd(q, categoria_id, pagina, por_pagina)
+            cache.set(clave, datos, getattr(settings, 'CATALOGO_CACHE_TIMEOUT', 60))
+
+    paginator = Paginator((), por_pagina)
+    paginator.count = datos['total']
+    return {
+        'productos': datos['productos'],
+        'page_obj': Page(datos['productos'], datos['numero'], paginator),
+        'categorias': datos['categorias'],
+        'categoria_id': categoria_id,
+        'total_productos': sum(c.total_productos for c in datos['categorias']),
+        'q': q,
+    }
+
+
+def normalizar(texto):
+    """Texto de búsqueda sin espacios sobrantes y en minúsculas (clave de cache)."""
+    return _ESPACIOS_RE.sub(' ', (texto or '').strip()).lower()
+
+
+def sugerencias(q, limite=None):
+    """Hasta `limite` productos activos cuyo código o nombre empieza por `q`.
+
+    Primero los que coinciden por código, después por nombre, cada grupo
+    ordenado por código. Devuelve dicts {'id', 'codigo', 'nombre'}.
+    """
+    q = normalizar(q)
+    if not q:
+        return []
+    limite = limite or getattr(settings, 'SUGERENCIAS_LIMITE', 8)
+    indice_actual = indice.obtener()
+    if indice_actual is not None:
+        return [{'id': p.id_producto, 'codigo': p.codigo_producto, 'nombre': p.nombre}
+                for p in indice_actual.con_prefijo(q, limite)]
+    clave = _clave('sugerencias', q, limite)
+    resultados = cache.get(clave)
+    if resultados is None:
+        filas = (Producto.objects.activos().con_prefijo(q)
+                 .order_by('-coincide_codigo', 'codigo_producto')
+                 .values_list('id_producto', 'codigo_producto', 'nombre')[:limite])
+        resultados = [{'id': id_, 'codigo': codigo, 'nombre': nombre} for id_, codigo, nombre in filas]
+        cache.set(clave, resultados, getattr(settings, 'SUGERENCIAS_CACHE_TIMEOUT', 30))
+    return resultados
+
+
+def contexto_listado(request):
+    """`listar_productos` con los parámetros de la request (`q`, `categoria`, `pagina`)."""
+    try:
+        categoria_id = int(request.GET.get('categoria') or 0) or None
+    except ValueError:
+        categoria_id = None
+    try:
+        pagina = max(int(request.GET.get('pagina') or 1), 1)
+    except ValueError:
+        pagina = 1
+    contexto = listar_productos(q=request.GET.get('q', '').strip(), categoria_id=categoria_id, pagina=pagina)
+    # Con borrado lógico, eliminar se puede deshacer desde "Archivados"
+    contexto['borrado_logico'] = getattr(settings, 'PRODUCTOS_BORRADO_LOGICO', True)
+    return contexto
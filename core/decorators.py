@@ -30,9 +30,7 @@ def require_session(view_func):
                 return JsonResponse({'error': 'No autorizado'}, status=401)
             return redirect('index')
 
-        try:
-            Usuario.objects.get(id_usuario=session_uid)
-        except Usuario.DoesNotExist:
+        if not Usuario.objects.filter(id_usuario=session_uid).exists():
             try:
                 request.session.flush()
             except Exception:
@@ -44,3 +42,13 @@ def require_session(view_func):
         return view_func(request, *args, **kwargs)
 
     return _wrapped
+
+
+def session_refresh_exempt(view_func):
+    """Marca una vista para que `SessionRefreshMiddleware` no renueve la sesión.
+
+    Útil para endpoints de sondeo (p. ej. el heartbeat de expiración), que no
+    deben contar como actividad del usuario ni escribir la sesión.
+    """
+    view_func.session_refresh_exempt = True
+    return view_func
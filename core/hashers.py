@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 con número de iteraciones configurable (`PBKDF2_ITERATIONS`).
+
+    Usa el mismo `algorithm` que el hasher de Django, así que verifica los hashes
+    existentes y, si sus iteraciones difieren, `must_update` dispara el rehash.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PBKDF2_ITERATIONS', None) or PBKDF2PasswordHasher.iterations
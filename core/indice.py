@@ -0,0 +1,178 @@
+"""Índice del catálogo en memoria del proceso (opcional, `CATALOGO_INDICE_ENABLED`).
+
+Para pantallas de consulta intensiva: en lugar de consultar la BD en cada
+request, `obtener()` devuelve una instantánea inmutable del catálogo activo
+(productos por id, código, nombre en minúsculas y categoría, más las
+categorías). Cada request sólo comprueba la versión del catálogo
+(`core.catalogo.version()`, una lectura de la cache); si cambió (las vistas que
+modifican productos llaman a `catalogo.invalidar()`), la instantánea se
+reconstruye con una consulta y se sustituye de forma atómica.
+
+- La versión se lee antes de cargar los datos: una escritura confirmada
+  durante la carga deja la instantánea con una versión antigua y la
+  siguiente request la recarga; nunca se etiqueta como actual algo anterior
+  a la versión leída.
+- Una sola reconstrucción a la vez por proceso (lock); los lectores no se
+  bloquean y siguen usando la instantánea que tenían.
+- Los cambios hechos por otras vías (shell, fixtures) no cambian la versión:
+  como en `core.catalogo`, se ven al cabo de `CATALOGO_CACHE_TIMEOUT`
+  segundos, cuando la instantánea caduca.
+- Memoria acotada: con más de `CATALOGO_INDICE_MAX_PRODUCTOS` productos
+  activos no se construye (se vuelve a las consultas normales).
+
+Como `core.throttling`, con varios procesos la cache debe ser compartida
+(Redis, Memcached o database) para que todos vean la misma versión.
+"""
+import bisect
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from . import catalogo
+from .models import Categoria, Producto
+
+logger = logging.getLogger('core.indice')
+
+
+def enabled():
+    return getattr(settings, 'CATALOGO_INDICE_ENABLED', False)
+
+
+class FilaCategoria:
+    __slots__ = ('id_categoria', 'nombre', 'total_productos')
+
+    def __init__(self, id_categoria, nombre, total_productos=None):
+        self.id_categoria = id_categoria
+        self.nombre = nombre
+        self.total_productos = total_productos
+
+
+class FilaProducto:
+    """Producto del índice, con los atributos que usa `main.html`."""
+    __slots__ = ('id_producto', 'codigo_producto', 'nombre', 'precio', 'cantidad',
+                 'descripcion_corta', 'categoria', 'nombre_lower')
+
+    def __init__(self, id_producto, codigo_producto, nombre, precio, cantidad, descripcion_corta, categoria):
+        self.id_producto = id_producto
+        self.codigo_producto = codigo_producto
+        self.nombre = nombre
+        self.precio = precio
+        self.cantidad = cantidad
+        self.descripcion_corta = descripcion_corta
+        self.categoria = categoria
+        self.nombre_lower = nombre.lower()
+
+
+class IndiceCatalogo:
+    """Instantánea inmutable del catálogo activo en una versión dada."""
+
+    def __init__(self, version, productos, categorias):
+        self.version = version
+        # Ordenados por nombre, como Categoria.objects.con_total_productos
+        self.categorias = sorted(categorias, key=lambda c: c.nombre)
+        # Ordenados por código, como el listado
+        self.productos = sorted(productos, key=lambda p: p.codigo_producto)
+        self.por_id = {p.id_producto: p for p in self.productos}
+        self.por_codigo = {p.codigo_producto: p for p in self.productos}
+        self.por_nombre = {p.nombre_lower: p for p in self.productos}
+        self.por_categoria = {}
+        for p in self.productos:
+            self.por_categoria.setdefault(p.categoria.id_categoria, []).append(p)
+        self._codigos = [p.codigo_producto for p in self.productos]
+        self._nombres = sorted(self.por_nombre)
+
+    def buscar(self, q='', categoria_id=None):
+        """Productos (por código) que contienen `q` en código o nombre, de `categoria_id` si se indica."""
+        productos = self.productos if categoria_id is None else self.por_categoria.get(categoria_id, [])
+        if not q:
+            return list(productos)
+        q = q.lower()
+        return [p for p in productos if q in p.codigo_producto.lower() or q in p.nombre_lower]
+
+    def categorias_con_total(self, q=''):
+        """Copias de las categorías con `total_productos` de la búsqueda `q`."""
+        totales = {}
+        for p in self.buscar(q):
+            totales[p.categoria.id_categoria] = totales.get(p.categoria.id_categoria, 0) + 1
+        return [FilaCategoria(c.id_categoria, c.nombre, totales.get(c.id_categoria, 0)) for c in self.categorias]
+
+    def con_prefijo(self, texto, limite):
+        """Como `ProductoQuerySet.con_prefijo`: primero por código, después por nombre."""
+        texto = texto.lower()
+        codigo = texto.upper()
+        inicio = bisect.bisect_left(self._codigos, codigo)
+        por_codigo = []
+        for c in self._codigos[inicio:]:
+            if not c.startswith(codigo):
+                break
+            por_codigo.append(self.por_codigo[c])
+        inicio = bisect.bisect_left(self._nombres, texto)
+        por_nombre = []
+        for n in self._nombres[inicio:]:
+            if not n.startswith(texto):
+                break
+            if not self.por_nombre[n].codigo_producto.startswith(codigo):
+                por_nombre.append(self.por_nombre[n])
+        por_nombre.sort(key=lambda p: p.codigo_producto)
+        return (por_codigo + por_nombre)[:limite]
+
+
+def cargar_desde_bd(version):
+    """Construye la instantánea con dos consultas, o None si el catálogo supera el máximo."""
+    maximo = getattr(settings, 'CATALOGO_INDICE_MAX_PRODUCTOS', 10000)
+    # Una transacción: con REPEATABLE READ (MySQL) ambas lecturas ven la misma
+    # instantánea. Con menor aislamiento, leer los productos primero asegura que
+    # sus categorías ya existen al leerlas después, salvo que se hayan borrado
+    # entretanto (en cascada con sus productos): esos productos se omiten.
+    with transaction.atomic():
+        filas = list(Producto.objects.activos().para_listado().values_list(
+            'id_producto', 'codigo_producto', 'nombre', 'precio', 'cantidad', 'descripcion_corta', 'categoria_id',
+        )[:maximo + 1])
+        if len(filas) > maximo:
+            logger.warning('Catálogo con más de %s productos activos: índice en memoria desactivado', maximo)
+            return None
+        categorias = {id_: FilaCategoria(id_, nombre)
+                      for id_, nombre in Categoria.objects.values_list('id_categoria', 'nombre')}
+    productos = [FilaProducto(*fila[:-1], categorias[fila[-1]]) for fila in filas if fila[-1] in categorias]
+    return IndiceCatalogo(version, productos, categorias.values())
+
+
+class IndiceEnProceso:
+    """Índice read-through: reconstruye la instantánea cuando cambia la versión del catálogo."""
+
+    def __init__(self, cargar=cargar_desde_bd):
+        self._cargar = cargar
+        self._lock = threading.Lock()
+        # (versión, instantánea o None si no se pudo construir, caducidad)
+        self._actual = (None, None, 0.0)
+        self.reconstrucciones = 0
+
+    def obtener(self):
+        """Instantánea de la versión actual, o None si el catálogo no cabe en el índice."""
+        version = catalogo.version()
+        actual_version, indice, caduca = self._actual
+        if actual_version == version and time.monotonic() < caduca:
+            return indice
+        with self._lock:
+            # Otra hebra pudo reconstruirla mientras se esperaba el lock
+            version = catalogo.version()
+            actual_version, indice, caduca = self._actual
+            if actual_version != version or time.monotonic() >= caduca:
+                indice = self._cargar(version)
+                timeout = getattr(settings, 'CATALOGO_CACHE_TIMEOUT', 60)
+                self._actual = (version, indice, time.monotonic() + timeout)
+                self.reconstrucciones += 1
+        return indice
+
+
+_indice = IndiceEnProceso()
+
+
+def obtener():
+    """Instantánea del índice del proceso, o None si está desactivado o no cabe."""
+    if not enabled():
+        return None
+    return _indice.obtener()
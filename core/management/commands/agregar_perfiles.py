@@ -0,0 +1,33 @@
+import pstats
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.profiling import iter_profiles
+
+SORT_KEYS = ('cumulative', 'tottime', 'calls', 'ncalls', 'time')
+
+
+class Command(BaseCommand):
+    help = "Combina los perfiles .prof guardados por request y muestra las funciones más costosas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ruta', default=None,
+                            help='Sólo perfiles de rutas que contengan este texto (p. ej. producto/update).')
+        parser.add_argument('--orden', default='cumulative', choices=SORT_KEYS)
+        parser.add_argument('--top', type=int, default=30)
+        parser.add_argument('--salida', default=None,
+                            help='Guardar el perfil combinado en este archivo .prof (snakeviz, gprof2dot...).')
+
+    def handle(self, *args, **options):
+        files = iter_profiles(options['ruta'])
+        if not files:
+            raise CommandError('No hay perfiles guardados para esa ruta.')
+
+        stats = pstats.Stats(files[0], stream=self.stdout)
+        for path in files[1:]:
+            stats.add(path)
+        self.stdout.write(f'{len(files)} perfiles combinados')
+        if options['salida']:
+            stats.dump_stats(options['salida'])
+            self.stdout.write(f"Perfil combinado guardado en {options['salida']}")
+        stats.strip_dirs().sort_stats(options['orden']).print_stats(options['top'])
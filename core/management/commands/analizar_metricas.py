@@ -0,0 +1,80 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.metrics_log import iter_log_records
+
+
+def percentile(sorted_values, pct):
+    """Percentil con interpolación lineal sobre una lista ya ordenada."""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * (pct / 100.0)
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(records, percentiles=(50, 90, 95, 99)):
+    """Agrupa registros de métricas por `METHOD route` y calcula percentiles de latencia.
+
+    Devuelve una lista de dicts ordenada por p95 descendente.
+    """
+    groups = {}
+    for rec in records:
+        if 'latency_ms' not in rec:
+            continue
+        key = f"{rec.get('method', '?')} {rec.get('route') or rec.get('path', '?')}"
+        g = groups.setdefault(key, {'latency': [], 'db_ms': [], 'queries': 0})
+        g['latency'].append(float(rec['latency_ms']))
+        g['db_ms'].append(float(rec.get('db_ms') or 0.0))
+        g['queries'] += int(rec.get('queries') or 0)
+
+    rows = []
+    for key, g in groups.items():
+        lat = sorted(g['latency'])
+        db = sorted(g['db_ms'])
+        row = {'route': key, 'count': len(lat), 'max': lat[-1],
+               'db_p95': percentile(db, 95), 'avg_queries': g['queries'] / len(lat)}
+        for p in percentiles:
+            row[f'p{p}'] = percentile(lat, p)
+        rows.append(row)
+    sort_key = 'p95' if 95 in percentiles else f'p{percentiles[-1]}'
+    rows.sort(key=lambda r: r[sort_key], reverse=True)
+    return rows
+
+
+class Command(BaseCommand):
+    help = ("Calcula percentiles de latencia por ruta a partir de request_metrics.log "
+            "y sus segmentos rotados/comprimidos.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=os.path.join(settings.BASE_DIR, 'request_metrics.log'),
+                            help='Log base (se leen también sus segmentos .gz).')
+        parser.add_argument('--percentiles', default='50,90,95,99',
+                            help='Lista separada por comas (por defecto 50,90,95,99).')
+        parser.add_argument('--ruta', default=None, help='Filtrar por subcadena de la ruta.')
+
+    def handle(self, *args, **options):
+        try:
+            percentiles = tuple(int(p) for p in options['percentiles'].split(',') if p.strip())
+        except ValueError:
+            raise CommandError('--percentiles debe ser una lista de enteros')
+        if not percentiles:
+            raise CommandError('--percentiles no puede estar vacío')
+
+        rows = summarize(iter_log_records(options['path']), percentiles)
+        if options['ruta']:
+            rows = [r for r in rows if options['ruta'] in r['route']]
+        if not rows:
+            self.stdout.write('Sin registros de métricas.')
+            return
+
+        header = ['ruta', 'n'] + [f'p{p}' for p in percentiles] + ['max', 'db_p95', 'queries/req']
+        self.stdout.write(' | '.join(header))
+        for r in rows:
+            cols = [r['route'], str(r['count'])]
+            cols += [f"{r[f'p{p}']:.2f}" for p in percentiles]
+            cols += [f"{r['max']:.2f}", f"{r['db_p95']:.2f}", f"{r['avg_queries']:.1f}"]
+            self.stdout.write(' | '.join(cols))
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.archivado import archivar_movimientos, archivo_dir, horizonte
+
+
+class Command(BaseCommand):
+    help = ("Mueve los movimientos de inventario anteriores al horizonte de retención a archivos "
+            "mensuales .jsonl.gz, en lotes pequeños.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=None,
+                            help='Archivar movimientos con más de estos días (por defecto MOVIMIENTOS_RETENCION_DIAS).')
+        parser.add_argument('--lote', type=int, default=None, help='Filas por lote (por defecto MOVIMIENTOS_ARCHIVO_LOTE).')
+        parser.add_argument('--max-lotes', type=int, default=None, help='Detener tras este número de lotes.')
+        parser.add_argument('--pausa', type=float, default=0.0, help='Segundos de pausa entre lotes.')
+
+    def handle(self, *args, **options):
+        if options['dias'] is not None:
+            antes_de = timezone.now() - timedelta(days=options['dias'])
+        else:
+            antes_de = horizonte()
+        if antes_de is None:
+            raise CommandError('Sin horizonte: indique --dias o configure MOVIMIENTOS_RETENCION_DIAS.')
+        stats = archivar_movimientos(antes_de=antes_de, batch_size=options['lote'],
+                                     max_batches=options['max_lotes'], pause_s=options['pausa'])
+        if stats['omitido']:
+            self.stdout.write('Otro proceso está archivando movimientos; no se hizo nada.')
+            return
+        self.stdout.write(f"Movimientos archivados: {stats['archivados']} (lotes: {stats['lotes']}, "
+                          f"meses: {', '.join(stats['meses']) or '-'}, {stats['segundos']}s) en {archivo_dir()}")
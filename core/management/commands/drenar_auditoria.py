@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core.auditoria import AuditJournal, drenar_auditoria, journal_dir
+
+
+class Command(BaseCommand):
+    help = ("Inserta en la BD los movimientos pendientes de los journals de auditoría "
+            "write-behind de procesos que ya no existen (recuperación tras caída o reinicio).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=None,
+                            help='Movimientos por bulk_create (por defecto AUDIT_DRAIN_BATCH_SIZE).')
+        parser.add_argument('--archivo', default=None,
+                            help='Drenar sólo este journal aunque su proceso siga vivo.')
+
+    def handle(self, *args, **options):
+        if options['archivo']:
+            insertados = AuditJournal(options['archivo']).drain(batch_size=options['lote'])
+            self.stdout.write(f"Movimientos insertados: {insertados} (journal: {options['archivo']})")
+            return
+        stats = drenar_auditoria(incluir_propio=False, batch_size=options['lote'])
+        self.stdout.write(f"Movimientos insertados: {stats['insertados']} "
+                          f"(journals: {stats['journals']}, directorio: {journal_dir()})")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from core.session_cleanup import sweep_expired_sessions, compact_session_table
+
+
+class Command(BaseCommand):
+    help = "Elimina sesiones expiradas de django_session en lotes pequeños (y opcionalmente compacta la tabla)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help='Filas por lote (por defecto 500).')
+        parser.add_argument('--max-lotes', type=int, default=None, help='Detener tras este número de lotes.')
+        parser.add_argument('--pausa', type=float, default=0.0, help='Segundos de pausa entre lotes.')
+        parser.add_argument('--compactar', action='store_true',
+                            help='Ejecutar OPTIMIZE TABLE al terminar (sólo MySQL).')
+
+    def handle(self, *args, **options):
+        stats = sweep_expired_sessions(batch_size=options['lote'], max_batches=options['max_lotes'],
+                                       pause_s=options['pausa'])
+        self.stdout.write(f"Sesiones expiradas eliminadas: {stats['eliminadas']} "
+                          f"(lotes: {stats['lotes']}, {stats['segundos']}s)")
+        if options['compactar']:
+            if compact_session_table():
+                self.stdout.write('Tabla django_session compactada.')
+            else:
+                self.stdout.write('Compactación no soportada en este motor de BD; omitida.')
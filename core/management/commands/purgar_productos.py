@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.purga import horizonte, purgar_productos
+
+
+class Command(BaseCommand):
+    help = ("Borra definitivamente los productos archivados (borrado lógico) hace más de "
+            "PRODUCTOS_PURGA_DIAS días, en lotes pequeños.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=None,
+                            help='Purgar productos archivados hace más de estos días (por defecto PRODUCTOS_PURGA_DIAS).')
+        parser.add_argument('--lote', type=int, default=None, help='Productos por lote (por defecto PRODUCTOS_PURGA_LOTE).')
+        parser.add_argument('--max-lotes', type=int, default=None, help='Detener tras este número de lotes.')
+        parser.add_argument('--pausa', type=float, default=0.0, help='Segundos de pausa entre lotes.')
+
+    def handle(self, *args, **options):
+        if options['dias'] is not None:
+            antes_de = timezone.now() - timedelta(days=options['dias'])
+        else:
+            antes_de = horizonte()
+        if antes_de is None:
+            raise CommandError('Sin horizonte: indique --dias o configure PRODUCTOS_PURGA_DIAS.')
+        stats = purgar_productos(antes_de=antes_de, batch_size=options['lote'],
+                                 max_batches=options['max_lotes'], pause_s=options['pausa'])
+        self.stdout.write(f"Productos purgados: {stats['purgados']} (lotes: {stats['lotes']}, {stats['segundos']}s)")
@@ -0,0 +1,145 @@
+"""Formato estructurado y sink rotativo/comprimido para `request_metrics.log`.
+
+- `JsonLinesFormatter`: una línea JSON por registro; si el registro trae
+  `extra={'metrics': {...}}` se serializa ese dict, si no el mensaje.
+- `CompressedRotatingFileHandler`: rota por tamaño y/o tiempo a segmentos con
+  sello de fecha (`request_metrics.log.20250101T120000-000000.gz`) que se
+  comprimen con gzip en un hilo de fondo; conserva los `backupCount` últimos.
+- `iter_log_records`: lee el log activo y sus segmentos (.gz o sin comprimir).
+"""
+import glob
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formatter que produce JSON lines con `ts`, `level`, `logger` y los datos."""
+
+    def format(self, record):
+        data = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+        }
+        payload = getattr(record, 'metrics', None)
+        if isinstance(payload, dict):
+            data.update(payload)
+        else:
+            data['message'] = record.getMessage()
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def _segment_paths(base_filename):
+    """Segmentos rotados de `base_filename` (comprimidos o no), del más antiguo al más nuevo."""
+    return sorted(p for p in glob.glob(glob.escape(base_filename) + '.*') if not p.endswith('.tmp'))
+
+
+class CompressedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler con rotación por tiempo y compresión gzip en segundo plano.
+
+    `maxBytes` (0 = sin límite) e `interval` en segundos (0 = sin rotación por
+    tiempo) pueden combinarse: se rota con la primera condición que se cumpla.
+    """
+
+    def __init__(self, filename, mode='a', maxBytes=0, backupCount=0, encoding=None,
+                 delay=False, interval=0):
+        super().__init__(filename, mode=mode, maxBytes=maxBytes, backupCount=backupCount,
+                         encoding=encoding, delay=delay)
+        self.interval = interval
+        self.rollover_at = time.time() + interval if interval else None
+        self._workers = []
+        self._prune_lock = threading.Lock()
+        # Segmentos que quedaron sin comprimir (p. ej. proceso terminado a mitad)
+        for path in _segment_paths(self.baseFilename):
+            if not path.endswith('.gz'):
+                self._compress_async(path)
+
+    def shouldRollover(self, record):
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+            stamp = datetime.now().strftime('%Y%m%dT%H%M%S-%f')
+            segment = f"{self.baseFilename}.{stamp}"
+            os.replace(self.baseFilename, segment)
+            self._compress_async(segment)
+        if self.interval:
+            self.rollover_at = time.time() + self.interval
+        if not self.delay:
+            self.stream = self._open()
+
+    def _compress_async(self, path):
+        worker = threading.Thread(target=self._compress, args=(path,), daemon=True,
+                                  name='request-metrics-gzip')
+        self._workers = [w for w in self._workers if w.is_alive()]
+        self._workers.append(worker)
+        worker.start()
+
+    def _compress(self, path):
+        tmp = path + '.gz.tmp'
+        try:
+            with open(path, 'rb') as src, gzip.open(tmp, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(tmp, path + '.gz')
+            os.remove(path)
+        except OSError:
+            return
+        self._prune()
+
+    def _prune(self):
+        if not self.backupCount:
+            return
+        with self._prune_lock:
+            compressed = [p for p in _segment_paths(self.baseFilename) if p.endswith('.gz')]
+            for old in compressed[:-self.backupCount]:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+
+    def wait_for_compression(self, timeout=None):
+        """Espera a que terminen las compresiones pendientes (útil en tests/apagado)."""
+        for worker in list(self._workers):
+            worker.join(timeout)
+
+    def close(self):
+        self.wait_for_compression(timeout=5)
+        super().close()
+
+
+def iter_log_records(base_filename):
+    """Itera los registros JSON del log activo y todos sus segmentos rotados.
+
+    Las líneas que no son JSON (p. ej. del formato de texto anterior) se ignoran.
+    """
+    paths = _segment_paths(base_filename)
+    if os.path.exists(base_filename):
+        paths.append(base_filename)
+    for path in paths:
+        opener = gzip.open if path.endswith('.gz') else open
+        try:
+            with opener(path, 'rt', encoding='utf-8') as fh:
+                for line in fh:
+                    line = line.strip()
+                    if not line.startswith('{'):
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except OSError:
+            continue
@@ -1,7 +1,15 @@
 import time
 import os
+import re
+import sys
 import logging
 
+from django.conf import settings
+from django.db import connection
+
+from . import profiling
+from . import tracing
+
 # Almacén global para asociar métricas a un test en ejecución
 CURRENT_TEST_ID = None
 RECORDED_METRICS = []  # cada item: dict con test_id y datos de la request
@@ -39,16 +47,145 @@ except Exception:  # Fallback: crear shim mínimo para que el middleware no fall
     psutil = _PsutilShim()
 
 
+_IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*%s\s*,?)+\)', re.IGNORECASE)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+\b')
+# Frames del runner de tests que no aportan información en las pilas N+1
+_STACK_SKIP = ('manage.py', os.path.join('core', 'tests', 'test_logger.py'))
+_TRANSACTION_PREFIXES = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT', 'BEGIN', 'COMMIT', 'ROLLBACK')
+
+
+def query_shape(sql):
+    """Normaliza una sentencia SQL para comparar su "forma".
+
+    Sustituye literales numéricos/texto por `?` y colapsa las listas `IN (...)`,
+    de modo que la misma query con distintos parámetros produce la misma forma.
+    """
+    shape = ' '.join(str(sql).split())
+    shape = _IN_LIST_RE.sub('IN (...)', shape)
+    shape = _STRING_RE.sub('?', shape)
+    return _NUMBER_RE.sub('?', shape)
+
+
+def _call_stack(skip_file):
+    """Pila compacta de la query: frames del proyecto y nodos de template activos."""
+    from django.template.base import Node
+
+    base_dir = str(settings.BASE_DIR)
+    stack = []
+    frame = sys._getframe(2)
+    while frame is not None:
+        code = frame.f_code
+        filename = code.co_filename
+        node = frame.f_locals.get('self')
+        if isinstance(node, Node) and getattr(node, 'origin', None) is not None:
+            token = getattr(node, 'token', None)
+            entry = f"template {node.origin.template_name}:{getattr(token, 'lineno', '?')}"
+            if not stack or stack[-1] != entry:
+                stack.append(entry)
+        elif (filename.startswith(base_dir) and filename != skip_file
+              and 'site-packages' not in filename):
+            rel = os.path.relpath(filename, base_dir)
+            if rel not in _STACK_SKIP:
+                stack.append(f"{rel}:{frame.f_lineno} in {code.co_name}")
+        frame = frame.f_back
+    return stack
+
+
+class QueryCollector:
+    """Execute wrapper que mide cada sentencia SQL ejecutada durante una request.
+
+    Se instala con `connection.execute_wrapper(collector)` y acumula en
+    `queries` tuplas (sql, duration_ms, many). Con `capture_stacks=True`
+    guarda además en `stacks` la pila de vista/template de cada query
+    (costoso: pensado para la suite de tests).
+    """
+    def __init__(self, capture_stacks=False):
+        self.queries = []
+        self.capture_stacks = capture_stacks
+        self.stacks = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            end = time.perf_counter()
+            self.queries.append((sql, (end - start) * 1000.0, many))
+            trace = tracing.current_trace()
+            if trace is not None:
+                trace.record('sql', 'sql', start, end, sql=_short_sql(sql))
+            if self.capture_stacks:
+                self.stacks.append(_call_stack(__file__))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_ms(self):
+        return sum(q[1] for q in self.queries)
+
+    def slowest(self, n):
+        """Devuelve las `n` sentencias más lentas como lista de (sql, duration_ms)."""
+        ordered = sorted(self.queries, key=lambda q: q[1], reverse=True)
+        return [(sql, ms) for sql, ms, _ in ordered[:n]]
+
+    def repeated(self, threshold):
+        """Detecta queries de misma forma repetidas `threshold` o más veces (N+1).
+
+        Devuelve una lista de dicts {shape, count, stack}, donde `stack` es la
+        pila de la primera ocurrencia (si se capturaron pilas).
+        """
+        if not threshold:
+            return []
+        groups = {}
+        for i, (sql, _, _) in enumerate(self.queries):
+            if str(sql).lstrip().upper().startswith(_TRANSACTION_PREFIXES):
+                continue
+            shape = query_shape(sql)
+            if shape in groups:
+                groups[shape][0] += 1
+            else:
+                groups[shape] = [1, i]
+        found = []
+        for shape, (count, first) in groups.items():
+            if count >= threshold:
+                stack = self.stacks[first] if first < len(self.stacks) else []
+                found.append({'shape': shape, 'count': count, 'stack': stack})
+        return found
+
+
+def _short_sql(sql, limit=200):
+    sql = ' '.join(str(sql).split())
+    return sql if len(sql) <= limit else sql[:limit - 3] + '...'
+
+
 class RequestMetricsMiddleware:
-    """Middleware que registra latencia y uso de recursos por request.
+    """Middleware que registra latencia, uso de recursos y trabajo de BD por request.
+
+    Loggea en el logger 'request_metrics' un registro por petición. El dict
+    estructurado va en `record.metrics` (method, path, route, status, latency_ms,
+    rss_*, *_cpu_s, queries, db_ms, top_queries) y el mensaje de texto conserva
+    el formato METHOD PATH | status | latency_ms=... para formatters planos.
 
-    Loggea en el logger 'request_metrics' una línea por petición con:
-    METHOD PATH | status | latency_ms | rss_before | rss_after | rss_diff | user_cpu_s | system_cpu_s
+    Las peticiones cuya latencia supera `REQUEST_METRICS_SLOW_MS` se registran
+    además en el logger 'request_metrics.slow' con la lista completa de queries.
+
+    Con `REQUEST_PROFILING_ENABLED` la request puede ejecutarse bajo cProfile
+    (ver core.profiling); la ruta del .prof se añade al registro.
+
+    Cada respuesta lleva un header `X-Request-ID` (el recibido o uno nuevo) y,
+    según `TRACING_SAMPLE_RATE`, la request se traza con spans (ver core.tracing).
     """
     def __init__(self, get_response):
         self.get_response = get_response
         self.process = psutil.Process(os.getpid()) if hasattr(psutil, 'Process') else None
         self.logger = logging.getLogger('request_metrics')
+        self.slow_logger = logging.getLogger('request_metrics.slow')
+        self.top_n = getattr(settings, 'REQUEST_METRICS_TOP_QUERIES', 3)
+        self.slow_ms = getattr(settings, 'REQUEST_METRICS_SLOW_MS', 500)
+        self.nplusone_threshold = getattr(settings, 'NPLUSONE_THRESHOLD', 5)
 
     def __call__(self, request):
         start = time.perf_counter()
@@ -64,7 +201,28 @@ class RequestMetricsMiddleware:
             except Exception:
                 pass
 
-        response = self.get_response(request)
+        request.request_id = tracing.request_id_from(request)
+        trace = token = None
+        if tracing.should_sample():
+            trace, token = tracing.start_trace(request.request_id, request.method, request.path)
+            root = trace.start(f'{request.method} {request.path}', 'request')
+
+        # Las pilas por query sólo se capturan con un test activo (detector N+1)
+        collector = QueryCollector(capture_stacks=CURRENT_TEST_ID is not None)
+        profiler = None
+        try:
+            with connection.execute_wrapper(collector):
+                if profiling.should_profile(request):
+                    response, profiler = profiling.run_profiled(self.get_response, request)
+                else:
+                    response = self.get_response(request)
+        finally:
+            if trace is not None:
+                trace.finish(root)
+                tracing.end_trace(trace, token)
+        if trace is not None:
+            trace.status = getattr(response, 'status_code', None)
+        response['X-Request-ID'] = request.request_id
 
         duration_ms = (time.perf_counter() - start) * 1000.0
         rss_after = rss_before
@@ -80,28 +238,116 @@ class RequestMetricsMiddleware:
                 pass
 
         rss_diff = rss_after - rss_before
-        # Formato compacto para fácil parsing posterior
+        db_ms = collector.total_ms
+        profile_path = None
+        if profiler is not None:
+            match = getattr(request, 'resolver_match', None)
+            try:
+                profile_path = profiling.save_profile(profiler, match.route if match else request.path,
+                                                      request.request_id)
+            except OSError:
+                self.logger.exception('No se pudo guardar el perfil de %s', request.path)
         # Filtrar favicon para evitar ruido en métricas
         if request.path != '/favicon.ico':
+            match = getattr(request, 'resolver_match', None)
+            record = {
+                'request_id': request.request_id,
+                'method': request.method,
+                'path': request.path,
+                'route': match.route if match else None,
+                'status': getattr(response, 'status_code', 'NA'),
+                'latency_ms': round(duration_ms, 3),
+                'rss_before': rss_before,
+                'rss_after': rss_after,
+                'rss_diff': rss_diff,
+                'user_cpu_s': round(user_cpu, 3),
+                'system_cpu_s': round(system_cpu, 3),
+                'queries': collector.count,
+                'db_ms': round(db_ms, 3),
+                'top_queries': [(_short_sql(sql), round(ms, 3)) for sql, ms in collector.slowest(self.top_n)],
+            }
+            if profile_path:
+                record['profile'] = profile_path
+            # El mensaje de texto se mantiene para formatters no estructurados;
+            # JsonLinesFormatter serializa `record` completo.
             log_line = (
-                f"{request.method} {request.path} | {getattr(response, 'status_code', 'NA')} | "
+                f"{request.method} {request.path} | {record['status']} | "
                 f"latency_ms={duration_ms:.2f} | rss_before={rss_before} | rss_after={rss_after} | rss_diff={rss_diff} | "
-                f"user_cpu_s={user_cpu:.3f} | system_cpu_s={system_cpu:.3f}"
+                f"user_cpu_s={user_cpu:.3f} | system_cpu_s={system_cpu:.3f} | "
+                f"queries={collector.count} | db_ms={db_ms:.2f}"
             )
-            self.logger.info(log_line)
+            self.logger.info(log_line, extra={'metrics': record})
+
+            if self.slow_ms is not None and duration_ms >= self.slow_ms:
+                lines = [log_line]
+                for i, (sql, ms, many) in enumerate(collector.queries, 1):
+                    lines.append(f"  #{i} {ms:.2f}ms{' (many)' if many else ''} {' '.join(str(sql).split())}")
+                slow_record = dict(record, queries_detail=[
+                    {'sql': ' '.join(str(sql).split()), 'ms': round(ms, 3), 'many': many}
+                    for sql, ms, many in collector.queries
+                ])
+                self.slow_logger.warning('\n'.join(lines), extra={'metrics': slow_record})
 
             # Registrar para integración con test_results.txt si hay test activo
             if CURRENT_TEST_ID:
-                RECORDED_METRICS.append({
-                    'test_id': CURRENT_TEST_ID,
-                    'method': request.method,
-                    'path': request.path,
-                    'status': getattr(response, 'status_code', 'NA'),
-                    'latency_ms': duration_ms,
-                    'rss_before': rss_before,
-                    'rss_after': rss_after,
-                    'rss_diff': rss_diff,
-                    'user_cpu_s': user_cpu,
-                    'system_cpu_s': system_cpu,
-                })
+                RECORDED_METRICS.append(dict(
+                    record,
+                    test_id=CURRENT_TEST_ID,
+                    repeated_queries=collector.repeated(self.nplusone_threshold),
+                ))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # El span de la vista queda abierto hasta que get_response retorna
+        trace = tracing.current_trace()
+        if trace is not None:
+            name = getattr(view_func, '__name__', view_func.__class__.__name__)
+            trace.start(f'view {name}', 'view')
+        return None
+
+
+SESSION_REFRESH_KEY = '_refrescada'
+
+
+class SessionRefreshMiddleware:
+    """Expiración deslizante de la sesión sin escribirla en cada request.
+
+    Sustituye a `SESSION_SAVE_EVERY_REQUEST`: guarda en la sesión la marca de la
+    última renovación y sólo la vuelve a guardar (renovando expiración y cookie)
+    cuando ha pasado `SESSION_REFRESH_FRACTION` de `SESSION_COOKIE_AGE`. Con
+    fracción 0.1 y 15 minutos, una sesión activa se escribe como mucho cada
+    90 s y el timeout por inactividad queda entre 13,5 y 15 minutos.
+
+    Las vistas marcadas con `@session_refresh_exempt` nunca renuevan la sesión.
+
+    Debe ir después de SessionMiddleware en MIDDLEWARE.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        session = getattr(request, 'session', None)
+        if session is None or session.session_key is None and not session.modified:
+            return response
+        if getattr(request, '_session_refresh_exempt', False):
+            return response
+        if session.is_empty():
+            return response
+
+        now = int(time.time())
+        if session.modified:
+            # Se va a guardar de todos modos: sólo actualizar la marca
+            session[SESSION_REFRESH_KEY] = now
+            return response
+
+        interval = settings.SESSION_COOKIE_AGE * getattr(settings, 'SESSION_REFRESH_FRACTION', 0.1)
+        last = session.get(SESSION_REFRESH_KEY)
+        if last is None or now - last >= interval:
+            session[SESSION_REFRESH_KEY] = now
         return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, 'session_refresh_exempt', False):
+            request._session_refresh_exempt = True
+        return None
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:14
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_alter_movimientoinventario_resumen_operacion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(fields=['producto_codigo', 'tipo', 'fecha'], name='mov_codigo_tipo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(django.db.models.functions.text.Lower('nombre'), name='producto_nombre_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['categoria', 'codigo_producto'], name='producto_cat_codigo_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:15
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='producto',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('nombre'), name='producto_nombre_lower_uniq'),
+        ),
+        migrations.RemoveIndex(
+            model_name='producto',
+            name='producto_nombre_lower_idx',
+        ),
+    ]
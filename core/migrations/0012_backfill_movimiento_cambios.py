@@ -0,0 +1,201 @@
+"""Convierte los `resumen_operacion` existentes en `cambios` estructurados.
+
+Recorre los movimientos por rangos de id en lotes, sin cargar toda la tabla.
+Los textos que se convierten sin pérdida (al volver a formatearlos se obtiene
+el mismo texto) pasan a `cambios` y se vacía `resumen_operacion`; los demás
+se conservan como texto. También rellena `categoria` cuando se puede deducir.
+
+El formato y el parseo de los textos son una copia congelada de
+`core.resumen` tal como estaba al escribir esta migración: el módulo puede
+cambiar después sin alterar lo que hace (o deshace) la migración.
+"""
+import re
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+ETIQUETAS = {
+    'precio': 'Precio',
+    'nombre': 'Nombre',
+    'descripcion': 'Descripción',
+    'categoria': 'Categoría',
+    'cantidad': 'Cantidad',
+}
+_CAMPOS_NUMERICOS = ('precio', 'cantidad')
+_TITULOS_ESTADO = {'ALTA': 'Alta', 'BAJA': 'Baja'}
+
+
+def formatear_cambios(cambios):
+    if not cambios:
+        return ''
+    parts = []
+    for field, vals in cambios.items():
+        antes = vals.get('antes') if isinstance(vals, dict) else None
+        despues = vals.get('despues') if isinstance(vals, dict) else None
+        label = ETIQUETAS.get(field, field.capitalize())
+        if field == 'categoria':
+            name_before = antes.get('nombre') if isinstance(antes, dict) else (antes or '')
+            name_after = despues.get('nombre') if isinstance(despues, dict) else (despues or '')
+            parts.append(f"{label} {name_before or '(ninguna)'} a {name_after or '(ninguna)'}")
+        else:
+            parts.append(f"{label} {antes if antes is not None else '(ninguno)'} a "
+                         f"{despues if despues is not None else '(ninguno)'}")
+    return 'Cambios: ' + ', '.join(parts)
+
+
+def formatear_resumen(tipo, cambios):
+    if tipo in _TITULOS_ESTADO:
+        lado = 'antes' if tipo == 'BAJA' else 'despues'
+        valores = {campo: (vals or {}).get(lado) for campo, vals in (cambios or {}).items()}
+        categoria = valores.get('categoria')
+        categoria_nombre = categoria.get('nombre') if isinstance(categoria, dict) else categoria
+        return (f"{_TITULOS_ESTADO[tipo]}: Nombre {valores.get('nombre')}, "
+                f"Código {valores.get('codigo')}, Categoría {categoria_nombre or '(ninguna)'}, "
+                f"Precio {valores.get('precio')}, Cantidad {valores.get('cantidad')}")
+    return formatear_cambios(cambios)
+
+
+_ESTADO_RE = re.compile(
+    r'^(?P<tipo>Alta|Baja): Nombre (?P<nombre>.*), Código (?P<codigo>\S*), '
+    r'Categoría (?P<categoria>.*), Precio (?P<precio>-?\d+), Cantidad (?P<cantidad>-?\d+)$',
+    re.S,
+)
+_PARTE_RE = re.compile(r'(?:^|, )(?=(?:%s) )' % '|'.join(re.escape(e) for e in ETIQUETAS.values()))
+_ETIQUETA_A_CAMPO = {etiqueta: campo for campo, etiqueta in ETIQUETAS.items()}
+
+
+def _numero(valor):
+    return None if valor == '(ninguno)' else int(valor)
+
+
+def _texto(valor, vacio):
+    return None if valor == vacio else valor
+
+
+def parsear_resumen(tipo, texto, categorias_por_nombre=None):
+    """`cambios` equivalente a un `resumen_operacion` antiguo, o None si no se puede.
+
+    `categorias_por_nombre` ({nombre: id}) permite recuperar el id de las
+    categorías que sólo aparecen por nombre en el texto.
+    """
+    if not texto:
+        return None
+    categorias_por_nombre = categorias_por_nombre or {}
+
+    def _categoria(nombre):
+        if nombre is None:
+            return None
+        return {'id': categorias_por_nombre.get(nombre), 'nombre': nombre}
+
+    if tipo in ('ALTA', 'BAJA'):
+        match = _ESTADO_RE.match(texto)
+        if match is None or match.group('tipo').upper() != tipo:
+            return None
+        lado = 'despues' if tipo == 'ALTA' else 'antes'
+        otro = 'antes' if lado == 'despues' else 'despues'
+        valores = {
+            'nombre': match.group('nombre'),
+            'codigo': match.group('codigo'),
+            'categoria': _categoria(_texto(match.group('categoria'), '(ninguna)')),
+            'precio': int(match.group('precio')),
+            'cantidad': int(match.group('cantidad')),
+        }
+        cambios = {campo: {otro: None, lado: valor} for campo, valor in valores.items()}
+        return cambios if formatear_resumen(tipo, cambios) == texto else None
+
+    if not texto.startswith('Cambios: '):
+        return None
+    cambios = {}
+    for parte in _PARTE_RE.split(texto[len('Cambios: '):]):
+        if not parte:
+            continue
+        etiqueta, _, resto = parte.partition(' ')
+        campo = _ETIQUETA_A_CAMPO.get(etiqueta)
+        # " a " separa antes/después: si aparece más de una vez el texto es ambiguo
+        if campo is None or campo in cambios or resto.count(' a ') != 1:
+            return None
+        antes, despues = resto.split(' a ')
+        try:
+            if campo in _CAMPOS_NUMERICOS:
+                antes, despues = _numero(antes), _numero(despues)
+            elif campo == 'categoria':
+                antes = _categoria(_texto(antes, '(ninguna)'))
+                despues = _categoria(_texto(despues, '(ninguna)'))
+            else:
+                antes, despues = _texto(antes, '(ninguno)'), _texto(despues, '(ninguno)')
+        except ValueError:
+            return None
+        cambios[campo] = {'antes': antes, 'despues': despues}
+    # Sólo se acepta si al volver a formatear se obtiene exactamente el mismo texto
+    if not cambios or formatear_cambios(cambios) != texto:
+        return None
+    return cambios
+
+
+def _categoria_id(tipo, cambios, producto_categoria_id):
+    valores = cambios.get('categoria') or {}
+    lado = 'antes' if tipo == 'BAJA' else 'despues'
+    categoria = valores.get(lado)
+    if isinstance(categoria, dict) and categoria.get('id'):
+        return categoria['id']
+    # MODI sin cambio de categoría: la actual del producto, si aún existe
+    return producto_categoria_id if tipo == 'MODI' else None
+
+
+def backfill(apps, schema_editor):
+    MovimientoInventario = apps.get_model('core', 'MovimientoInventario')
+    Categoria = apps.get_model('core', 'Categoria')
+    categorias_por_nombre = dict(Categoria.objects.values_list('nombre', 'id_categoria'))
+
+    qs = (MovimientoInventario.objects
+          .filter(cambios__isnull=True, resumen_operacion__isnull=False)
+          .select_related('producto')
+          .only('id', 'tipo', 'resumen_operacion', 'producto__categoria_id')
+          .order_by('id'))
+    ultimo_id = 0
+    while True:
+        lote = list(qs.filter(id__gt=ultimo_id)[:BATCH_SIZE])
+        if not lote:
+            break
+        ultimo_id = lote[-1].id
+        actualizados = []
+        for mov in lote:
+            cambios = parsear_resumen(mov.tipo, mov.resumen_operacion, categorias_por_nombre)
+            if cambios is None:
+                continue
+            mov.cambios = cambios
+            mov.resumen_operacion = None
+            mov.categoria_id = _categoria_id(mov.tipo, cambios,
+                                             mov.producto.categoria_id if mov.producto else None)
+            actualizados.append(mov)
+        if actualizados:
+            MovimientoInventario.objects.bulk_update(
+                actualizados, ['cambios', 'resumen_operacion', 'categoria'], batch_size=BATCH_SIZE)
+
+
+def revertir(apps, schema_editor):
+    MovimientoInventario = apps.get_model('core', 'MovimientoInventario')
+    qs = MovimientoInventario.objects.filter(cambios__isnull=False).only('id', 'tipo', 'cambios').order_by('id')
+    ultimo_id = 0
+    while True:
+        lote = list(qs.filter(id__gt=ultimo_id)[:BATCH_SIZE])
+        if not lote:
+            break
+        ultimo_id = lote[-1].id
+        for mov in lote:
+            mov.resumen_operacion = formatear_resumen(mov.tipo, mov.cambios)
+        MovimientoInventario.objects.bulk_update(lote, ['resumen_operacion'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+    # Cada lote se confirma por separado (sin una transacción gigante en MySQL)
+    atomic = False
+
+    dependencies = [
+        ('core', '0011_movimiento_cambios_estructurados'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, revertir),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_backfill_movimiento_cambios'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='movimientoinventario',
+            options={},
+        ),
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(fields=['fecha'], name='mov_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(fields=['producto_codigo', 'fecha'], name='mov_codigo_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_movimiento_sin_orden_implicito'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='archivado',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='archivado_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='movimientoinventario',
+            name='tipo',
+            field=models.CharField(choices=[('ALTA', 'Alta'), ('BAJA', 'Baja'), ('MODI', 'Modificación'), ('REST', 'Restauración')], max_length=8),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('archivado', False)), fields=['codigo_producto'], name='producto_activo_codigo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('archivado', True)), fields=['archivado_en'], name='producto_archivado_en_idx'),
+        ),
+    ]
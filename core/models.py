@@ -1,8 +1,14 @@
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Lower, Substr
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django.core.exceptions import ValidationError
 from django.contrib.auth.hashers import make_password, check_password
 import re
 
+from .resumen import formatear_resumen
+
 
 # ------------------------
 #  Modelo Usuario
@@ -25,8 +31,16 @@ class Usuario(models.Model):
         self.password = make_password(raw_password)
 
     def check_password(self, raw_password):
-        """Compara una contraseña sin hash con el hash guardado."""
-        return check_password(raw_password, self.password)
+        """Compara una contraseña sin hash con el hash guardado.
+
+        Si el hash usa un algoritmo o coste distinto al de la política actual
+        (`PASSWORD_HASHERS`), se rehashea y guarda sólo la columna `password`.
+        """
+        def setter(raw):
+            self.set_password(raw)
+            if self.pk:
+                self.save(update_fields=['password'])
+        return check_password(raw_password, self.password, setter)
 
     def __str__(self):
         return self.usuario
@@ -35,6 +49,21 @@ class Usuario(models.Model):
 # ------------------------
 #  Modelo Categoría
 # ------------------------
+class CategoriaQuerySet(models.QuerySet):
+    def con_total_productos(self, q=''):
+        """Categorías (id y nombre) con `total_productos`: sus productos activos.
+
+        Con `q`, cuenta sólo los que coinciden con la búsqueda por código o
+        nombre. Un solo SELECT agrupado (LEFT JOIN), para el filtro por
+        categoría del listado.
+        """
+        filtro = models.Q(producto__archivado=False)
+        if q:
+            filtro &= models.Q(producto__codigo_producto__icontains=q) | models.Q(producto__nombre__icontains=q)
+        return self.only('id_categoria', 'nombre').annotate(
+            total_productos=models.Count('producto', filter=filtro)).order_by('nombre')
+
+
 class Categoria(models.Model):
     id_categoria = models.AutoField(primary_key=True)
     nombre = models.CharField(max_length=100, unique=True)
@@ -43,6 +72,8 @@ class Categoria(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_modificacion = models.DateTimeField(auto_now=True)
 
+    objects = CategoriaQuerySet.as_manager()
+
     def __str__(self):
         return self.nombre
 
@@ -67,6 +98,63 @@ def validar_codigo_producto(value):
 # ------------------------
 #  Modelo Producto
 # ------------------------
+class ProductoQuerySet(models.QuerySet):
+    # Caracteres de `descripcion` que se traen para las tablas (se muestran 120
+    # tras quitar etiquetas HTML); el texto completo sólo lo pide el modal de edición.
+    DESCRIPCION_PREVIEW_CHARS = 500
+
+    def para_listado(self):
+        """Sólo las columnas que muestran las tablas de productos (`main.html`).
+
+        Trae la categoría en el mismo JOIN (id y nombre) y, en lugar de la
+        `descripcion` completa, un prefijo en `descripcion_corta`.
+        """
+        return self.select_related('categoria').only(
+            'id_producto', 'codigo_producto', 'nombre', 'precio', 'cantidad',
+            'categoria__id_categoria', 'categoria__nombre',
+        ).annotate(descripcion_corta=Substr('descripcion', 1, self.DESCRIPCION_PREVIEW_CHARS))
+
+    def activos(self):
+        """Productos no archivados (borrado lógico); lo que muestran los listados."""
+        return self.filter(archivado=False)
+
+    def archivar(self):
+        """Borrado lógico: marca los productos como archivados sin tocar Stock ni movimientos."""
+        return self.update(archivado=True, archivado_en=timezone.now())
+
+    def con_nombre(self, nombre):
+        """Productos cuyo nombre coincide sin distinguir mayúsculas.
+
+        Compara `LOWER(nombre)` con `LOWER(%s)`, la misma expresión del índice
+        único `producto_nombre_lower_uniq`; `nombre__iexact` no lo
+        aprovecharía (en MySQL se traduce a LIKE).
+        """
+        return self.alias(nombre_lower=Lower('nombre')).filter(nombre_lower=Lower(Value(nombre)))
+
+    def con_prefijo(self, texto):
+        """Productos cuyo código o nombre (sin distinguir mayúsculas) empieza por `texto`.
+
+        Ambas condiciones son rangos sobre índices: el único de `codigo_producto`
+        y el de `LOWER(nombre)` (`producto_nombre_lower_uniq`). Anota
+        `coincide_codigo` (1 si coincide el código) para ordenar esas primero.
+        """
+        texto = texto.lower()
+        fin = texto[:-1] + chr(ord(texto[-1]) + 1)
+        por_codigo = models.Q(codigo_producto__gte=texto.upper(), codigo_producto__lt=fin.upper())
+        return self.alias(nombre_lower=Lower('nombre')).filter(
+            por_codigo | models.Q(nombre_lower__gte=texto, nombre_lower__lt=fin)
+        ).annotate(coincide_codigo=models.Case(models.When(por_codigo, then=1), default=0,
+                                               output_field=models.IntegerField()))
+
+    def con_prefijo_codigo(self, letra):
+        """Productos cuyo código empieza por `letra`, como rango sobre el índice único.
+
+        Equivale a `codigo_producto__startswith=letra` para códigos LNNN, pero
+        `codigo >= 'M' AND codigo < 'N'` usa el índice también en SQLite.
+        """
+        return self.filter(codigo_producto__gte=letra, codigo_producto__lt=chr(ord(letra) + 1))
+
+
 class Producto(models.Model):
     id_producto = models.AutoField(primary_key=True)
 
@@ -84,13 +172,33 @@ class Producto(models.Model):
     cantidad = models.IntegerField(default=0)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_modificacion = models.DateTimeField(auto_now=True)
+    # Borrado lógico: los archivados no se listan, se pueden restaurar y el
+    # purgado (core.purga) los elimina de verdad pasado PRODUCTOS_PURGA_DIAS
+    archivado = models.BooleanField(default=False)
+    archivado_en = models.DateTimeField(null=True, blank=True)
+
+    objects = ProductoQuerySet.as_manager()
 
     class Meta:
         constraints = [
             models.CheckConstraint(
                 check=models.Q(precio__gte=0),
                 name="precio_no_negativo"
-            )
+            ),
+            # Nombre único sin distinguir mayúsculas; su índice sirve también a
+            # ProductoQuerySet.con_nombre
+            models.UniqueConstraint(Lower('nombre'), name='producto_nombre_lower_uniq'),
+        ]
+        indexes = [
+            # Productos de una categoría ordenados por código
+            models.Index(fields=['categoria', 'codigo_producto'], name='producto_cat_codigo_idx'),
+            # Índices parciales (PostgreSQL/SQLite; MySQL no los admite y los omite,
+            # ver SILENCED_SYSTEM_CHECKS): listado de activos por código y
+            # candidatos a purgar por fecha de archivado
+            models.Index(fields=['codigo_producto'], condition=models.Q(archivado=False),
+                         name='producto_activo_codigo_idx'),
+            models.Index(fields=['archivado_en'], condition=models.Q(archivado=True),
+                         name='producto_archivado_en_idx'),
         ]
 
     def __str__(self):
@@ -100,11 +208,40 @@ class Producto(models.Model):
 # ------------------------
 #  Modelo Movimiento Inventario
 # ------------------------
+class MovimientoQuerySet(models.QuerySet):
+    # Sin Meta.ordering: ordenar sólo donde se necesita, con estos métodos
+    # (índices mov_fecha_idx y mov_codigo_fecha_idx); count()/exists()/agregados
+    # no llevan ORDER BY.
+    def recientes(self):
+        """Del más reciente al más antiguo (id como desempate)."""
+        return self.order_by('-fecha', '-id')
+
+    def de_producto(self, codigo):
+        """Historial de un producto por código, del más reciente al más antiguo."""
+        return self.filter(producto_codigo=codigo).recientes()
+
+    def cambios_de(self, campo, categoria=None, desde=None, hasta=None):
+        """Modificaciones (MODI) que cambiaron `campo`, opcionalmente por categoría y fechas.
+
+        `categoria` y el rango de `fecha` usan el índice (categoria, fecha); la
+        condición sobre `cambios` se evalúa sólo en las filas de ese rango.
+        """
+        qs = self.filter(tipo='MODI', cambios__has_key=campo)
+        if categoria is not None:
+            qs = qs.filter(categoria=categoria)
+        if desde is not None:
+            qs = qs.filter(fecha__gte=desde)
+        if hasta is not None:
+            qs = qs.filter(fecha__lt=hasta)
+        return qs
+
+
 class MovimientoInventario(models.Model):
     TIPO_MOV = [
         ("ALTA", "Alta"),
         ("BAJA", "Baja"),
         ("MODI", "Modificación"),
+        ("REST", "Restauración"),
     ]
 
     producto = models.ForeignKey(Producto, on_delete=models.SET_NULL, null=True)
@@ -113,12 +250,41 @@ class MovimientoInventario(models.Model):
     # Campos redundantes para auditoría: se rellenan al crear el movimiento
     producto_nombre = models.CharField(max_length=200, null=True, blank=True)
     producto_codigo = models.CharField(max_length=10, null=True, blank=True)
+    # Texto libre de los movimientos antiguos que no se pudieron convertir a `cambios`
     resumen_operacion = models.TextField(null=True, blank=True)
+    # Cambios estructurados {campo: {'antes': ..., 'despues': ...}} (ver core.resumen)
+    cambios = models.JSONField(null=True, blank=True)
+    # Categoría del producto en el movimiento (la nueva en una MODI), para filtrar por índice
+    categoria = models.ForeignKey(Categoria, on_delete=models.SET_NULL, null=True, blank=True,
+                                  related_name='movimientos')
     tipo = models.CharField(max_length=8, choices=TIPO_MOV)
-    fecha = models.DateTimeField(auto_now_add=True)
+    # default (no auto_now_add) para conservar la fecha original al insertar
+    # movimientos diferidos desde el journal de auditoría (core.auditoria)
+    fecha = models.DateTimeField(default=timezone.now)
+    # Identificador del movimiento en el journal write-behind: hace idempotente
+    # el re-drenado tras una caída (NULL en los registrados de forma síncrona)
+    evento = models.CharField(max_length=32, unique=True, null=True, blank=True, editable=False)
+
+    objects = MovimientoQuerySet.as_manager()
 
     class Meta:
-        ordering = ["-fecha"]
+        indexes = [
+            # Listados globales por fecha (MovimientoQuerySet.recientes) y rangos de fechas
+            models.Index(fields=['fecha'], name='mov_fecha_idx'),
+            # Historial de un producto (MovimientoQuerySet.de_producto)
+            models.Index(fields=['producto_codigo', 'fecha'], name='mov_codigo_fecha_idx'),
+            # Historial de un producto por tipo de movimiento, del más reciente al más antiguo
+            models.Index(fields=['producto_codigo', 'tipo', 'fecha'], name='mov_codigo_tipo_fecha_idx'),
+            # Movimientos de una categoría en un rango de fechas (MovimientoQuerySet.cambios_de)
+            models.Index(fields=['categoria', 'fecha'], name='mov_categoria_fecha_idx'),
+        ]
+
+    @cached_property
+    def resumen(self):
+        """Texto legible del movimiento, generado desde `cambios` al mostrarlo."""
+        if self.cambios is None:
+            return self.resumen_operacion or ''
+        return formatear_resumen(self.tipo, self.cambios)
 
     def __str__(self):
         # Mostrar el nombre ya guardado si existe, sino el relacionado (o '(eliminado)')
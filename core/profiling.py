@@ -0,0 +1,105 @@
+"""Perfilado opcional con cProfile de requests individuales.
+
+Se activa con `REQUEST_PROFILING_ENABLED = True` y, para cada request:
+- header `X-Profile: 1` o parámetro `?__profile=1`, o
+- muestreo aleatorio con `REQUEST_PROFILING_SAMPLE_RATE`.
+
+Los perfiles se guardan como `<REQUEST_PROFILING_DIR>/<ruta>/<request_id>.prof`
+y se podan (los más antiguos primero) para no superar
+`REQUEST_PROFILING_MAX_BYTES`. `python manage.py agregar_perfiles` los combina.
+"""
+import cProfile
+import os
+import random
+import re
+
+from django.conf import settings
+
+_SLUG_RE = re.compile(r'[^A-Za-z0-9]+')
+
+
+def profiles_dir():
+    return str(getattr(settings, 'REQUEST_PROFILING_DIR', os.path.join(settings.BASE_DIR, 'profiles')))
+
+
+def route_slug(route):
+    """Nombre de directorio seguro para una ruta (p. ej. 'core/producto/update/<int:producto_id>/')."""
+    slug = _SLUG_RE.sub('_', route or '').strip('_')
+    return slug or 'root'
+
+
+def should_profile(request):
+    if not getattr(settings, 'REQUEST_PROFILING_ENABLED', False):
+        return False
+    if request.META.get('HTTP_X_PROFILE') == '1' or request.GET.get('__profile') == '1':
+        return True
+    rate = getattr(settings, 'REQUEST_PROFILING_SAMPLE_RATE', 0.0)
+    return rate > 0.0 and random.random() < rate
+
+
+def run_profiled(func, *args):
+    """Ejecuta `func(*args)` bajo cProfile. Devuelve (resultado, profiler o None).
+
+    Si ya hay otro profiler activo en el hilo, ejecuta sin perfilar.
+    """
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return func(*args), None
+    try:
+        result = func(*args)
+    finally:
+        profiler.disable()
+    return result, profiler
+
+
+def save_profile(profiler, route, request_id):
+    """Guarda el perfil en disco y aplica el límite de tamaño. Devuelve la ruta del archivo."""
+    directory = os.path.join(profiles_dir(), route_slug(route))
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{request_id}.prof')
+    profiler.dump_stats(path)
+    enforce_size_cap(getattr(settings, 'REQUEST_PROFILING_MAX_BYTES', 50 * 1024 * 1024))
+    return path
+
+
+def iter_profiles(route_filter=None):
+    """Rutas de los .prof guardados, opcionalmente filtradas por subcadena del slug de ruta."""
+    base = profiles_dir()
+    if not os.path.isdir(base):
+        return []
+    found = []
+    for slug in sorted(os.listdir(base)):
+        if route_filter and route_slug(route_filter) not in slug:
+            continue
+        directory = os.path.join(base, slug)
+        if not os.path.isdir(directory):
+            continue
+        found.extend(os.path.join(directory, f) for f in sorted(os.listdir(directory)) if f.endswith('.prof'))
+    return found
+
+
+def enforce_size_cap(max_bytes):
+    """Borra los perfiles más antiguos hasta que el total no supere `max_bytes`."""
+    if not max_bytes:
+        return 0
+    files = []
+    for path in iter_profiles():
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        files.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
@@ -0,0 +1,82 @@
+"""Purgado de los productos archivados (borrado lógico).
+
+Eliminar un producto sólo lo archiva (`Producto.archivado`); `purgar_productos`
+borra de verdad los archivados hace más de `PRODUCTOS_PURGA_DIAS` días. Trabaja
+en lotes pequeños, cada uno en transacciones cortas:
+
+1. Se reclama el lote: un UPDATE condicionado pone `archivado_en = NULL` a los
+   productos que siguen archivados. `restaurar_producto` sólo acepta
+   archivados con `archivado_en`, así que de una restauración concurrente y la
+   purga gana exactamente una: un producto restaurado antes no se reclama ni
+   se toca, y uno reclamado ya no se puede restaurar.
+2. Se desvinculan los movimientos de los productos reclamados
+   (`producto = NULL`, en tramos de como mucho `batch_size` filas, para no
+   hacer un UPDATE enorme sobre un historial largo).
+3. Se borran los productos reclamados, con su Stock en cascada. Los
+   movimientos conservan `producto_codigo` y `producto_nombre`.
+
+Si la purga se interrumpe, los productos reclamados (archivados sin
+`archivado_en`) se terminan de purgar en la siguiente ejecución.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import MovimientoInventario, Producto
+
+
+def horizonte(ahora=None):
+    """Los productos archivados antes de esta fecha se pueden purgar (None: sin purgado)."""
+    dias = getattr(settings, 'PRODUCTOS_PURGA_DIAS', None)
+    if dias is None:
+        return None
+    return (ahora or timezone.now()) - timedelta(days=dias)
+
+
+def _desvincular_movimientos(producto_ids, batch_size):
+    # Sólo los de productos reclamados por la purga (archivados sin archivado_en)
+    qs = MovimientoInventario.objects.filter(producto_id__in=producto_ids, producto__archivado=True,
+                                             producto__archivado_en__isnull=True)
+    while True:
+        with transaction.atomic():
+            ids = list(qs.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return
+            MovimientoInventario.objects.filter(id__in=ids).update(producto=None)
+
+
+def purgar_productos(antes_de=None, batch_size=None, max_batches=None, pause_s=0.0):
+    """Borra los productos archivados con `archivado_en < antes_de` (por defecto, el horizonte).
+
+    Devuelve {'purgados', 'lotes', 'segundos'}.
+    """
+    antes_de = antes_de or horizonte()
+    batch_size = batch_size or getattr(settings, 'PRODUCTOS_PURGA_LOTE', 200)
+    stats = {'purgados': 0, 'lotes': 0, 'segundos': 0.0}
+    if antes_de is None:
+        return stats
+    inicio = time.perf_counter()
+    # Incluye los reclamados por una purga anterior que no terminó
+    candidatos = Producto.objects.filter(Q(archivado_en__lt=antes_de) | Q(archivado_en__isnull=True), archivado=True)
+    qs = candidatos.order_by('id_producto').values_list('id_producto', flat=True)
+    ultimo_id = 0
+    while max_batches is None or stats['lotes'] < max_batches:
+        ids = list(qs.filter(id_producto__gt=ultimo_id)[:batch_size])
+        if not ids:
+            break
+        ultimo_id = ids[-1]
+        candidatos.filter(id_producto__in=ids).update(archivado_en=None)
+        _desvincular_movimientos(ids, batch_size)
+        with transaction.atomic():
+            _, por_modelo = Producto.objects.filter(id_producto__in=ids, archivado=True,
+                                                    archivado_en__isnull=True).delete()
+        stats['purgados'] += por_modelo.get(Producto._meta.label, 0)
+        stats['lotes'] += 1
+        if pause_s:
+            time.sleep(pause_s)
+    stats['segundos'] = round(time.perf_counter() - inicio, 3)
+    return stats
@@ -0,0 +1,73 @@
+"""Texto legible (en español) de los movimientos de inventario.
+
+Los movimientos guardan los cambios de forma estructurada en
+`MovimientoInventario.cambios`: `{campo: {'antes': ..., 'despues': ...}}`, con
+`categoria` como `{'id': ..., 'nombre': ...}`. En una ALTA (y en una
+restauración, REST) sólo hay `despues` y en una BAJA sólo `antes`, con el
+estado completo del producto. El texto se genera al mostrarlo
+(`MovimientoInventario.resumen`).
+
+Los textos antiguos de `resumen_operacion` se convirtieron con la migración
+0012, que tiene su propia copia congelada del formato y del parseo.
+"""
+
+# mapeo de campos internos a etiquetas legibles
+ETIQUETAS = {
+    'precio': 'Precio',
+    'nombre': 'Nombre',
+    'descripcion': 'Descripción',
+    'categoria': 'Categoría',
+    'cantidad': 'Cantidad',
+}
+# Movimientos que guardan el estado completo del producto (REST: restauración
+# de un producto archivado, con el estado restaurado en `despues`)
+_TITULOS_ESTADO = {'ALTA': 'Alta', 'BAJA': 'Baja', 'REST': 'Restauración'}
+
+
+def formatear_cambios(cambios):
+    """Convierte el dict `cambios` en una cadena legible en español.
+
+    Devuelve por ejemplo: "Cambios: Precio 500 a 201, Nombre asdf a asdfaa".
+    """
+    if not cambios:
+        return ''
+    parts = []
+    for field, vals in cambios.items():
+        antes = vals.get('antes') if isinstance(vals, dict) else None
+        despues = vals.get('despues') if isinstance(vals, dict) else None
+        label = ETIQUETAS.get(field, field.capitalize())
+        # la categoría se guarda como dict con id/nombre
+        if field == 'categoria':
+            name_before = antes.get('nombre') if isinstance(antes, dict) else (antes or '')
+            name_after = despues.get('nombre') if isinstance(despues, dict) else (despues or '')
+            parts.append(f"{label} {name_before or '(ninguna)'} a {name_after or '(ninguna)'}")
+        else:
+            parts.append(f"{label} {antes if antes is not None else '(ninguno)'} a {despues if despues is not None else '(ninguno)'}")
+    return 'Cambios: ' + ', '.join(parts)
+
+
+def estado_producto(producto, categoria, cantidad, lado):
+    """`cambios` de una ALTA (`lado='despues'`) o BAJA (`lado='antes'`)."""
+    otro = 'antes' if lado == 'despues' else 'despues'
+    valores = {
+        'nombre': producto.nombre,
+        'codigo': producto.codigo_producto,
+        'categoria': {'id': categoria.pk, 'nombre': categoria.nombre} if categoria else None,
+        'precio': producto.precio,
+        'cantidad': cantidad,
+    }
+    return {campo: {otro: None, lado: valor} for campo, valor in valores.items()}
+
+
+def formatear_resumen(tipo, cambios):
+    """Texto del movimiento a partir de su tipo y `cambios`."""
+    if tipo in _TITULOS_ESTADO:
+        lado = 'antes' if tipo == 'BAJA' else 'despues'
+        valores = {campo: (vals or {}).get(lado) for campo, vals in (cambios or {}).items()}
+        categoria = valores.get('categoria')
+        categoria_nombre = categoria.get('nombre') if isinstance(categoria, dict) else categoria
+        return (f"{_TITULOS_ESTADO[tipo]}: Nombre {valores.get('nombre')}, "
+                f"Código {valores.get('codigo')}, Categoría {categoria_nombre or '(ninguna)'}, "
+                f"Precio {valores.get('precio')}, Cantidad {valores.get('cantidad')}")
+    return formatear_cambios(cambios)
+
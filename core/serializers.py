@@ -0,0 +1,106 @@
+"""Serialización JSON rápida para los endpoints AJAX.
+
+Cada modelo declara una sola vez qué campos expone (`PRODUCTO`, `CATEGORIA`,
+`MOVIMIENTO`). Los querysets se proyectan con `.values_list()` sobre esos
+campos, sin instanciar modelos. `FastJsonResponse` codifica con orjson si
+está instalado y, si no, con el `json` de la stdlib y `DjangoJSONEncoder`.
+"""
+import json
+from operator import attrgetter
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+from .models import Producto, Categoria, MovimientoInventario
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+_django_encoder = DjangoJSONEncoder()
+
+
+def _default(obj):
+    # Tipos que orjson no conoce (Decimal, Promise de traducciones, ...)
+    return _django_encoder.default(obj)
+
+
+def dumps(data):
+    """Codifica `data` a JSON (bytes UTF-8)."""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default)
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class FastJsonResponse(HttpResponse):
+    """Equivalente a `JsonResponse` con el codificador rápido."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
+
+
+class ModelSerializer:
+    """Campos expuestos de un modelo: clave JSON -> campo/lookup del ORM.
+
+    Los lookups usan nombres válidos para `.values_list()` (p. ej.
+    `categoria_id` en lugar de `categoria`), de modo que el mismo spec sirve
+    para un queryset (`rows`) y para una instancia ya cargada (`one`).
+    """
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.keys = tuple(fields)
+        self.lookups = tuple(fields.values())
+        self._getters = tuple(attrgetter(lookup.replace('__', '.')) for lookup in self.lookups)
+
+    def rows(self, queryset=None):
+        """Lista de dicts para `queryset` (por defecto, todos los objetos)."""
+        if queryset is None:
+            queryset = self.model._default_manager.all()
+        keys = self.keys
+        return [dict(zip(keys, row)) for row in queryset.values_list(*self.lookups)]
+
+    def first(self, queryset):
+        """Dict del primer resultado de `queryset` o None."""
+        row = queryset.values_list(*self.lookups).first()
+        return dict(zip(self.keys, row)) if row is not None else None
+
+    def one(self, instance):
+        """Dict para una instancia ya cargada (sin queries extra)."""
+        return {key: getter(instance) for key, getter in zip(self.keys, self._getters)}
+
+
+PRODUCTO = ModelSerializer(Producto, {
+    'id': 'id_producto',
+    'codigo_producto': 'codigo_producto',
+    'nombre': 'nombre',
+    'descripcion': 'descripcion',
+    'categoria': 'categoria_id',
+    'precio': 'precio',
+    'cantidad': 'cantidad',
+})
+
+CATEGORIA = ModelSerializer(Categoria, {
+    'id': 'id_categoria',
+    'nombre': 'nombre',
+})
+
+MOVIMIENTO = ModelSerializer(MovimientoInventario, {
+    'id': 'id',
+    'tipo': 'tipo',
+    'cantidad': 'cantidad',
+    'producto': 'producto_id',
+    'producto_codigo': 'producto_codigo',
+    'producto_nombre': 'producto_nombre',
+    'usuario': 'usuario_id',
+    'categoria': 'categoria_id',
+    'cambios': 'cambios',
+    'fecha': 'fecha',
+})
+
+
+def categorias_ordenadas():
+    """Categorías (id, nombre) ordenadas por nombre, como las espera el <select>."""
+    return CATEGORIA.rows(Categoria.objects.order_by('nombre'))
@@ -0,0 +1,54 @@
+"""Barrido de sesiones expiradas en lotes pequeños.
+
+`clearsessions` de Django borra todas las sesiones expiradas con un único
+DELETE, que en una tabla grande bloquea durante mucho tiempo. Aquí se borran
+por lotes de claves seleccionadas por el índice de `expire_date`, cada lote en
+su propia transacción corta.
+"""
+import logging
+import time
+
+from django.contrib.sessions.models import Session
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger('core.tasks')
+
+
+def sweep_expired_sessions(batch_size=500, max_batches=None, pause_s=0.0, now=None):
+    """Borra sesiones con `expire_date` vencida. Devuelve {'eliminadas', 'lotes', 'segundos'}."""
+    now = now or timezone.now()
+    start = time.perf_counter()
+    removed = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        keys = list(
+            Session.objects.filter(expire_date__lt=now)
+            .order_by('expire_date')
+            .values_list('session_key', flat=True)[:batch_size]
+        )
+        if not keys:
+            break
+        deleted, _ = Session.objects.filter(session_key__in=keys).delete()
+        removed += deleted
+        batches += 1
+        if len(keys) < batch_size:
+            break
+        if pause_s:
+            time.sleep(pause_s)
+    stats = {'eliminadas': removed, 'lotes': batches, 'segundos': round(time.perf_counter() - start, 3)}
+    logger.info('Barrido de sesiones: %(eliminadas)s eliminadas en %(lotes)s lotes (%(segundos)ss)', stats)
+    return stats
+
+
+def compact_session_table():
+    """Recupera el espacio de las filas borradas (OPTIMIZE TABLE en MySQL).
+
+    En otros motores no hace nada y devuelve False.
+    """
+    if connection.vendor != 'mysql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(f'OPTIMIZE TABLE {connection.ops.quote_name(Session._meta.db_table)}')
+        cursor.fetchall()
+    return True
@@ -0,0 +1,82 @@
+"""Tareas periódicas en proceso (hilos daemon) para trabajos de mantenimiento.
+
+Pensado para despliegues pequeños sin cron/celery: cada tarea se registra una
+sola vez por proceso con `start_periodic_task`. Para varios workers conviene
+usar los management commands equivalentes desde cron.
+"""
+import logging
+import os
+import sys
+import threading
+
+logger = logging.getLogger('core.tasks')
+
+_TASKS = {}
+_tasks_lock = threading.Lock()
+
+
+class PeriodicTask:
+    """Ejecuta `func()` cada `interval` segundos en un hilo daemon hasta `stop()`."""
+
+    def __init__(self, name, interval, func):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.runs = 0
+        self.last_result = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=f'periodic-{name}', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    @property
+    def alive(self):
+        return self._thread.is_alive()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.last_result = self.func()
+            except Exception:
+                logger.exception('Error en la tarea periódica %s', self.name)
+            finally:
+                self.runs += 1
+                # Cada ejecución usa sus propias conexiones: cerrarlas al terminar
+                from django.db import connections
+                connections.close_all()
+
+
+def start_periodic_task(name, interval, func):
+    """Arranca (una sola vez por proceso) una tarea periódica y la devuelve."""
+    with _tasks_lock:
+        task = _TASKS.get(name)
+        if task is not None and task.alive:
+            return task
+        task = PeriodicTask(name, interval, func).start()
+        _TASKS[name] = task
+        return task
+
+
+def stop_periodic_task(name, timeout=None):
+    with _tasks_lock:
+        task = _TASKS.pop(name, None)
+    if task is not None:
+        task.stop(timeout)
+
+
+def background_tasks_allowed():
+    """False en management commands (migrate, test, shell...) y en el proceso
+    vigilante del autoreload de runserver; True en servidores WSGI/ASGI."""
+    argv = sys.argv
+    if argv and os.path.basename(argv[0]) == 'manage.py':
+        if argv[1:2] != ['runserver']:
+            return False
+        return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in argv
+    return True
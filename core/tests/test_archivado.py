@@ -0,0 +1,143 @@
+import gzip
+import io
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import override_settings
+
+from core import archivado
+from core.models import Categoria, MovimientoInventario, Producto, Usuario
+from .test_logger import LoggedTestCase
+
+
+class ArchivadoMovimientosTests(LoggedTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='archivo-mov-')
+        self.settings_ctx = override_settings(MOVIMIENTOS_ARCHIVO_DIR=self.dir, MOVIMIENTOS_RETENCION_DIAS=90)
+        self.settings_ctx.enable()
+        cat = Categoria.objects.create(nombre='Arch')
+        self.prod = Producto.objects.create(codigo_producto='K001', nombre='Clavo', descripcion='x',
+                                            precio=1, categoria=cat)
+        self.ahora = datetime.now(dt_timezone.utc)
+        # Dos meses antiguos (enero y febrero de 2024) y movimientos recientes
+        self.fechas_antiguas = [datetime(2024, 1, d, 12, tzinfo=dt_timezone.utc) for d in (5, 20)] + \
+                               [datetime(2024, 2, d, 12, tzinfo=dt_timezone.utc) for d in (1, 2, 3)]
+        for i, fecha in enumerate(self.fechas_antiguas):
+            MovimientoInventario.objects.create(producto=self.prod, producto_codigo='K001', cantidad=i, tipo='MODI',
+                                                cambios={'precio': {'antes': i, 'despues': i + 1}}, fecha=fecha)
+        for dias in (1, 2):
+            MovimientoInventario.objects.create(producto=self.prod, producto_codigo='K001', cantidad=0, tipo='MODI',
+                                                resumen_operacion='reciente', fecha=self.ahora - timedelta(days=dias))
+
+    def tearDown(self):
+        self.settings_ctx.disable()
+        shutil.rmtree(self.dir, ignore_errors=True)
+        super().tearDown()
+
+    def test_archiva_por_meses_en_lotes(self):
+        stats = archivado.archivar_movimientos(batch_size=2)
+        self.assertEqual(stats['archivados'], 5)
+        self.assertEqual(stats['lotes'], 3)
+        self.assertEqual(stats['meses'], ['2024-01', '2024-02'])
+        self.assertEqual(MovimientoInventario.objects.count(), 2)
+        # Un archivo por lote y mes (febrero quedó repartido en dos lotes), sin temporales
+        archivos = sorted(f for f in os.listdir(self.dir) if not f.startswith('.'))
+        self.assertEqual([f.split('.')[0] for f in archivos],
+                         ['movimientos-2024-01', 'movimientos-2024-02', 'movimientos-2024-02'])
+        self.assertTrue(all(f.endswith('.jsonl.gz') for f in archivos))
+        lineas = 0
+        for nombre in archivos[1:]:
+            with gzip.open(os.path.join(self.dir, nombre), 'rt') as fh:
+                lineas += len(fh.readlines())
+        self.assertEqual(lineas, 3)
+
+    def test_historial_une_tabla_y_archivo_solo_si_el_rango_lo_pide(self):
+        ids_antes = list(MovimientoInventario.objects.order_by('-fecha').values_list('id', flat=True))
+        archivado.archivar_movimientos(batch_size=2)
+
+        completo = archivado.historial(desde=datetime(2024, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual([m.id for m in completo], ids_antes)
+        self.assertEqual([m.archivado for m in completo], [False, False] + [True] * 5)
+        self.assertEqual(completo[-1].resumen, 'Cambios: Precio 0 a 1')
+
+        febrero = archivado.historial(desde=datetime(2024, 2, 2, tzinfo=dt_timezone.utc),
+                                      hasta=datetime(2024, 3, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual([m.fecha.day for m in febrero], [3, 2])
+
+        # Rango dentro del horizonte: sólo la tabla (los archivos no se abren)
+        shutil.rmtree(self.dir)
+        recientes = archivado.historial(desde=self.ahora - timedelta(days=7))
+        self.assertEqual(len(recientes), 2)
+
+    def test_historial_con_limite_no_abre_archivos_si_la_tabla_basta(self):
+        archivado.archivar_movimientos(batch_size=2)
+        with mock.patch('core.archivado._leer') as leer:
+            movs = archivado.historial(desde=datetime(2024, 1, 1, tzinfo=dt_timezone.utc), limite=2)
+        leer.assert_not_called()
+        self.assertEqual([m.archivado for m in movs], [False, False])
+        # Con un límite mayor se completa con el mes archivado más reciente y no se lee enero
+        movs = archivado.historial(desde=datetime(2024, 1, 1, tzinfo=dt_timezone.utc), limite=4)
+        self.assertEqual([m.fecha for m in movs[2:]], [self.fechas_antiguas[4], self.fechas_antiguas[3]])
+        self.assertTrue(all(m.archivado for m in movs[2:]))
+
+    def test_endpoint_movimientos_json(self):
+        user = Usuario.objects.create(nombres='Arch', usuario='arch1', email='arch1@example.test')
+        session = self.client.session
+        session['conectado_usuario'] = user.id_usuario
+        session.save()
+        archivado.archivar_movimientos(batch_size=2)
+        resp = self.client.get('/core/movimientos/json/', {'desde': '2024-01-01', 'limite': 3})
+        self.assertEqual(resp.status_code, 200)
+        movs = resp.json()['movimientos']
+        self.assertEqual([m['archivado'] for m in movs], [False, False, True])
+        self.assertEqual(movs[0]['resumen'], 'reciente')
+        self.assertEqual(movs[2]['producto_codigo'], 'K001')
+        resp = self.client.get('/core/movimientos/json/', {'desde': '2024-13-01'})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_un_solo_proceso_archiva_a_la_vez(self):
+        bloqueo = archivado._tomar_bloqueo()
+        try:
+            # Otro proceso (o hebra) con el lock: no se archiva nada
+            self.assertIsNone(archivado._tomar_bloqueo())
+            stats = archivado.archivar_movimientos(batch_size=2)
+            self.assertEqual((stats['omitido'], stats['archivados']), (True, 0))
+            out = io.StringIO()
+            call_command('archivar_movimientos', stdout=out)
+            self.assertIn('Otro proceso está archivando', out.getvalue())
+            self.assertEqual(MovimientoInventario.objects.count(), 7)
+        finally:
+            archivado._soltar_bloqueo(bloqueo)
+        self.assertEqual(archivado.archivar_movimientos(batch_size=2)['archivados'], 5)
+
+    def test_escritura_interrumpida_no_deja_archivo_a_medias(self):
+        with mock.patch('core.archivado.os.replace', side_effect=OSError('caída')):
+            with self.assertRaises(OSError):
+                archivado.archivar_movimientos(batch_size=10)
+        # Sólo queda el temporal: ningún archivo con nombre definitivo
+        self.assertFalse([f for f in os.listdir(self.dir) if f.endswith('.jsonl.gz')])
+        self.assertEqual(list(archivado.iter_archivados()), [])
+        # Nada se borró de la tabla y el siguiente intento archiva todo
+        self.assertEqual(MovimientoInventario.objects.count(), 7)
+        self.assertEqual(archivado.archivar_movimientos(batch_size=10)['archivados'], 5)
+
+    def test_reintento_tras_caida_no_duplica_en_el_historial(self):
+        archivado.archivar_movimientos(batch_size=10)
+        # Simular una caída antes del borrado: el mismo lote escrito dos veces
+        filas = [{'id': 999, 'cantidad': 1, 'tipo': 'BAJA', 'fecha': '2024-01-07T00:00:00+00:00'}]
+        # Con otro tamaño de lote el reintento cae en otro archivo del mismo mes
+        archivado._escribir(os.path.join(self.dir, 'movimientos-2024-01.999.jsonl.gz'), filas)
+        archivado._escribir(os.path.join(self.dir, 'movimientos-2024-01.998.jsonl.gz'), filas)
+        ids = [m.id for m in archivado.iter_archivados()]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(len(ids), 6)
+
+    def test_comando_archivar_movimientos(self):
+        out = io.StringIO()
+        call_command('archivar_movimientos', '--dias', '30', '--lote', '100', stdout=out)
+        self.assertIn('Movimientos archivados: 5', out.getvalue())
+        self.assertEqual(MovimientoInventario.objects.count(), 2)
@@ -0,0 +1,173 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import auditoria
+from core.auditoria import AuditJournal, registrar_movimiento
+from core.models import Categoria, MovimientoInventario, Producto, Usuario
+from .test_logger import LoggedTestCase
+
+PID_INEXISTENTE = 4194303  # mayor que el pid_max por defecto de Linux
+
+
+class AuditoriaWriteBehindTests(LoggedTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='audit-journal-')
+        self.settings_ctx = override_settings(AUDIT_WRITE_BEHIND=True, AUDIT_JOURNAL_DIR=self.dir,
+                                              AUDIT_JOURNAL_FSYNC_INTERVAL_S=0.0)
+        self.settings_ctx.enable()
+        self.cat = Categoria.objects.create(nombre='Aud')
+        self.user = Usuario.objects.create(nombres='Aud', usuario='aud1', email='aud1@example.test')
+        session = self.client.session
+        session['conectado_usuario'] = self.user.id_usuario
+        session.save()
+
+    def tearDown(self):
+        for journal in list(auditoria._journals.values()):
+            journal.close()
+        auditoria._journals.clear()
+        self.settings_ctx.disable()
+        shutil.rmtree(self.dir, ignore_errors=True)
+        super().tearDown()
+
+    def _alta(self, codigo='A001', nombre='Alicate'):
+        return self.client.post(reverse('producto-add'), {
+            'codigo_producto': codigo, 'nombre': nombre, 'descripcion': 'x',
+            'categoria': str(self.cat.id_categoria), 'precio': '10', 'cantidad': '2',
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def _lineas_journal(self):
+        journal = auditoria.journal_actual()
+        with open(journal.path, 'rb') as fh:
+            return fh.read().splitlines()
+
+    def test_alta_va_al_journal_y_el_drenador_la_inserta(self):
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self._alta().status_code, 201)
+        self.assertFalse([q for q in ctx.captured_queries if 'core_movimientoinventario' in q['sql']])
+        self.assertEqual(MovimientoInventario.objects.count(), 0)
+        self.assertEqual(len(self._lineas_journal()), 1)
+
+        stats = auditoria.drenar_auditoria()
+        self.assertEqual(stats['insertados'], 1)
+        mov = MovimientoInventario.objects.get()
+        self.assertEqual((mov.tipo, mov.producto_codigo, mov.usuario_id), ('ALTA', 'A001', self.user.id_usuario))
+        self.assertEqual(mov.producto, Producto.objects.get(codigo_producto='A001'))
+        self.assertIsNotNone(mov.evento)
+        # Journal vaciado tras drenar todo
+        self.assertEqual(self._lineas_journal(), [])
+        self.assertEqual(auditoria.journal_actual().read_checkpoint(), 0)
+
+    def test_transaccion_revertida_no_se_registra(self):
+        producto = Producto.objects.create(codigo_producto='A002', nombre='Llave', descripcion='x',
+                                           precio=1, categoria=self.cat)
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    registrar_movimiento(producto=producto, cantidad=1, tipo='MODI')
+                    raise RuntimeError('rollback')
+            except RuntimeError:
+                pass
+        self.assertFalse(os.path.exists(auditoria.journal_actual().path))
+
+    @override_settings(PRODUCTOS_BORRADO_LOGICO=False)
+    def test_baja_de_producto_borrado_queda_sin_fk(self):
+        producto = Producto.objects.create(codigo_producto='A003', nombre='Lima', descripcion='x',
+                                           precio=1, categoria=self.cat)
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(reverse('producto-eliminar', args=[producto.id_producto]))
+        self.assertEqual(resp.status_code, 302)
+        auditoria.drenar_auditoria()
+        mov = MovimientoInventario.objects.get(tipo='BAJA')
+        self.assertIsNone(mov.producto_id)
+        self.assertEqual(mov.producto_codigo, 'A003')
+
+    def test_recuperacion_tras_caida_sin_duplicados(self):
+        """Journal huérfano con un lote insertado pero sin checkpoint: se recupera sin duplicar."""
+        path = os.path.join(self.dir, f'movimientos-{PID_INEXISTENTE}.jsonl')
+        journal = AuditJournal(path)
+        registros = [{'evento': f'{i:032x}', 'producto_id': None, 'usuario_id': self.user.id_usuario,
+                      'cantidad': i, 'tipo': 'MODI', 'producto_codigo': f'Z{i:03d}',
+                      'fecha': '2025-01-0%dT10:00:00+00:00' % (i + 1)} for i in range(3)]
+        for registro in registros:
+            journal.append(registro)
+        # Escritura a medias del último registro (caída durante append)
+        with open(path, 'ab') as fh:
+            fh.write(b'{"evento": "incompleto"')
+        journal.close()
+        # El proceso caído llegó a insertar los dos primeros pero no a guardar el checkpoint
+        auditoria._insertar(registros[:2])
+
+        out = io.StringIO()
+        call_command('drenar_auditoria', stdout=out)
+        # Sólo el que faltaba: los dos ya insertados se saltan por `evento`
+        self.assertIn('Movimientos insertados: 1', out.getvalue())
+        self.assertEqual(MovimientoInventario.objects.count(), 3)
+        self.assertEqual(sorted(MovimientoInventario.objects.values_list('producto_codigo', flat=True)),
+                         ['Z000', 'Z001', 'Z002'])
+        self.assertEqual(MovimientoInventario.objects.get(producto_codigo='Z002').fecha.day, 3)
+        # La línea incompleta no se consume: el journal huérfano sigue ahí
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(AuditJournal(path).pending(AuditJournal(path).read_checkpoint(), 10)[0], [])
+
+    def test_caida_al_vaciar_el_journal_no_pierde_movimientos(self):
+        journal = auditoria.journal_actual()
+        journal.append({'evento': 'a' * 32, 'cantidad': 1, 'tipo': 'MODI', 'producto_codigo': 'Y001', 'fecha': None})
+        # Caída entre los dos pasos del vaciado (checkpoint a 0 y truncado), en el orden que sea
+        pasos = []
+        truncate, write_checkpoint = os.truncate, AuditJournal.write_checkpoint
+
+        def paso(nombre, real, *args):
+            pasos.append(nombre)
+            if len(pasos) == 2:
+                raise OSError('caída')
+            return real(*args)
+
+        def checkpoint(self, offset):
+            if offset:
+                return write_checkpoint(self, offset)
+            return paso('checkpoint', write_checkpoint, self, offset)
+
+        with mock.patch('core.auditoria.os.truncate', lambda *a: paso('truncate', truncate, *a)), \
+                mock.patch.object(AuditJournal, 'write_checkpoint', checkpoint):
+            with self.assertRaises(OSError):
+                journal.drain()
+        journal.append({'evento': 'b' * 32, 'cantidad': 2, 'tipo': 'MODI', 'producto_codigo': 'Y002', 'fecha': None})
+        journal.drain()
+        self.assertEqual(sorted(MovimientoInventario.objects.values_list('producto_codigo', flat=True)),
+                         ['Y001', 'Y002'])
+        self.assertEqual((journal.read_checkpoint(), os.path.getsize(journal.path)), (0, 0))
+
+    def test_registro_invalido_no_se_descarta_en_silencio(self):
+        journal = auditoria.journal_actual()
+        journal.append({'evento': 'c' * 32, 'cantidad': 1, 'tipo': 'MODI', 'fecha': None})
+        journal.append({'evento': 'd' * 32, 'cantidad': None, 'tipo': 'MODI', 'fecha': None})
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            journal.drain()
+        # El lote no se marca como drenado ni se inserta a medias
+        self.assertEqual(journal.read_checkpoint(), 0)
+        self.assertEqual(MovimientoInventario.objects.count(), 0)
+
+    def test_journal_de_proceso_vivo_no_se_toca(self):
+        path = os.path.join(self.dir, f'movimientos-{os.getppid()}.jsonl')
+        journal = AuditJournal(path)
+        journal.append({'evento': 'f' * 32, 'cantidad': 1, 'tipo': 'MODI', 'fecha': None})
+        journal.close()
+        # Con psutil (en Windows os.kill(pid, 0) no comprueba: termina el proceso)
+        with mock.patch.object(auditoria.psutil, 'pid_exists', wraps=auditoria.psutil.pid_exists) as pid_exists:
+            self.assertEqual(auditoria.drenar_auditoria(incluir_propio=False)['insertados'], 0)
+        pid_exists.assert_called_with(os.getppid())
+        self.assertEqual(MovimientoInventario.objects.count(), 0)
+
+    @override_settings(AUDIT_WRITE_BEHIND=False)
+    def test_modo_sincrono_inserta_en_la_transaccion(self):
+        self.assertEqual(self._alta('A004', 'Tenaza').status_code, 201)
+        self.assertEqual(MovimientoInventario.objects.filter(tipo='ALTA', evento__isnull=True).count(), 1)
@@ -0,0 +1,103 @@
+import json
+import shutil
+import tempfile
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import auditoria
+from core.models import Categoria, MovimientoInventario, Producto, Stock, Usuario
+from core.views import _dar_de_baja
+from .test_logger import LoggedTestCase
+
+
+@override_settings(PRODUCTOS_BORRADO_LOGICO=False)
+class BajaEnLoteTests(LoggedTestCase):
+    def setUp(self):
+        self.cat = Categoria.objects.create(nombre='Descontinuados')
+        self.otra = Categoria.objects.create(nombre='Vigentes')
+        self.user = Usuario.objects.create(nombres='Baja', usuario='baja1', email='baja1@example.test')
+        session = self.client.session
+        session['conectado_usuario'] = self.user.id_usuario
+        session.save()
+
+    def _crear(self, n, categoria, prefijo='D', con_stock=True):
+        productos = []
+        for i in range(n):
+            prod = Producto.objects.create(codigo_producto=f'{prefijo}{i:03d}', nombre=f'{prefijo} prod {i}',
+                                           descripcion='x', precio=100 + i, cantidad=1, categoria=categoria)
+            if con_stock:
+                Stock.objects.create(producto=prod, cantidad=10 + i)
+            productos.append(prod)
+        return productos
+
+    def _post_json(self, payload):
+        return self.client.post(reverse('producto-eliminar-lote'), json.dumps(payload),
+                                content_type='application/json', HTTP_ACCEPT='application/json')
+
+    def test_por_ids_registra_baja_con_stock_y_categoria(self):
+        productos = self._crear(3, self.cat)
+        sin_stock = self._crear(1, self.cat, prefijo='S', con_stock=False)[0]
+        ids = [p.id_producto for p in productos[:2]] + [sin_stock.id_producto]
+
+        resp = self._post_json({'ids': ids})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json(), {'eliminados': 3})
+        self.assertEqual(list(Producto.objects.values_list('codigo_producto', flat=True)), ['D002'])
+        self.assertEqual(Stock.objects.count(), 1)
+
+        bajas = {m.producto_codigo: m for m in MovimientoInventario.objects.filter(tipo='BAJA')}
+        self.assertEqual(sorted(bajas), ['D000', 'D001', 'S000'])
+        self.assertEqual(bajas['D001'].cantidad, 11)
+        self.assertEqual(bajas['S000'].cantidad, 1)
+        self.assertEqual(bajas['D000'].usuario_id, self.user.id_usuario)
+        self.assertEqual(bajas['D000'].categoria, self.cat)
+        self.assertIsNone(bajas['D000'].producto_id)
+        self.assertEqual(bajas['D000'].resumen,
+                         'Baja: Nombre D prod 0, Código D000, Categoría Descontinuados, Precio 100, Cantidad 10')
+
+    def test_por_categoria_en_lotes_con_consultas_constantes_por_lote(self):
+        self._crear(5, self.otra, prefijo='V')
+
+        def consultas(n, prefijo):
+            self._crear(n, self.cat, prefijo=prefijo)
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(_dar_de_baja(Producto.objects.filter(categoria=self.cat)), n)
+            return len(ctx.captured_queries)
+
+        with override_settings(PRODUCTOS_BAJA_LOTE=100):
+            pocas, muchas = consultas(4, 'A'), consultas(40, 'B')
+        print(f'\n[QUERIES] baja en lote: 4 productos={pocas}, 40 productos={muchas}')
+        self.assertEqual(pocas, muchas)
+
+        with override_settings(PRODUCTOS_BAJA_LOTE=10):
+            self._crear(25, self.cat, prefijo='C')
+            resp = self.client.post(reverse('producto-eliminar-lote'), {'categoria': self.cat.id_categoria})
+        self.assertRedirects(resp, reverse('producto-list'), fetch_redirect_response=False)
+        self.assertFalse(Producto.objects.filter(categoria=self.cat).exists())
+        self.assertEqual(Producto.objects.filter(categoria=self.otra).count(), 5)
+        self.assertEqual(MovimientoInventario.objects.filter(tipo='BAJA').count(), 4 + 40 + 25)
+
+    def test_peticion_invalida(self):
+        self.assertEqual(self._post_json({}).status_code, 400)
+        self.assertEqual(self._post_json({'ids': ['x']}).status_code, 400)
+
+    def test_write_behind_un_solo_append_al_journal(self):
+        directorio = tempfile.mkdtemp(prefix='audit-journal-')
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        productos = self._crear(3, self.cat)
+        with override_settings(AUDIT_WRITE_BEHIND=True, AUDIT_JOURNAL_DIR=directorio,
+                               AUDIT_JOURNAL_FSYNC_INTERVAL_S=0.0):
+            try:
+                with self.captureOnCommitCallbacks(execute=True):
+                    resp = self._post_json({'ids': [p.id_producto for p in productos]})
+                self.assertEqual(resp.json(), {'eliminados': 3})
+                self.assertEqual(MovimientoInventario.objects.count(), 0)
+                self.assertEqual(auditoria.drenar_auditoria()['insertados'], 3)
+            finally:
+                for journal in list(auditoria._journals.values()):
+                    journal.close()
+                auditoria._journals.clear()
+        self.assertEqual(MovimientoInventario.objects.filter(tipo='BAJA', categoria=self.cat).count(), 3)
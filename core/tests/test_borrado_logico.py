@@ -0,0 +1,183 @@
+import io
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Categoria, MovimientoInventario, Producto, Stock, Usuario
+from core import purga
+from core.purga import purgar_productos
+from .test_logger import LoggedTestCase
+
+
+class BorradoLogicoTests(LoggedTestCase):
+    def setUp(self):
+        cache.clear()
+        self.cat = Categoria.objects.create(nombre='Papelera')
+        self.user = Usuario.objects.create(nombres='Pap', usuario='pap1', email='pap1@example.test')
+        session = self.client.session
+        session['conectado_usuario'] = self.user.id_usuario
+        session.save()
+        self.prod = Producto.objects.create(codigo_producto='P001', nombre='Pincel', descripcion='x',
+                                            precio=300, cantidad=1, categoria=self.cat)
+        Stock.objects.create(producto=self.prod, cantidad=7)
+        for i in range(3):
+            MovimientoInventario.objects.create(producto=self.prod, producto_codigo='P001', cantidad=i, tipo='MODI')
+
+    def _restaurar(self, producto):
+        return self.client.post(reverse('producto-restaurar', args=[producto.id_producto]),
+                                HTTP_ACCEPT='application/json')
+
+    def test_eliminar_archiva_sin_tocar_stock_ni_movimientos(self):
+        self.client.get('/core/producto/')
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(reverse('producto-eliminar', args=[self.prod.id_producto]))
+        self.assertEqual(resp.status_code, 302)
+        update_movimientos = f"UPDATE {connection.ops.quote_name('core_movimientoinventario')}"
+        self.assertFalse([q for q in ctx.captured_queries
+                          if q['sql'].startswith((update_movimientos, 'DELETE'))])
+
+        self.prod.refresh_from_db()
+        self.assertTrue(self.prod.archivado)
+        self.assertIsNotNone(self.prod.archivado_en)
+        self.assertEqual(Stock.objects.get(producto=self.prod).cantidad, 7)
+        self.assertEqual(self.prod.movimientoinventario_set.count(), 4)
+        self.assertEqual(MovimientoInventario.objects.get(tipo='BAJA').producto, self.prod)
+
+        # Fuera de los listados y de los endpoints de edición
+        self.assertEqual(list(self.client.get('/core/producto/').context['productos']), [])
+        self.assertEqual(self.client.get(reverse('producto-json', args=[self.prod.id_producto])).status_code, 404)
+        self.assertEqual(self.client.post(reverse('producto-eliminar', args=[self.prod.id_producto])).status_code, 404)
+
+    def test_restaurar_registra_movimiento_rest(self):
+        Producto.objects.filter(pk=self.prod.pk).archivar()
+        self.assertEqual(list(self.client.get('/core/producto/').context['productos']), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self._restaurar(self.prod)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['codigo_producto'], 'P001')
+
+        self.prod.refresh_from_db()
+        self.assertFalse(self.prod.archivado)
+        self.assertIsNone(self.prod.archivado_en)
+        mov = MovimientoInventario.objects.get(tipo='REST')
+        self.assertEqual((mov.cantidad, mov.usuario_id, mov.categoria), (7, self.user.id_usuario, self.cat))
+        self.assertEqual(mov.resumen,
+                         'Restauración: Nombre Pincel, Código P001, Categoría Papelera, Precio 300, Cantidad 7')
+        self.assertEqual([p.codigo_producto for p in self.client.get('/core/producto/').context['productos']],
+                         ['P001'])
+        # Un producto activo no se puede restaurar
+        self.assertEqual(self._restaurar(self.prod).status_code, 404)
+
+    def test_pagina_de_archivados_permite_restaurar(self):
+        activo = Producto.objects.create(codigo_producto='P005', nombre='Lija', descripcion='x',
+                                         precio=10, categoria=self.cat)
+        reclamado = Producto.objects.create(codigo_producto='P006', nombre='Rasqueta', descripcion='x',
+                                            precio=10, categoria=self.cat, archivado=True)
+        self.assertContains(self.client.get('/core/producto/'), reverse('producto-archivados'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('producto-eliminar', args=[self.prod.id_producto]))
+
+        resp = self.client.get(reverse('producto-archivados'))
+        self.assertEqual([p.codigo_producto for p in resp.context['productos']], ['P001'])
+        self.assertContains(resp, reverse('producto-restaurar', args=[self.prod.id_producto]))
+        self.assertNotContains(resp, reverse('producto-restaurar', args=[activo.id_producto]))
+        self.assertNotContains(resp, reverse('producto-restaurar', args=[reclamado.id_producto]))
+        self.assertEqual(list(self.client.get(reverse('producto-archivados'), {'q': 'lija'}).context['productos']), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(reverse('producto-restaurar', args=[self.prod.id_producto]))
+        self.assertRedirects(resp, reverse('producto-list'))
+        self.assertEqual(list(self.client.get(reverse('producto-archivados')).context['productos']), [])
+
+    def test_alta_de_un_archivado_indica_como_restaurarlo(self):
+        Producto.objects.filter(pk=self.prod.pk).archivar()
+        for codigo, nombre in (('P001', 'Pincel nuevo'), ('P009', 'PINCEL')):
+            resp = self.client.post(reverse('producto-add'), {
+                'codigo_producto': codigo, 'nombre': nombre, 'descripcion': 'x',
+                'categoria': str(self.cat.id_categoria), 'precio': '100', 'cantidad': '1',
+            }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+            self.assertEqual(resp.status_code, 409)
+            data = resp.json()
+            self.assertEqual(data['error'], 'El producto "Pincel" (P001) está archivado; '
+                                            'puede restaurarlo desde Productos archivados.')
+            self.assertEqual(data['restaurar_url'], reverse('producto-restaurar', args=[self.prod.id_producto]))
+        self.assertEqual(self._restaurar(self.prod).status_code, 200)
+
+    def test_baja_en_lote_archiva(self):
+        otro = Producto.objects.create(codigo_producto='P002', nombre='Rodillo', descripcion='x',
+                                       precio=10, categoria=self.cat)
+        resp = self.client.post(reverse('producto-eliminar-lote'), json.dumps({'categoria': self.cat.id_categoria}),
+                                content_type='application/json', HTTP_ACCEPT='application/json')
+        self.assertEqual(resp.json(), {'eliminados': 2})
+        self.assertEqual(Producto.objects.activos().count(), 0)
+        self.assertEqual(Producto.objects.filter(archivado=True).count(), 2)
+        self.assertEqual(MovimientoInventario.objects.filter(tipo='BAJA', producto=otro).count(), 1)
+
+    def test_purga_por_lotes_desvincula_movimientos(self):
+        reciente = Producto.objects.create(codigo_producto='P003', nombre='Brocha', descripcion='x',
+                                           precio=10, categoria=self.cat)
+        Producto.objects.filter(pk__in=[self.prod.pk, reciente.pk]).archivar()
+        Producto.objects.filter(pk=self.prod.pk).update(archivado_en=timezone.now() - timedelta(days=60))
+
+        stats = purgar_productos(antes_de=timezone.now() - timedelta(days=30), batch_size=2)
+        self.assertEqual((stats['purgados'], stats['lotes']), (1, 1))
+        self.assertFalse(Producto.objects.filter(pk=self.prod.pk).exists())
+        self.assertFalse(Stock.objects.filter(producto_id=self.prod.pk).exists())
+        self.assertEqual(MovimientoInventario.objects.filter(producto_codigo='P001', producto__isnull=True).count(), 3)
+        self.assertTrue(Producto.objects.filter(pk=reciente.pk, archivado=True).exists())
+
+        out = io.StringIO()
+        call_command('purgar_productos', '--dias', '0', stdout=out)
+        self.assertIn('Productos purgados: 1', out.getvalue())
+        self.assertFalse(Producto.objects.exists())
+
+    def test_restaurar_durante_la_purga(self):
+        """Reclamado el lote, la restauración se rechaza y la purga termina; antes, no se toca nada."""
+        otro = Producto.objects.create(codigo_producto='P004', nombre='Espátula', descripcion='x',
+                                       precio=10, categoria=self.cat)
+        MovimientoInventario.objects.create(producto=otro, producto_codigo='P004', cantidad=1, tipo='MODI')
+        Producto.objects.filter(pk__in=[self.prod.pk, otro.pk]).archivar()
+        Producto.objects.update(archivado_en=timezone.now() - timedelta(days=60))
+        desvincular = purga._desvincular_movimientos
+        respuestas = []
+
+        def restaurar_y_desvincular(ids, batch_size):
+            respuestas.append(self._restaurar(self.prod).status_code)
+            desvincular(ids, batch_size)
+
+        with mock.patch.object(purga, '_desvincular_movimientos', restaurar_y_desvincular):
+            with self.captureOnCommitCallbacks(execute=True):
+                # Restaurado justo antes de reclamar el lote: queda fuera de la purga
+                self.assertEqual(self._restaurar(otro).status_code, 200)
+            stats = purgar_productos(antes_de=timezone.now() - timedelta(days=30))
+        self.assertEqual(respuestas, [404])
+        self.assertEqual(stats['purgados'], 1)
+        self.assertFalse(Producto.objects.filter(pk=self.prod.pk).exists())
+        self.assertEqual(otro.movimientoinventario_set.count(), 2)
+
+    def test_purga_interrumpida_se_completa(self):
+        Producto.objects.filter(pk=self.prod.pk).archivar()
+        # Reclamado por una purga que no llegó a borrar
+        Producto.objects.filter(pk=self.prod.pk).update(archivado_en=None)
+        self.assertEqual(self._restaurar(self.prod).status_code, 404)
+        self.assertEqual(purgar_productos(antes_de=timezone.now() - timedelta(days=30))['purgados'], 1)
+        self.assertEqual(MovimientoInventario.objects.filter(producto_codigo='P001', producto__isnull=True).count(), 3)
+
+    def test_listado_de_activos_usa_el_indice_parcial(self):
+        plan = Producto.objects.activos().order_by('codigo_producto').explain()
+        print(f'\n[EXPLAIN] activos por código: {plan}')
+        if connection.features.supports_partial_indexes:
+            self.assertIn('producto_activo_codigo_idx', plan)
+        else:
+            # MySQL no crea el índice parcial: usa el único de codigo_producto
+            self.assertIn('codigo_producto', plan)
+        # SQLite indica una ordenación explícita con "USE TEMP B-TREE FOR ORDER BY"; MySQL con "filesort"
+        self.assertNotIn('FOR ORDER BY', plan.upper())
+        self.assertNotIn('FILESORT', plan.upper())
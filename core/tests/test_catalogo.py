@@ -0,0 +1,143 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import catalogo
+from core.models import Categoria, Producto, Usuario
+from .test_logger import LoggedTestCase
+
+_CSRF_RE = re.compile(rb'name="csrfmiddlewaretoken" value="[^"]*"')
+
+
+def _consultas_catalogo(ctx):
+    # Sin las de sesión/usuario, que dependen del tiempo transcurrido entre peticiones
+    tablas = [connection.ops.quote_name(t) for t in ('core_producto', 'core_categoria')]
+    return [q['sql'] for q in ctx.captured_queries if any(t in q['sql'] for t in tablas)]
+
+
+@override_settings(PRODUCTOS_POR_PAGINA=10)
+class CatalogoTests(LoggedTestCase):
+    def setUp(self):
+        cache.clear()
+        self.herr = Categoria.objects.create(nombre='Herramientas')
+        self.jard = Categoria.objects.create(nombre='Jardín')
+        user = Usuario.objects.create(nombres='Cat', usuario='cat1', email='cat1@example.test')
+        session = self.client.session
+        session['conectado_usuario'] = user.id_usuario
+        session.save()
+        Producto.objects.bulk_create([
+            Producto(codigo_producto=f'H{i:03d}', nombre=f'Herramienta {i}', descripcion='x', precio=i,
+                     categoria=self.herr if i % 3 else self.jard)
+            for i in range(1, 26)
+        ])
+
+    def _get(self, url, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url, params)
+        self.assertEqual(resp.status_code, 200)
+        return resp, _consultas_catalogo(ctx)
+
+    def test_core_y_system_devuelven_lo_mismo(self):
+        for params in ({}, {'q': 'herramienta 1'}, {'categoria': self.jard.id_categoria, 'pagina': 2}):
+            cache.clear()
+            core, consultas_core = self._get('/core/producto/', **params)
+            cache.clear()
+            system, consultas_system = self._get('/main', **params)
+            self.assertEqual(_CSRF_RE.sub(b'', core.content), _CSRF_RE.sub(b'', system.content))
+            self.assertEqual(consultas_core, consultas_system)
+            # Página de productos + categorías con conteos (el total sale de ellas, sin COUNT)
+            self.assertEqual(len(consultas_core), 2)
+
+    def test_paginacion(self):
+        resp, _ = self._get('/core/producto/', pagina=3)
+        page = resp.context['page_obj']
+        self.assertEqual((page.number, page.paginator.num_pages, page.paginator.count), (3, 3, 25))
+        self.assertEqual([p.codigo_producto for p in resp.context['productos']],
+                         [f'H{i:03d}' for i in range(21, 26)])
+        self.assertContains(resp, 'pagina=2">Anterior')
+
+        resp, _ = self._get('/core/producto/', categoria=self.jard.id_categoria, pagina=99)
+        self.assertEqual(resp.context['page_obj'].number, 1)
+        self.assertEqual(len(resp.context['productos']), 8)
+
+    def test_cache_por_version_y_invalidacion_al_modificar(self):
+        self._get('/core/producto/', q='herramienta')
+        _, consultas = self._get('/core/producto/', q='herramienta')
+        self.assertEqual(consultas, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(reverse('producto-add'), {
+                'codigo_producto': 'H026', 'nombre': 'Herramienta 26', 'descripcion': 'x',
+                'categoria': str(self.herr.id_categoria), 'precio': '1', 'cantidad': '1',
+            }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(resp.status_code, 201)
+        resp, consultas = self._get('/core/producto/', q='herramienta')
+        self.assertEqual(len(consultas), 2)
+        self.assertEqual(resp.context['page_obj'].paginator.count, 26)
+
+    def test_version_sobrevive_a_la_perdida_de_la_clave(self):
+        antes = catalogo.version()
+        catalogo.invalidar()
+        self.assertEqual(catalogo.version(), antes + 1)
+        cache.delete(catalogo.VERSION_KEY)
+        catalogo.invalidar()
+        self.assertNotIn(catalogo.version(), (antes, antes + 1))
+
+
+class SugerenciasTests(LoggedTestCase):
+    def setUp(self):
+        cache.clear()
+        cat = Categoria.objects.create(nombre='Sug')
+        for codigo, nombre in (('M001', 'Martillo'), ('M002', 'Mazo'), ('A001', 'Manguera'),
+                               ('B001', 'Brocha martillo'), ('M003', 'Marco archivado')):
+            Producto.objects.create(codigo_producto=codigo, nombre=nombre, descripcion='x' * 2000,
+                                    precio=1, categoria=cat)
+        Producto.objects.filter(codigo_producto='M003').archivar()
+
+    def _get(self, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse('producto-sugerencias'), params)
+        self.assertEqual(resp.status_code, 200)
+        return resp, _consultas_catalogo(ctx)
+
+    def test_ranking_por_prefijo_codigo_antes_que_nombre(self):
+        resp, consultas = self._get(q='m', seq=7)
+        datos = resp.json()
+        self.assertEqual(datos['seq'], 7)
+        # Código que empieza por M primero; después nombres que empiezan por "m"; ni
+        # coincidencias a mitad de nombre (Brocha martillo) ni archivados
+        self.assertEqual([r['codigo'] for r in datos['resultados']], ['M001', 'M002', 'A001'])
+        self.assertEqual(datos['resultados'][0], {'id': Producto.objects.get(codigo_producto='M001').id_producto,
+                                                  'codigo': 'M001', 'nombre': 'Martillo'})
+        self.assertEqual(len(consultas), 1)
+        print(f'\n[SUGERENCIAS] {len(resp.content)} bytes')
+        self.assertLess(len(resp.content), 300)
+
+        datos = self._get(q='MAR')[0].json()
+        self.assertEqual([r['codigo'] for r in datos['resultados']], ['M001'])
+
+    def test_cache_por_texto_normalizado(self):
+        self._get(q='ma')
+        resp, consultas = self._get(q='  MA ', seq=2)
+        self.assertEqual(consultas, [])
+        self.assertEqual(resp.json()['q'], 'ma')
+        self.assertEqual(len(resp.json()['resultados']), 3)
+        self.assertEqual(self._get(q='   ')[0].json()['resultados'], [])
+
+    def test_limite_y_consulta_por_indices(self):
+        with override_settings(SUGERENCIAS_LIMITE=2):
+            datos = self._get(q='m')[0].json()
+        self.assertEqual(len(datos['resultados']), 2)
+        plan = Producto.objects.activos().con_prefijo('ma').explain()
+        print(f'\n[EXPLAIN] sugerencias: {plan}')
+        self.assertIn('producto_nombre_lower_uniq', plan)
+        if connection.vendor == 'sqlite':
+            # SQLite: "MULTI-INDEX OR" sobre los dos índices, sin recorrer la tabla
+            self.assertNotIn('SCAN core_producto', plan)
+        else:
+            # MySQL: sin recorrido completo (type ALL)
+            self.assertNotIn('ALL', plan.split())
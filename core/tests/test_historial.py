@@ -42,7 +42,7 @@ class HistorialTests(LoggedTestCase):
         mov = MovimientoInventario.objects.filter(producto_codigo='H001', tipo='ALTA').first()
         print('\n[H-UT-01] Movimiento creado:', mov)
         if mov:
-            print('[H-UT-01] detalles:', mov.resumen_operacion, 'usuario_id=', mov.usuario_id)
+            print('[H-UT-01] detalles:', mov.resumen, 'usuario_id=', mov.usuario_id)
 
         self.assertIsNotNone(mov, 'H-UT-01: no se creó movimiento ALTA al agregar producto')
         self.assertEqual(mov.tipo, 'ALTA')
@@ -77,7 +77,7 @@ class HistorialTests(LoggedTestCase):
         mov = MovimientoInventario.objects.filter(producto=prod, tipo='MODI').first()
         print('\n[H-UT-02] Movimiento creado:', mov)
         if mov:
-            print('[H-UT-02] detalles:', mov.resumen_operacion, 'usuario_id=', mov.usuario_id)
+            print('[H-UT-02] detalles:', mov.resumen, 'usuario_id=', mov.usuario_id)
 
         self.assertIsNotNone(mov, 'H-UT-02: no se creó movimiento MODI al modificar producto')
         # movimientos por cambio de categoría usan tipo 'MODI'
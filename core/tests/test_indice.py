@@ -0,0 +1,165 @@
+import re
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import catalogo, indice
+from core.indice import FilaCategoria, FilaProducto, IndiceCatalogo, IndiceEnProceso
+from core.models import Categoria, Producto, Stock, Usuario
+from .test_logger import LoggedTestCase
+
+_CSRF_RE = re.compile(rb'name="csrfmiddlewaretoken" value="[^"]*"')
+
+
+def _consultas_catalogo(ctx):
+    tablas = [connection.ops.quote_name(t) for t in ('core_producto', 'core_categoria')]
+    return [q['sql'] for q in ctx.captured_queries if any(t in q['sql'] for t in tablas)]
+
+
+@override_settings(PRODUCTOS_POR_PAGINA=5)
+class IndiceCatalogoTests(LoggedTestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(indice, '_indice', IndiceEnProceso())
+        self.en_proceso = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.herr = Categoria.objects.create(nombre='Herramientas')
+        self.jard = Categoria.objects.create(nombre='Jardín')
+        Categoria.objects.create(nombre='Vacía')
+        user = Usuario.objects.create(nombres='Idx', usuario='idx1', email='idx1@example.test')
+        session = self.client.session
+        session['conectado_usuario'] = user.id_usuario
+        session.save()
+        for i, nombre in enumerate(('Martillo', 'Mazo', 'Manguera', 'Pala', 'Rastrillo', 'Sierra', 'Tijera'), 1):
+            prod = Producto.objects.create(codigo_producto=f'M{i:03d}', nombre=nombre, descripcion=f'<b>{nombre}</b>',
+                                           precio=i * 10, cantidad=i, categoria=self.herr if i % 2 else self.jard)
+            Stock.objects.create(producto=prod, cantidad=i)
+        Producto.objects.filter(codigo_producto='M007').archivar()
+
+    def _get(self, url, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url, params)
+        self.assertEqual(resp.status_code, 200)
+        return resp, _consultas_catalogo(ctx)
+
+    def test_listado_identico_con_y_sin_indice(self):
+        casos = ({}, {'pagina': 2}, {'q': 'ma'}, {'q': 'M00', 'categoria': self.jard.id_categoria},
+                 {'categoria': 999})
+        for params in casos:
+            cache.clear()
+            sin_indice, _ = self._get('/core/producto/', **params)
+            with override_settings(CATALOGO_INDICE_ENABLED=True):
+                con_indice, _ = self._get('/main', **params)
+            self.assertEqual(_CSRF_RE.sub(b'', con_indice.content), _CSRF_RE.sub(b'', sin_indice.content), params)
+
+    def test_sugerencias_identicas_con_y_sin_indice(self):
+        for q in ('m', 'MA', 'm00', 'ri', 'pala', 'x'):
+            sin_indice = catalogo.sugerencias(q)
+            with override_settings(CATALOGO_INDICE_ENABLED=True):
+                self.assertEqual(catalogo.sugerencias(q), sin_indice, q)
+
+    @override_settings(CATALOGO_INDICE_ENABLED=True)
+    def test_solo_comprueba_version_y_recarga_al_modificar(self):
+        self._get('/core/producto/')
+        _, consultas = self._get('/core/producto/', q='ma', pagina=1)
+        self.assertEqual(consultas, [])
+        self.assertEqual(self.en_proceso.reconstrucciones, 1)
+
+        prod = Producto.objects.get(codigo_producto='M002')
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(reverse('producto-update', args=[prod.id_producto]), {
+                'nombre': 'Mazo grande', 'descripcion': 'x', 'categoria': self.herr.id_categoria,
+                'precio': 99, 'cantidad': 2,
+            })
+        self.assertEqual(resp.status_code, 302)
+        resp, consultas = self._get('/core/producto/', q='grande')
+        self.assertEqual(len(consultas), 2)
+        self.assertEqual(self.en_proceso.reconstrucciones, 2)
+        fila, = resp.context['productos']
+        self.assertEqual((fila.nombre, fila.precio, fila.categoria.nombre), ('Mazo grande', 99, 'Herramientas'))
+
+    @override_settings(CATALOGO_INDICE_ENABLED=True, CATALOGO_INDICE_MAX_PRODUCTOS=3)
+    def test_catalogo_grande_no_se_indexa(self):
+        with self.assertLogs('core.indice', level='WARNING'):
+            self.assertIsNone(indice.obtener())
+        # No se reintenta la carga en cada request mientras no cambie la versión
+        self.assertIsNone(indice.obtener())
+        self.assertEqual(self.en_proceso.reconstrucciones, 1)
+        resp, consultas = self._get('/core/producto/')
+        self.assertEqual(len(resp.context['productos']), 5)
+        self.assertEqual(len(consultas), 2)
+
+    @override_settings(CATALOGO_INDICE_ENABLED=True, CATALOGO_CACHE_TIMEOUT=0)
+    def test_cambios_fuera_de_las_vistas_se_ven_al_caducar(self):
+        self.assertEqual(len(indice.obtener().productos), 6)
+        # Sin invalidar(): como un cambio desde el shell
+        Producto.objects.filter(codigo_producto='M001').archivar()
+        self.assertEqual(len(indice.obtener().productos), 5)
+
+    def test_categoria_borrada_entre_lecturas_no_rompe_la_carga(self):
+        values_list = type(Categoria.objects).values_list
+
+        def sin_jardin(manager, *campos):
+            # Como si Jardín (y en cascada sus productos) se borrara tras leer los productos
+            return values_list(manager, *campos).exclude(id_categoria=self.jard.id_categoria)
+
+        with mock.patch.object(type(Categoria.objects), 'values_list', sin_jardin):
+            instantanea = indice.cargar_desde_bd(1)
+        self.assertEqual([p.codigo_producto for p in instantanea.productos], ['M001', 'M003', 'M005'])
+        self.assertEqual([c.nombre for c in instantanea.categorias], ['Herramientas', 'Vacía'])
+
+
+class IndiceConcurrenciaTests(LoggedTestCase):
+    """Escrituras y lecturas concurrentes sobre el protocolo versión/instantánea (sin BD)."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_lectores_nunca_ven_datos_anteriores_a_una_escritura_confirmada(self):
+        categoria = FilaCategoria(1, 'C')
+        almacen = {'precio': 0}
+        almacen_lock = threading.Lock()
+        confirmado = [0]
+        errores = []
+        ESCRITURAS = 300
+
+        def cargar(version):
+            with almacen_lock:
+                precio = almacen['precio']
+            time.sleep(0.0005)  # consulta lenta: da tiempo a que entren escrituras durante la carga
+            return IndiceCatalogo(version, [FilaProducto(1, 'C001', 'Cosa', precio, 0, '', categoria)], [categoria])
+
+        en_proceso = IndiceEnProceso(cargar=cargar)
+
+        def escritor():
+            for k in range(1, ESCRITURAS + 1):
+                with almacen_lock:
+                    almacen['precio'] = k
+                # Como las vistas: invalidar tras confirmar la escritura
+                catalogo.invalidar()
+                confirmado[0] = k
+                time.sleep(0.0002)
+
+        def lector():
+            while confirmado[0] < ESCRITURAS and not errores:
+                visto = confirmado[0]
+                precio = en_proceso.obtener().por_id[1].precio
+                if precio < visto:
+                    errores.append((visto, precio))
+
+        hilos = [threading.Thread(target=lector) for _ in range(4)] + [threading.Thread(target=escritor)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join(timeout=30)
+        self.assertEqual(errores, [])
+        self.assertEqual(en_proceso.obtener().por_id[1].precio, ESCRITURAS)
+        # Una reconstrucción como mucho por versión, nunca una por lectura
+        self.assertLessEqual(en_proceso.reconstrucciones, ESCRITURAS + 1)
+        print(f'\n[INDICE] {ESCRITURAS} escrituras, {en_proceso.reconstrucciones} reconstrucciones')
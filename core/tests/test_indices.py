@@ -0,0 +1,76 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Categoria, MovimientoInventario, Producto
+from .test_logger import LoggedTestCase
+
+
+class IndicesConsultasTests(LoggedTestCase):
+    """Cada patrón de consulta de las vistas usa su índice (EXPLAIN en la BD de tests)."""
+
+    def setUp(self):
+        self.categoria = Categoria.objects.create(nombre='Idx')
+        Producto.objects.create(codigo_producto='M001', nombre='Martillo', descripcion='x',
+                                precio=10, categoria=self.categoria)
+
+    def assertUsaIndice(self, queryset, indice):
+        plan = queryset.explain()
+        print(f'\n[EXPLAIN] {indice}: {plan}')
+        self.assertIn(indice, plan)
+
+    def test_nombre_sin_mayusculas_usa_indice_unico_funcional(self):
+        qs = Producto.objects.con_nombre('MARTILLO')
+        self.assertTrue(qs.exists())
+        self.assertUsaIndice(qs, 'producto_nombre_lower_uniq')
+
+    def test_categoria_ordenada_por_codigo_usa_indice_compuesto(self):
+        qs = Producto.objects.filter(categoria=self.categoria).order_by('codigo_producto')
+        self.assertUsaIndice(qs, 'producto_cat_codigo_idx')
+
+    def test_prefijo_de_codigo_usa_indice_unico(self):
+        qs = Producto.objects.con_prefijo_codigo('M').values_list('codigo_producto', flat=True)
+        self.assertEqual(list(qs), ['M001'])
+        if connection.vendor == 'sqlite':
+            self.assertUsaIndice(qs, 'sqlite_autoindex_core_producto')
+        else:
+            self.assertUsaIndice(qs, 'codigo_producto')
+
+    def test_movimientos_por_codigo_y_tipo_usan_indice_compuesto(self):
+        qs = MovimientoInventario.objects.filter(producto_codigo='M001', tipo='ALTA').order_by('-fecha')
+        self.assertUsaIndice(qs, 'mov_codigo_tipo_fecha_idx')
+
+
+class MovimientosSinOrdenImplicitoTests(LoggedTestCase):
+    """Sin Meta.ordering: count/exists/agregados no ordenan; los listados ordenan por índice."""
+
+    def setUp(self):
+        for i in range(3):
+            MovimientoInventario.objects.create(producto_codigo=f'M00{i}', cantidad=i, tipo='MODI')
+
+    def assertSinOrdenacion(self, queryset, indice=None):
+        plan = queryset.explain()
+        print(f'\n[EXPLAIN] {plan}')
+        # SQLite indica una ordenación explícita con "USE TEMP B-TREE FOR ORDER BY"; MySQL con "filesort"
+        self.assertNotIn('FOR ORDER BY', plan.upper())
+        self.assertNotIn('FILESORT', plan.upper())
+        if indice:
+            self.assertIn(indice, plan)
+
+    def test_consultas_sin_order_by_implicito(self):
+        from django.db.models import Max, Sum
+        with CaptureQueriesContext(connection) as ctx:
+            MovimientoInventario.objects.filter(tipo='MODI').count()
+            MovimientoInventario.objects.filter(producto_codigo='M001').exists()
+            MovimientoInventario.objects.aggregate(total=Sum('cantidad'), ultima=Max('fecha'))
+            list(MovimientoInventario.objects.values('tipo').annotate(total=Sum('cantidad')))
+            # Antes, Meta.ordering añadía "ORDER BY fecha DESC" a cualquier consulta de filas
+            list(MovimientoInventario.objects.filter(producto_codigo='M001').values_list('cantidad', flat=True))
+        for query in ctx.captured_queries:
+            self.assertNotIn('ORDER BY', query['sql'])
+        self.assertSinOrdenacion(MovimientoInventario.objects.values('tipo').annotate(total=Sum('cantidad')))
+
+    def test_listados_ordenados_por_indice(self):
+        self.assertEqual([m.producto_codigo for m in MovimientoInventario.objects.recientes()],
+                         ['M002', 'M001', 'M000'])
+        self.assertSinOrdenacion(MovimientoInventario.objects.recientes()[:20], 'mov_fecha_idx')
+        self.assertSinOrdenacion(MovimientoInventario.objects.de_producto('M001')[:20], 'mov_codigo_fecha_idx')
@@ -0,0 +1,142 @@
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Categoria, Producto, Usuario
+from .test_logger import LoggedTestCase
+
+
+def _medir(func):
+    """Ejecuta `func` y devuelve (resultado, ms, pico de memoria en KiB)."""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = func()
+    ms = (time.perf_counter() - inicio) * 1000.0
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, ms, pico / 1024.0
+
+
+class ListadosProyectadosTests(LoggedTestCase):
+    def setUp(self):
+        cache.clear()
+        self.categoria = Categoria.objects.create(nombre='Lst')
+        self.user = Usuario(nombres='Lst', usuario='lst1', email='lst1@example.test')
+        self.user.set_password('secreta')
+        self.user.save()
+        session = self.client.session
+        session['conectado_usuario'] = self.user.id_usuario
+        session.save()
+
+    def test_listado_productos_no_trae_descripcion_completa(self):
+        Producto.objects.create(codigo_producto='L001', nombre='Largo', descripcion='<b>x</b>' + 'y' * 5000,
+                                precio=10, categoria=self.categoria)
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get('/core/producto/')
+        self.assertEqual(resp.status_code, 200)
+        qn = connection.ops.quote_name
+        sql = next(q['sql'] for q in ctx.captured_queries if f"FROM {qn('core_producto')}" in q['sql'])
+        # La descripción sólo aparece dentro del SUBSTR(...) de `descripcion_corta`
+        self.assertEqual(sql.count(f"{qn('core_producto')}.{qn('descripcion')}"), 1)
+        producto, = resp.context['productos']
+        self.assertIn('descripcion', producto.get_deferred_fields())
+        self.assertEqual(len(producto.descripcion_corta), 500)
+        self.assertContains(resp, 'xyyyy')
+        self.assertNotContains(resp, 'y' * 600)
+
+    def test_listado_usuarios_no_trae_password(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get('/core/usuarios/')
+        self.assertContains(resp, 'lst1')
+        qn = connection.ops.quote_name
+        sql = [q['sql'] for q in ctx.captured_queries if f"FROM {qn('core_usuario')}" in q['sql']]
+        self.assertTrue(sql)
+        self.assertFalse(any(qn('password') in s for s in sql))
+
+    def test_benchmark_catalogo_grande(self):
+        """5k productos con descripciones de 2 KB: instancias completas vs para_listado()."""
+        Producto.objects.bulk_create([
+            Producto(codigo_producto=f'{chr(65 + i // 1000)}{i % 1000:03d}', nombre=f'Cat {i}',
+                     descripcion='descripción extensa ' * 100, precio=i, categoria=self.categoria)
+            for i in range(5000)
+        ], batch_size=1000)
+
+        def completo():
+            return [(p.nombre, p.categoria.nombre, p.descripcion[:120])
+                    for p in Producto.objects.select_related('categoria').order_by('codigo_producto')]
+
+        def proyectado():
+            return [(p.nombre, p.categoria.nombre, p.descripcion_corta[:120])
+                    for p in Producto.objects.para_listado().order_by('codigo_producto')]
+
+        filas_completo, ms_completo, kib_completo = _medir(completo)
+        filas_proyectado, ms_proyectado, kib_proyectado = _medir(proyectado)
+        print(f'\n[LISTADO] 5k productos: completo={ms_completo:.1f} ms/{kib_completo:.0f} KiB '
+              f'para_listado={ms_proyectado:.1f} ms/{kib_proyectado:.0f} KiB')
+        self.assertEqual(filas_completo, filas_proyectado)
+        self.assertLess(kib_proyectado, kib_completo)
+
+
+class FiltroCategoriaTests(LoggedTestCase):
+    def setUp(self):
+        cache.clear()
+        self.herr = Categoria.objects.create(nombre='Herramientas')
+        self.jard = Categoria.objects.create(nombre='Jardín')
+        self.vacia = Categoria.objects.create(nombre='Vacía')
+        user = Usuario.objects.create(nombres='Fil', usuario='fil1', email='fil1@example.test')
+        session = self.client.session
+        session['conectado_usuario'] = user.id_usuario
+        session.save()
+        for codigo, nombre, cat in (('H001', 'Martillo', self.herr), ('H002', 'Mazo', self.herr),
+                                    ('H003', 'Sierra', self.herr), ('J001', 'Manguera', self.jard)):
+            Producto.objects.create(codigo_producto=codigo, nombre=nombre, descripcion='x', precio=1, categoria=cat)
+        Producto.objects.filter(codigo_producto='H003').archivar()
+
+    def test_filtro_y_conteos_en_core_y_system(self):
+        for url in ('/core/producto/', '/main'):
+            resp = self.client.get(url, {'categoria': self.herr.id_categoria})
+            self.assertEqual([p.codigo_producto for p in resp.context['productos']], ['H001', 'H002'])
+            conteos = {c.nombre: c.total_productos for c in resp.context['categorias']}
+            self.assertEqual(conteos, {'Herramientas': 2, 'Jardín': 1, 'Vacía': 0})
+            self.assertEqual(resp.context['total_productos'], 3)
+            self.assertEqual(resp.context['categoria_id'], self.herr.id_categoria)
+
+            # Los conteos siguen a la búsqueda; el filtro de categoría se combina con ella
+            resp = self.client.get(url, {'q': 'ma', 'categoria': self.jard.id_categoria})
+            self.assertEqual([p.codigo_producto for p in resp.context['productos']], ['J001'])
+            conteos = {c.nombre: c.total_productos for c in resp.context['categorias']}
+            self.assertEqual(conteos, {'Herramientas': 2, 'Jardín': 1, 'Vacía': 0})
+            self.assertContains(resp, f'q=ma&amp;categoria={self.herr.id_categoria}')
+
+            # Un valor no numérico se ignora
+            resp = self.client.get(url, {'categoria': 'abc'})
+            self.assertEqual(len(resp.context['productos']), 3)
+
+    def test_conteos_en_una_sola_consulta_agrupada(self):
+        with CaptureQueriesContext(connection) as sin_filtro:
+            self.client.get('/core/producto/')
+        with CaptureQueriesContext(connection) as con_filtro:
+            self.client.get('/core/producto/', {'categoria': self.jard.id_categoria})
+        tablas = [connection.ops.quote_name(t) for t in ('core_producto', 'core_categoria')]
+
+        def catalogo(ctx):
+            # Sin la sesión/usuario, que dependen del tiempo transcurrido entre peticiones
+            return [q['sql'] for q in ctx.captured_queries if any(t in q['sql'] for t in tablas)]
+        self.assertEqual(len(catalogo(con_filtro)), len(catalogo(sin_filtro)))
+        self.assertEqual(len(catalogo(con_filtro)), 2)
+        sql = [q for q in catalogo(con_filtro) if f'FROM {tablas[1]}' in q]
+        self.assertEqual(len(sql), 1)
+        self.assertIn('COUNT(', sql[0])
+        self.assertIn('GROUP BY', sql[0])
+
+    def test_filtro_usa_indice_categoria_codigo(self):
+        plan = (Producto.objects.activos().para_listado().filter(categoria_id=self.herr.id_categoria)
+                .order_by('codigo_producto').explain())
+        print(f'\n[EXPLAIN] listado por categoría: {plan}')
+        self.assertIn('producto_cat_codigo_idx', plan)
+        # SQLite indica una ordenación explícita con "USE TEMP B-TREE FOR ORDER BY"; MySQL con "filesort"
+        self.assertNotIn('FOR ORDER BY', plan.upper())
+        self.assertNotIn('FILESORT', plan.upper())
@@ -66,6 +66,40 @@ def append_test_result(test_name: str, status: str, duration: float):
         pass
 
 
+def append_request_metrics(metrics):
+    """Escribe una línea REQ por cada request registrada por el middleware."""
+    if not metrics:
+        return
+    try:
+        with open(RESULTS_FILE, 'a', encoding='utf-8') as f:
+            for m in metrics:
+                f.write(
+                    f"REQ | {m['method']} {m['path']} | {m['status']} | latency_ms={m['latency_ms']:.2f} | "
+                    f"rss_diff={m['rss_diff']} | user_cpu_s={m['user_cpu_s']:.3f} | system_cpu_s={m['system_cpu_s']:.3f} | "
+                    f"queries={m.get('queries', 0)} | db_ms={m.get('db_ms', 0.0):.2f}\n"
+                )
+                for sql, ms in m.get('top_queries', []):
+                    f.write(f"    SQL | {ms:.2f}ms | {' '.join(str(sql).split())[:200]}\n")
+    except Exception:
+        pass
+
+
+def repeated_queries_report(metrics):
+    """Describe las queries repetidas (N+1) detectadas en las requests de un test.
+
+    Devuelve None si ninguna request superó el umbral `NPLUSONE_THRESHOLD`.
+    """
+    lines = []
+    for m in metrics:
+        for rep in m.get('repeated_queries') or []:
+            lines.append(f"{m['method']} {m['path']}: {rep['count']}x {rep['shape'][:200]}")
+            for frame in rep.get('stack') or []:
+                lines.append(f"    {frame}")
+    if not lines:
+        return None
+    return 'Posible N+1: queries de misma forma repetidas en una request\n' + '\n'.join(lines)
+
+
 # atexit handler: close block and write total duration
 _block_open = False
 _block_total = 0.0
@@ -83,10 +117,15 @@ atexit.register(_write_block_footer)
 
 
 class LoggedTestCase(TestCase):
-    def setUp(self):
+    # Poner a False en un test que deba tolerar queries repetidas a propósito
+    detect_nplusone = True
+
+    def run(self, result=None):
+        # Registrar aquí (y no en setUp) para cubrir también a los tests que
+        # redefinen setUp sin llamar a super().setUp()
         self._start_time = time.time()
         set_current_test_id(self.id())
-        super().setUp()
+        return super().run(result)
 
     def tearDown(self):
         # determine outcome: OK if no errors in _outcome
@@ -104,23 +143,21 @@ class LoggedTestCase(TestCase):
             # fallback: treat as OK
             status = 'OK'
 
+        nplusone = None
         try:
-            append_test_result(self.id(), status, duration)
             # Añadir líneas de métricas de requests asociadas al test
             metrics = pop_request_metrics(self.id())
-            if metrics:
-                try:
-                    with open(RESULTS_FILE, 'a', encoding='utf-8') as f:
-                        for m in metrics:
-                            f.write(
-                                f"REQ | {m['method']} {m['path']} | {m['status']} | latency_ms={m['latency_ms']:.2f} | "
-                                f"rss_diff={m['rss_diff']} | user_cpu_s={m['user_cpu_s']:.3f} | system_cpu_s={m['system_cpu_s']:.3f}\n"
-                            )
-                except Exception:
-                    pass
+            if self.detect_nplusone:
+                nplusone = repeated_queries_report(metrics)
+                if nplusone:
+                    status = 'FAIL'
+            append_test_result(self.id(), status, duration)
+            append_request_metrics(metrics)
         finally:
             set_current_test_id(None)
             super().tearDown()
+        if nplusone:
+            self.fail(nplusone)
 
 
 class LoggedLiveServerTestCase(StaticLiveServerTestCase):
@@ -145,16 +182,7 @@ class LoggedLiveServerTestCase(StaticLiveServerTestCase):
         try:
             append_test_result(self.id(), status, duration)
             metrics = pop_request_metrics(self.id())
-            if metrics:
-                try:
-                    with open(RESULTS_FILE, 'a', encoding='utf-8') as f:
-                        for m in metrics:
-                            f.write(
-                                f"REQ | {m['method']} {m['path']} | {m['status']} | latency_ms={m['latency_ms']:.2f} | "
-                                f"rss_diff={m['rss_diff']} | user_cpu_s={m['user_cpu_s']:.3f} | system_cpu_s={m['system_cpu_s']:.3f}\n"
-                            )
-                except Exception:
-                    pass
+            append_request_metrics(metrics)
         finally:
             set_current_test_id(None)
             super().tearDown()
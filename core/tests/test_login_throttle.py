@@ -0,0 +1,99 @@
+import json
+import statistics
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import override_settings
+
+from core import throttling
+from core.models import Usuario
+from .test_logger import LoggedTestCase
+
+
+@override_settings(LOGIN_THROTTLE_WINDOW_S=300, LOGIN_THROTTLE_MAX_PER_USERNAME=5, LOGIN_THROTTLE_MAX_PER_IP=20)
+class LoginThrottleTests(LoggedTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = Usuario.objects.create(nombres='Op', usuario='operador', email='op@example.test')
+        self.user.set_password('clave-correcta')
+        self.user.save()
+
+    def _login(self, username, password, ip='10.0.0.1'):
+        return self.client.post('/usuarios/login/', json.dumps({'username': username, 'password': password}),
+                                content_type='application/json', REMOTE_ADDR=ip)
+
+    def test_bloqueo_por_usuario_sin_verificar_hash(self):
+        for _ in range(5):
+            self.assertEqual(self._login('operador', 'mala').status_code, 401)
+        with mock.patch.object(Usuario, 'check_password', autospec=True) as check:
+            resp = self._login('operador', 'clave-correcta', ip='10.0.0.2')
+        self.assertEqual(resp.status_code, 429)
+        self.assertGreater(int(resp['Retry-After']), 0)
+        check.assert_not_called()
+
+    def test_bloqueo_por_ip(self):
+        for i in range(20):
+            self._login(f'inexistente{i}', 'x', ip='10.9.9.9')
+        self.assertEqual(self._login('operador', 'clave-correcta', ip='10.9.9.9').status_code, 429)
+        # la misma cuenta desde otra IP sigue funcionando
+        self.assertEqual(self._login('operador', 'clave-correcta', ip='10.0.0.3').status_code, 200)
+
+    def test_login_correcto_limpia_fallos_del_usuario(self):
+        for _ in range(4):
+            self._login('operador', 'mala')
+        self.assertEqual(self._login('operador', 'clave-correcta').status_code, 200)
+        for _ in range(4):
+            self._login('operador', 'mala')
+        self.assertEqual(self._login('operador', 'clave-correcta').status_code, 200)
+
+    def test_ventana_deslizante_expira(self):
+        t0 = 1_000_000.0
+        for _ in range(5):
+            throttling.register_login_failure('ana', '1.1.1.1', now=t0)
+        self.assertFalse(throttling.check_login_allowed('ana', '2.2.2.2', now=t0 + 1)[0])
+        # media ventana después la ventana anterior aún pesa; dos ventanas después ya no
+        self.assertFalse(throttling.check_login_allowed('ana', '2.2.2.2', now=t0 + 60)[0])
+        self.assertTrue(throttling.check_login_allowed('ana', '2.2.2.2', now=t0 + 700)[0])
+
+    def test_carga_credential_stuffing_latencia_legitima_estable(self):
+        """Ráfaga de credenciales robadas: el coste de hash queda acotado y el login legítimo no se degrada."""
+        def legit_latency():
+            start = time.perf_counter()
+            self.assertEqual(self._login('operador', 'clave-correcta', ip='10.0.0.50').status_code, 200)
+            return (time.perf_counter() - start) * 1000.0
+
+        baseline = statistics.median(legit_latency() for _ in range(5))
+        victimas = []
+        for i in range(20):
+            u = Usuario(nombres=f'Op{i}', usuario=f'op{i}', email=f'op{i}@example.test')
+            u.set_password('secreta')
+            victimas.append(u)
+        Usuario.objects.bulk_create(victimas)
+
+        real_check = Usuario.check_password
+        calls = []
+
+        def counting_check(usuario, raw):
+            calls.append(usuario.usuario)
+            return real_check(usuario, raw)
+
+        statuses = []
+        during = []
+        # Reloj fijo a mitad de ventana para que el resultado no dependa del cruce de ventanas
+        with mock.patch.object(Usuario, 'check_password', counting_check), \
+                mock.patch('core.throttling._now', return_value=1_000_150.0):
+            for i in range(300):
+                statuses.append(self._login(f'op{i % 20}', f'filtrada{i}', ip=f'203.0.113.{i % 3}').status_code)
+                if i % 60 == 0:
+                    during.append(legit_latency())
+        during_median = statistics.median(during)
+        stuffing_checks = len([c for c in calls if c != 'operador'])
+
+        print(f"\n[LOGIN-LOAD] baseline={baseline:.2f}ms durante_rafaga={during_median:.2f}ms "
+              f"rechazos_429={statuses.count(429)} hashes_atacante={stuffing_checks} stats={throttling.THROTTLE_STATS}")
+        # Sólo los primeros intentos por IP en la ventana llegan a verificar la contraseña
+        self.assertLessEqual(stuffing_checks, 3 * 20)
+        self.assertGreaterEqual(statuses.count(429), 300 - 3 * 20)
+        # El login legítimo sigue pasando y cuesta un solo hash, como sin ráfaga
+        self.assertEqual(calls.count('operador'), len(during))
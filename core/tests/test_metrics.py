@@ -1,3 +1,7 @@
+from django.test import override_settings
+
+from core import middleware
+from core.models import Usuario, Categoria, Producto, Stock
 from core.tests.test_logger import LoggedTestCase
 
 
@@ -5,4 +9,45 @@ class MetricsSmokeTest(LoggedTestCase):
     def test_metrics_smoke(self):
         # Realiza una petición simple para generar métricas en middleware
         resp = self.client.get('/')
-        self.assertIn(resp.status_code, (200, 302, 404))
\ No newline at end of file
+        self.assertIn(resp.status_code, (200, 302, 404))
+
+    def _metrics_for_test(self):
+        return [m for m in middleware.RECORDED_METRICS if m.get('test_id') == self.id()]
+
+    def test_metrics_registran_queries_sql(self):
+        """Las métricas de request incluyen número de queries, tiempo de BD y top-N."""
+        user = Usuario.objects.create(nombres='Met', usuario='met1', email='met1@example.test')
+        cat = Categoria.objects.create(nombre='MetCat')
+        prod = Producto.objects.create(codigo_producto='Q001', nombre='ProdMet', descripcion='x',
+                                       categoria=cat, precio=10, cantidad=1)
+        Stock.objects.create(producto=prod, cantidad=1)
+        session = self.client.session
+        session['conectado_usuario'] = user.id_usuario
+        session.save()
+
+        resp = self.client.post(f'/core/producto/update/{prod.id_producto}/', {
+            'nombre': 'ProdMet', 'descripcion': 'y', 'categoria': cat.id_categoria,
+            'precio': 20, 'cantidad': 2,
+        })
+        self.assertEqual(resp.status_code, 302)
+
+        metrics = self._metrics_for_test()
+        self.assertEqual(len(metrics), 1)
+        m = metrics[0]
+        self.assertGreater(m['queries'], 5)
+        self.assertGreaterEqual(m['db_ms'], 0.0)
+        self.assertLessEqual(len(m['top_queries']), 3)
+        self.assertTrue(all(isinstance(sql, str) for sql, _ in m['top_queries']))
+
+    @override_settings(REQUEST_METRICS_SLOW_MS=0)
+    def test_request_lenta_registra_lista_completa(self):
+        """Con umbral 0 toda request se vuelca en 'request_metrics.slow' con sus queries."""
+        user = Usuario.objects.create(nombres='Slow', usuario='slow1', email='slow1@example.test')
+        session = self.client.session
+        session['conectado_usuario'] = user.id_usuario
+        session.save()
+        with self.assertLogs('request_metrics.slow', level='WARNING') as logs:
+            self.client.get('/core/categorias/')
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('GET /core/categorias/', logs.output[0])
+        self.assertIn('#1 ', logs.output[0])
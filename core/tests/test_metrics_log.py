@@ -0,0 +1,84 @@
+import gzip
+import io
+import json
+import logging
+import os
+import tempfile
+
+from django.core.management import call_command
+
+from core.metrics_log import JsonLinesFormatter, CompressedRotatingFileHandler, iter_log_records
+from core.management.commands.analizar_metricas import percentile
+from .test_logger import LoggedTestCase
+
+
+def _record(msg, metrics=None):
+    rec = logging.LogRecord('request_metrics', logging.INFO, __file__, 1, msg, None, None)
+    if metrics is not None:
+        rec.metrics = metrics
+    return rec
+
+
+class MetricsLogTests(LoggedTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'request_metrics.log')
+
+    def tearDown(self):
+        super().tearDown()
+        self.tmp.cleanup()
+
+    def _handler(self, **kwargs):
+        handler = CompressedRotatingFileHandler(self.path, encoding='utf-8', **kwargs)
+        handler.setFormatter(JsonLinesFormatter())
+        self.addCleanup(handler.close)
+        return handler
+
+    def test_formatter_serializa_metricas(self):
+        line = JsonLinesFormatter().format(_record('GET /', {'method': 'GET', 'latency_ms': 1.5}))
+        data = json.loads(line)
+        self.assertEqual(data['method'], 'GET')
+        self.assertEqual(data['latency_ms'], 1.5)
+        self.assertIn('ts', data)
+        plain = json.loads(JsonLinesFormatter().format(_record('hola')))
+        self.assertEqual(plain['message'], 'hola')
+
+    def test_rotacion_por_tamano_comprime_y_poda(self):
+        handler = self._handler(maxBytes=300, backupCount=2)
+        for i in range(40):
+            handler.emit(_record('x', {'method': 'GET', 'path': '/p/', 'latency_ms': float(i)}))
+        handler.wait_for_compression()
+
+        segments = [p for p in os.listdir(self.tmp.name) if p != 'request_metrics.log']
+        self.assertTrue(segments)
+        self.assertTrue(all(p.endswith('.gz') for p in segments), segments)
+        self.assertLessEqual(len(segments), 2)
+        with gzip.open(os.path.join(self.tmp.name, segments[0]), 'rt', encoding='utf-8') as fh:
+            self.assertEqual(json.loads(fh.readline())['path'], '/p/')
+
+    def test_rotacion_por_tiempo(self):
+        handler = self._handler(interval=3600)
+        handler.emit(_record('x', {'latency_ms': 1.0}))
+        handler.rollover_at = 0  # forzar vencimiento del intervalo
+        handler.emit(_record('x', {'latency_ms': 2.0}))
+        handler.wait_for_compression()
+        self.assertEqual(sorted(r['latency_ms'] for r in iter_log_records(self.path)), [1.0, 2.0])
+
+    def test_analizador_calcula_percentiles_desde_segmentos(self):
+        handler = self._handler(maxBytes=500)
+        for i in range(1, 101):
+            handler.emit(_record('x', {'method': 'GET', 'route': 'core/producto/', 'path': '/core/producto/',
+                                       'latency_ms': float(i), 'db_ms': 1.0, 'queries': 3}))
+        handler.emit(_record('x', {'method': 'POST', 'route': 'core/producto/add/', 'latency_ms': 500.0}))
+        handler.wait_for_compression()
+        self.assertTrue(any(p.endswith('.gz') for p in os.listdir(self.tmp.name)))
+
+        out = io.StringIO()
+        call_command('analizar_metricas', path=self.path, percentiles='50,95', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0].split(' | ')[:4], ['ruta', 'n', 'p50', 'p95'])
+        get_row = next(l for l in lines if l.startswith('GET core/producto/'))
+        cols = get_row.split(' | ')
+        self.assertEqual(cols[1], '100')
+        self.assertEqual(cols[2], f'{percentile([float(i) for i in range(1, 101)], 50):.2f}')
+        self.assertEqual(cols[3], '95.05')
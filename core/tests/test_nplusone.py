@@ -0,0 +1,58 @@
+from django.db import connection
+from django.template import Context, Template
+
+from core.middleware import QueryCollector
+from core.models import Usuario, Categoria, Producto, Stock
+from .test_logger import LoggedTestCase, repeated_queries_report
+
+
+class NPlusOneDetectorTests(LoggedTestCase):
+    def setUp(self):
+        self.cat = Categoria.objects.create(nombre='NCat')
+        for i in range(6):
+            p = Producto.objects.create(codigo_producto=f'N{i:03d}', nombre=f'ProdN{i}', descripcion='x',
+                                        categoria=self.cat, precio=10, cantidad=i)
+            Stock.objects.create(producto=p, cantidad=i)
+        self.user = Usuario.objects.create(nombres='N', usuario='n1', email='n1@example.test')
+        session = self.client.session
+        session['conectado_usuario'] = self.user.id_usuario
+        session.save()
+
+    def test_listado_productos_sin_n_mas_uno(self):
+        """El listado con varios productos no repite la query de categoría por fila."""
+        resp = self.client.get('/core/producto/')
+        self.assertEqual(resp.status_code, 200)
+        # el chequeo N+1 de LoggedTestCase.tearDown hace fallar el test si hay repetición
+
+    def test_detecta_acceso_lazy_en_bucle(self):
+        """Recorrer Stock accediendo a producto lazily genera una forma repetida con su pila."""
+        collector = QueryCollector(capture_stacks=True)
+        with connection.execute_wrapper(collector):
+            nombres = [str(s) for s in Stock.objects.all()]
+        self.assertEqual(len(nombres), 6)
+        repeated = collector.repeated(5)
+        self.assertEqual(len(repeated), 1)
+        self.assertEqual(repeated[0]['count'], 6)
+        self.assertIn('core_producto', repeated[0]['shape'])
+        self.assertTrue(any('core/models.py' in f for f in repeated[0]['stack']))
+        self.assertTrue(any('test_nplusone.py' in f for f in repeated[0]['stack']))
+
+    def test_pila_incluye_template(self):
+        """Si la query se dispara desde un template, la pila incluye el nodo del template."""
+        template = Template('{% for s in stocks %}{{ s.producto.nombre }}{% endfor %}')
+        collector = QueryCollector(capture_stacks=True)
+        with connection.execute_wrapper(collector):
+            template.render(Context({'stocks': Stock.objects.all()}))
+        repeated = collector.repeated(5)
+        self.assertEqual(len(repeated), 1)
+        self.assertTrue(any(f.startswith('template ') for f in repeated[0]['stack']))
+
+    def test_reporte_para_metricas_de_request(self):
+        """El reporte usado en tearDown describe ruta, forma y pila."""
+        report = repeated_queries_report([{
+            'method': 'GET', 'path': '/x/',
+            'repeated_queries': [{'shape': 'SELECT 1', 'count': 7, 'stack': ['core/views.py:1 in v']}],
+        }])
+        self.assertIn('GET /x/: 7x SELECT 1', report)
+        self.assertIn('core/views.py:1 in v', report)
+        self.assertIsNone(repeated_queries_report([{'method': 'GET', 'path': '/', 'repeated_queries': []}]))
@@ -0,0 +1,69 @@
+import importlib.util
+import json
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, check_password, identify_hasher
+from django.core.cache import cache
+from django.test import override_settings
+
+from core.models import Usuario
+from .test_logger import LoggedTestCase
+
+
+class PasswordPolicyTests(LoggedTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _login(self, username, password):
+        return self.client.post('/usuarios/login/', json.dumps({'username': username, 'password': password}),
+                                content_type='application/json')
+
+    def test_tests_usan_politica_rapida(self):
+        self.assertEqual(settings.PASSWORD_HASH_POLICY, 'fast')
+        self.assertEqual(identify_hasher(make_password('x')).algorithm, 'md5')
+
+    def test_login_rehashea_hash_antiguo(self):
+        user = Usuario.objects.create(nombres='Re', usuario='rehash', email='re@example.test',
+                                      password=make_password('clave', hasher='pbkdf2_sha1'))
+        self.assertEqual(self._login('rehash', 'clave').status_code, 200)
+        user.refresh_from_db()
+        self.assertEqual(identify_hasher(user.password).algorithm, 'md5')
+        self.assertTrue(user.check_password('clave'))
+
+    def test_login_fallido_no_modifica_hash(self):
+        original = make_password('clave', hasher='pbkdf2_sha1')
+        user = Usuario.objects.create(nombres='Re2', usuario='rehash2', email='re2@example.test', password=original)
+        self.assertEqual(self._login('rehash2', 'otra').status_code, 401)
+        user.refresh_from_db()
+        self.assertEqual(user.password, original)
+
+    @override_settings(PASSWORD_HASHERS=settings.PASSWORD_HASHER_POLICIES['pbkdf2'], PBKDF2_ITERATIONS=1000)
+    def test_iteraciones_pbkdf2_configurables_y_actualizadas(self):
+        user = Usuario(nombres='It', usuario='iter', email='it@example.test')
+        user.set_password('clave')
+        user.save()
+        self.assertIn('$1000$', user.password)
+        with override_settings(PBKDF2_ITERATIONS=2000):
+            self.assertTrue(user.check_password('clave'))
+        user.refresh_from_db()
+        self.assertIn('$2000$', user.password)
+
+    def test_benchmark_coste_login_por_politica(self):
+        """Coste de CPU de un login (check_password) con cada política disponible."""
+        optional = {'argon2': 'argon2', 'bcrypt': 'bcrypt'}
+        results = {}
+        for policy, hashers in settings.PASSWORD_HASHER_POLICIES.items():
+            module = optional.get(policy)
+            if module and importlib.util.find_spec(module) is None:
+                results[policy] = None
+                continue
+            with override_settings(PASSWORD_HASHERS=hashers):
+                encoded = make_password('clave-benchmark')
+                start = time.process_time()
+                for _ in range(3):
+                    self.assertTrue(check_password('clave-benchmark', encoded))
+                results[policy] = (time.process_time() - start) / 3 * 1000.0
+        print('\n[HASH-BENCH] ' + ' | '.join(
+            f"{p}={'no instalado' if ms is None else f'{ms:.2f}ms'}" for p, ms in results.items()))
+        self.assertLess(results['fast'], results['pbkdf2'])
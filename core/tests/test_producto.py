@@ -1,7 +1,10 @@
+from django.db import IntegrityError, connection
 from django.test import Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from .test_logger import LoggedTestCase
 from core.models import Producto, Categoria, Stock, MovimientoInventario, Usuario
+from core.views import _mensaje_duplicado
 
 
 class ProductoTests(LoggedTestCase):
@@ -40,3 +43,42 @@ class ProductoTests(LoggedTestCase):
         self.assertEqual(s.cantidad, 3)
         mov = MovimientoInventario.objects.filter(producto=p, tipo='ALTA').first()
         self.assertIsNotNone(mov)
+
+    def _alta(self, codigo, nombre):
+        return self.client.post(reverse('producto-add'), {
+            'codigo_producto': codigo,
+            'nombre': nombre,
+            'descripcion': 'Alta de prueba',
+            'categoria': str(self.cat.id_categoria),
+            'precio': '100',
+            'cantidad': '1',
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def test_alta_inserta_primero_sin_consultas_de_duplicados(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self._alta('M010', 'Mazo')
+        self.assertEqual(resp.status_code, 201)
+        consultas = [q['sql'] for q in ctx.captured_queries
+                     if not q['sql'].startswith(('SAVEPOINT', 'RELEASE', 'ROLLBACK', 'BEGIN', 'COMMIT'))
+                     and 'django_session' not in q['sql']]
+        print(f'\n[ALTA] {len(consultas)} queries en el camino feliz (sin contar la sesión)')
+        # usuario de sesión + categoría + INSERT producto/stock/movimiento
+        self.assertLessEqual(len(consultas), 5)
+        self.assertFalse([q for q in consultas if 'core_producto' in q and q.startswith('SELECT')])
+
+    def test_alta_duplicados_por_restriccion_con_mensajes(self):
+        self.assertEqual(self._alta('M011', 'Sierra').status_code, 201)
+        resp = self._alta('M011', 'Otra sierra')
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(resp.json()['error'], 'El código M011 ya existe.')
+        resp = self._alta('M012', 'SIERRA')
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(resp.json()['error'], 'Ya existe un producto con el nombre "SIERRA".')
+        self.assertEqual(Producto.objects.count(), 1)
+        self.assertEqual(MovimientoInventario.objects.count(), 1)
+
+    def test_mensaje_duplicado_mysql(self):
+        error = IntegrityError(1062, "Duplicate entry 'codigo_producto' for key 'core_producto.producto_nombre_lower_uniq'")
+        self.assertEqual(_mensaje_duplicado(error, codigo='X001', nombre='codigo_producto'),
+                         'Ya existe un producto con el nombre "codigo_producto".')
+        self.assertIsNone(_mensaje_duplicado(IntegrityError('FOREIGN KEY constraint failed'), codigo='', nombre=''))
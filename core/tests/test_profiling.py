@@ -0,0 +1,53 @@
+import io
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import override_settings
+
+from core import profiling
+from .test_logger import LoggedTestCase
+
+
+class ProfilingTests(LoggedTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(REQUEST_PROFILING_ENABLED=True, REQUEST_PROFILING_DIR=self.tmp.name,
+                                     REQUEST_PROFILING_SAMPLE_RATE=0.0)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_header_activa_perfil_por_ruta_y_request_id(self):
+        resp = self.client.get('/core/categorias/', HTTP_X_PROFILE='1')
+        files = profiling.iter_profiles()
+        self.assertEqual(len(files), 1)
+        self.assertEqual(os.path.basename(files[0]), f"{resp['X-Request-ID']}.prof")
+        self.assertIn('core_categorias', files[0])
+
+    def test_sin_flag_ni_muestreo_no_perfila(self):
+        self.client.get('/core/categorias/')
+        self.assertEqual(profiling.iter_profiles(), [])
+        with override_settings(REQUEST_PROFILING_ENABLED=False):
+            self.client.get('/core/categorias/', {'__profile': '1'})
+        self.assertEqual(profiling.iter_profiles(), [])
+
+    def test_limite_de_tamano_borra_los_mas_antiguos(self):
+        for _ in range(3):
+            self.client.get('/core/categorias/', {'__profile': '1'})
+        files = profiling.iter_profiles()
+        self.assertEqual(len(files), 3)
+        for i, path in enumerate(files):
+            os.utime(path, (1000 + i, 1000 + i))
+        newest = files[-1]
+        removed = profiling.enforce_size_cap(os.path.getsize(newest))
+        self.assertEqual(removed, 2)
+        self.assertEqual(profiling.iter_profiles(), [newest])
+
+    def test_comando_agrega_perfiles(self):
+        self.client.get('/core/categorias/', HTTP_X_PROFILE='1')
+        self.client.get('/core/usuarios/', HTTP_X_PROFILE='1')
+        out = io.StringIO()
+        call_command('agregar_perfiles', ruta='core/categorias/', top=5, stdout=out)
+        self.assertIn('1 perfiles combinados', out.getvalue())
+        self.assertIn('listar_categorias', out.getvalue())
@@ -0,0 +1,86 @@
+import json
+import time
+
+from django.db.models.signals import post_init
+from django.http import JsonResponse
+
+from core import serializers
+from core.models import Categoria, MovimientoInventario, Producto
+from .test_logger import LoggedTestCase
+
+
+class SerializersTests(LoggedTestCase):
+    def setUp(self):
+        self.categoria = Categoria.objects.create(nombre='Ser')
+        self.producto = Producto.objects.create(codigo_producto='S001', nombre='Señal', descripcion='ñandú',
+                                                precio=100, cantidad=3, categoria=self.categoria)
+
+    def test_rows_y_one_producen_el_mismo_dict(self):
+        fila = serializers.PRODUCTO.rows(Producto.objects.filter(pk=self.producto.pk))[0]
+        self.assertEqual(fila, serializers.PRODUCTO.one(self.producto))
+        self.assertEqual(fila['categoria'], self.categoria.id_categoria)
+
+        mov = MovimientoInventario.objects.create(producto=self.producto, producto_codigo='S001', cantidad=3,
+                                                  tipo='MODI', cambios={'precio': {'antes': 1, 'despues': 2}})
+        fila = serializers.MOVIMIENTO.rows(MovimientoInventario.objects.filter(pk=mov.pk))[0]
+        self.assertEqual(fila, serializers.MOVIMIENTO.one(mov))
+        self.assertEqual((fila['producto'], fila['cambios']), (self.producto.pk, {'precio': {'antes': 1, 'despues': 2}}))
+
+    def test_fast_json_response_compatible_con_json_response(self):
+        data = {'nombre': 'Señal', 'cantidad': 3, 'lista': [1, None, True]}
+        rapida = serializers.FastJsonResponse(data, status=201)
+        self.assertEqual(rapida.status_code, 201)
+        self.assertEqual(rapida['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(rapida.content), json.loads(JsonResponse(data).content))
+
+    def test_endpoints_json(self):
+        resp = self.client.get(f'/core/producto/json/{self.producto.pk}/')
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual(data['codigo_producto'], 'S001')
+        self.assertEqual(data['categorias'], [{'id': self.categoria.id_categoria, 'nombre': 'Ser'}])
+        self.assertEqual(self.client.get('/core/producto/json/999999/').status_code, 404)
+        self.assertEqual(self.client.get('/core/categorias/json/').json(),
+                         {'categorias': [{'id': self.categoria.id_categoria, 'nombre': 'Ser'}]})
+
+    def test_benchmark_10k_productos(self):
+        """Serializar 10k productos: instancias + JsonResponse vs values_list + FastJsonResponse."""
+        Producto.objects.bulk_create([
+            Producto(codigo_producto=f'{chr(65 + i // 1000)}{i % 1000:03d}',
+                     nombre=f'Bench {i}', descripcion='descripción de prueba', precio=i,
+                     cantidad=i % 50, categoria=self.categoria)
+            for i in range(9999)
+        ], batch_size=1000)
+        self.assertEqual(Producto.objects.count(), 10000)
+
+        inicio = time.perf_counter()
+        antes = [{
+            'id': p.id_producto,
+            'codigo_producto': p.codigo_producto,
+            'nombre': p.nombre,
+            'descripcion': p.descripcion,
+            'categoria': p.categoria.id_categoria,
+            'precio': p.precio,
+            'cantidad': p.cantidad,
+        } for p in Producto.objects.select_related('categoria')]
+        body_antes = JsonResponse({'productos': antes}).content
+        ms_antes = (time.perf_counter() - inicio) * 1000.0
+
+        instancias = []
+
+        def contar(sender, **kwargs):
+            instancias.append(sender)
+
+        post_init.connect(contar, sender=Producto)
+        self.addCleanup(post_init.disconnect, contar, sender=Producto)
+        inicio = time.perf_counter()
+        with self.assertNumQueries(1):
+            body_despues = serializers.FastJsonResponse({'productos': serializers.PRODUCTO.rows()}).content
+        ms_despues = (time.perf_counter() - inicio) * 1000.0
+
+        encoder = 'orjson' if serializers.orjson is not None else 'json'
+        print(f'\n[SERIALIZE] 10k productos: JsonResponse={ms_antes:.1f} ms '
+              f'FastJsonResponse({encoder})={ms_despues:.1f} ms')
+        self.assertEqual(json.loads(body_antes), json.loads(body_despues))
+        # Una sola consulta proyectada, sin instanciar ningún Producto
+        self.assertEqual(instancias, [])
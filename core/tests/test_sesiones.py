@@ -0,0 +1,149 @@
+import io
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+
+from core.middleware import SESSION_REFRESH_KEY
+from core.session_cleanup import sweep_expired_sessions
+from core.tasks import PeriodicTask
+from core.models import Usuario
+from .test_logger import LoggedTestCase
+
+
+def _session_writes(queries):
+    return [q['sql'] for q in queries
+            if 'django_session' in q['sql'] and q['sql'].lstrip().upper().startswith(('INSERT', 'UPDATE'))]
+
+
+class SessionWritesTests(LoggedTestCase):
+    def setUp(self):
+        self.user = Usuario.objects.create(nombres='Ses', usuario='ses1', email='ses1@example.test')
+        session = self.client.session
+        session['conectado_usuario'] = self.user.id_usuario
+        session.save()
+
+    def test_navegacion_no_escribe_sesion_en_cada_request(self):
+        """30 requests seguidas (páginas + AJAX) producen como mucho una escritura de sesión."""
+        urls = ['/core/producto/', '/core/categorias/json/', '/core/producto/next_code/M/', '/main']
+        with CaptureQueriesContext(connection) as ctx:
+            for i in range(30):
+                self.assertEqual(self.client.get(urls[i % len(urls)]).status_code, 200)
+        writes = _session_writes(ctx.captured_queries)
+        print(f'\n[SESSION-WRITES] 30 requests -> {len(writes)} escrituras de sesión')
+        self.assertLessEqual(len(writes), 1)
+
+    def test_renueva_cuando_pasa_la_fraccion(self):
+        session = self.client.session
+        session[SESSION_REFRESH_KEY] = int(time.time()) - 10 * 60
+        session.save()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/core/categorias/json/')
+        self.assertEqual(len(_session_writes(ctx.captured_queries)), 1)
+        self.assertGreater(self.client.session[SESSION_REFRESH_KEY], int(time.time()) - 5)
+
+    def test_sin_sesion_no_crea_nada(self):
+        self.client.cookies.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/core/categorias/json/')
+        self.assertEqual(_session_writes(ctx.captured_queries), [])
+
+
+class SessionSweepTests(LoggedTestCase):
+    def _crear_sesiones(self, n, delta):
+        expire = timezone.now() + delta
+        Session.objects.bulk_create([
+            Session(session_key=f'k{delta.total_seconds():.0f}x{i:04d}', session_data='', expire_date=expire)
+            for i in range(n)
+        ])
+
+    def test_barrido_por_lotes_solo_expiradas(self):
+        self._crear_sesiones(25, timedelta(hours=-1))
+        self._crear_sesiones(5, timedelta(hours=1))
+        stats = sweep_expired_sessions(batch_size=10)
+        self.assertEqual(stats['eliminadas'], 25)
+        self.assertEqual(stats['lotes'], 3)
+        self.assertEqual(Session.objects.count(), 5)
+
+    def test_max_lotes_limita_el_trabajo_por_ejecucion(self):
+        self._crear_sesiones(25, timedelta(hours=-1))
+        self.assertEqual(sweep_expired_sessions(batch_size=10, max_batches=1)['eliminadas'], 10)
+
+    def test_comando_reporta_filas(self):
+        self._crear_sesiones(3, timedelta(hours=-1))
+        out = io.StringIO()
+        call_command('limpiar_sesiones', lote=2, compactar=True, stdout=out)
+        self.assertIn('Sesiones expiradas eliminadas: 3 (lotes: 2', out.getvalue())
+        self.assertEqual(Session.objects.count(), 0)
+
+    def test_barrido_se_reporta_por_un_logger_configurado(self):
+        handler = next(h for h in logging.getLogger('core').handlers if isinstance(h, logging.StreamHandler))
+        salida = io.StringIO()
+        anterior = handler.setStream(salida)
+        try:
+            self._crear_sesiones(2, timedelta(hours=-1))
+            sweep_expired_sessions(batch_size=10)
+        finally:
+            handler.setStream(anterior)
+        self.assertIn('Barrido de sesiones: 2 eliminadas en 1 lotes', salida.getvalue())
+
+    def test_tarea_periodica_en_proceso(self):
+        done = threading.Event()
+        task = PeriodicTask('test-barrido', 0.01, lambda: done.set() or 'ok')
+        task.start()
+        try:
+            self.assertTrue(done.wait(2))
+        finally:
+            task.stop(timeout=2)
+        self.assertFalse(task.alive)
+        self.assertGreaterEqual(task.runs, 1)
+
+
+class SessionHeartbeatTests(LoggedTestCase):
+    def setUp(self):
+        self.user = Usuario.objects.create(nombres='Hb', usuario='hb1', email='hb1@example.test')
+        session = self.client.session
+        session['conectado_usuario'] = self.user.id_usuario
+        session.save()
+
+    def test_heartbeat_sin_queries_ni_escrituras(self):
+        self.client.get('/core/categorias/json/')  # renueva y marca la sesión
+        # Sólo la lectura de la sesión (ninguna con cached_db y una cache compartida)
+        consultas = 0 if settings.SESSION_ENGINE.endswith('cached_db') else 1
+        with self.assertNumQueries(consultas):
+            resp = self.client.get('/usuarios/sesion/')
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertTrue(data['autenticado'])
+        self.assertGreater(data['segundos_restantes'], 15 * 60 - 5)
+        self.assertLessEqual(data['segundos_restantes'], 15 * 60)
+
+    def test_heartbeat_no_renueva_aunque_toque(self):
+        session = self.client.session
+        vieja = int(time.time()) - 10 * 60
+        session[SESSION_REFRESH_KEY] = vieja
+        session.save()
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get('/usuarios/sesion/').json()
+        self.assertEqual(_session_writes(ctx.captured_queries), [])
+        self.assertLessEqual(data['segundos_restantes'], 5 * 60)
+        self.assertEqual(self.client.session[SESSION_REFRESH_KEY], vieja)
+
+    def test_heartbeat_sin_sesion_devuelve_401(self):
+        self.client.cookies.clear()
+        resp = self.client.get('/usuarios/sesion/')
+        self.assertEqual(resp.status_code, 401)
+        self.assertFalse(resp.json()['autenticado'])
+
+    def test_heartbeat_solo_en_paginas_con_sesion(self):
+        # session_expiry.js sólo arranca el heartbeat con data-autenticado="true"
+        self.assertContains(self.client.get('/core/producto/'), '<body data-autenticado="true">')
+        self.client.cookies.clear()
+        self.assertContains(self.client.get('/'), '<body data-autenticado="false">')
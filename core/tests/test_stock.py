@@ -48,8 +48,8 @@ class StockUnitTests(LoggedTestCase):
         mov = MovimientoInventario.objects.filter(producto=prod, tipo='MODI').first()
         self.assertIsNotNone(mov, 'No se registró movimiento MODI')
         self.assertEqual(mov.cantidad, 10)
-        # Comprobar contenido de resumen_operacion: intentar parsear JSON o validar texto legible
-        resumen = mov.resumen_operacion or ''
+        # Comprobar contenido del resumen: intentar parsear JSON o validar texto legible
+        resumen = mov.resumen
         parsed = None
         try:
             parsed = json.loads(resumen)
@@ -99,8 +99,8 @@ class StockUnitTests(LoggedTestCase):
         mov = MovimientoInventario.objects.filter(producto=prod, tipo='MODI').first()
         self.assertIsNotNone(mov, 'No se registró movimiento MODI')
         self.assertEqual(mov.cantidad, 5)
-        # Validar resumen_operacion contiene antes/despues de cantidad
-        resumen = mov.resumen_operacion or ''
+        # Validar que el resumen contiene antes/despues de cantidad
+        resumen = mov.resumen
         parsed = None
         try:
             parsed = json.loads(resumen)
@@ -0,0 +1,94 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection
+from django.template import engines
+from django.template.loaders.filesystem import Loader as FilesystemLoader
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Usuario, Categoria, Producto
+from system.context_processors import session_data
+from .test_logger import LoggedTestCase
+
+
+def _render_main(n, usuario_id):
+    """Renderiza main.html `n` veces (contexto como en la vista) y devuelve ms por render."""
+    factory = RequestFactory()
+    productos = list(Producto.objects.select_related('categoria'))
+    categorias = list(Categoria.objects.all())
+    engine = engines.all()[0]
+    inicio = time.perf_counter()
+    for _ in range(n):
+        # Como `render()` en las vistas: se resuelve el template en cada request
+        template = engine.get_template('main.html')
+        request = factory.get('/main')
+        request.session = {'conectado_usuario': usuario_id}
+        template.render({'productos': productos, 'q': '', 'categorias': categorias}, request)
+    return (time.perf_counter() - inicio) * 1000.0 / n
+
+
+class TemplateProfileTests(LoggedTestCase):
+    def setUp(self):
+        self.user = Usuario.objects.create(nombres='Tpl', usuario='tpl1', email='tpl1@example.test')
+        categoria = Categoria.objects.create(nombre='Tpl')
+        for i in range(20):
+            Producto.objects.create(codigo_producto=f'T{i:03d}', nombre=f'Tpl {i}', descripcion='x',
+                                    precio=100, categoria=categoria)
+
+    def test_benchmark_render_main_perfiles(self):
+        """Render de main.html sin cache de templates vs perfiles dev/prod; imprime ms por render."""
+        sin_cache = dict(settings.TEMPLATE_PROFILES['prod'], APP_DIRS=False)
+        sin_cache['OPTIONS'] = dict(sin_cache['OPTIONS'],
+                                    loaders=['django.template.loaders.app_directories.Loader'])
+        configs = {'sin_cache': sin_cache, **settings.TEMPLATE_PROFILES}
+        n = 30
+        resultados = {}
+        lecturas = {}
+        leer = FilesystemLoader.get_contents
+        for nombre, config in configs.items():
+            with override_settings(TEMPLATES=[config]):
+                _render_main(1, self.user.id_usuario)  # calentamiento (compila si hay cache)
+                # Lecturas de fuentes de template durante los renders medidos
+                with mock.patch.object(FilesystemLoader, 'get_contents', autospec=True,
+                                       side_effect=leer) as get_contents:
+                    resultados[nombre] = _render_main(n, self.user.id_usuario)
+                lecturas[nombre] = get_contents.call_count
+        print(f"\n[TEMPLATES] main.html x{n}: " +
+              ' '.join(f'{k}={v:.2f} ms/render' for k, v in resultados.items()) +
+              f' lecturas={lecturas}')
+        # Con la cache de templates no se vuelve a leer ni compilar nada tras el calentamiento
+        self.assertEqual(lecturas['prod'], 0)
+        self.assertGreaterEqual(lecturas['sin_cache'], n)
+
+    def test_session_data_una_consulta_a_usuario_por_render(self):
+        """Una query a Usuario por render: comprueba que sigue existiendo y trae los campos."""
+        with override_settings(TEMPLATES=[settings.TEMPLATE_PROFILES['prod']]):
+            with CaptureQueriesContext(connection) as ctx:
+                _render_main(3, self.user.id_usuario)
+        consultas_usuario = [q['sql'] for q in ctx.captured_queries if 'core_usuario' in q['sql']]
+        self.assertEqual(len(consultas_usuario), 3)
+
+    def test_session_data_usuario_eliminado(self):
+        request = RequestFactory().get('/main')
+        self.client.get('/')  # crea la sesión
+        request.session = self.client.session
+        request.session['conectado_usuario'] = self.user.id_usuario
+        request.session.save()
+        self.user.delete()
+        contexto = session_data(request)
+        self.assertFalse(contexto['session_user_is_authenticated'])
+        self.assertIsNone(request.session.get('conectado_usuario'))
+        self.assertIsNone(request.session.session_key)
+
+    def test_session_data_una_consulta(self):
+        request = RequestFactory().get('/main')
+        request.session = {'conectado_usuario': self.user.id_usuario}
+        with CaptureQueriesContext(connection) as ctx:
+            contexto = session_data(request)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertTrue(contexto['session_user_is_authenticated'])
+        self.assertEqual(contexto['session_usuario_id'], self.user.id_usuario)
+        self.assertEqual((contexto['session_usuario_nombre'], contexto['session_usuario_email']),
+                         ('Tpl', 'tpl1@example.test'))
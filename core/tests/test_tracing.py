@@ -0,0 +1,64 @@
+from django.test import override_settings
+
+from core.models import Usuario, Categoria, Producto, Stock
+from .test_logger import LoggedTestCase
+
+
+@override_settings(TRACING_SAMPLE_RATE=1.0, DEBUG=True)
+class TracingTests(LoggedTestCase):
+    def setUp(self):
+        self.user = Usuario.objects.create(nombres='Tr', usuario='tr1', email='tr1@example.test')
+        self.cat = Categoria.objects.create(nombre='TrCat')
+        self.prod = Producto.objects.create(codigo_producto='T001', nombre='ProdTr', descripcion='x',
+                                            categoria=self.cat, precio=10, cantidad=1)
+        Stock.objects.create(producto=self.prod, cantidad=1)
+        session = self.client.session
+        session['conectado_usuario'] = self.user.id_usuario
+        session.save()
+
+    def _update(self, **extra):
+        return self.client.post(f'/core/producto/update/{self.prod.id_producto}/', {
+            'nombre': 'ProdTr', 'descripcion': 'y', 'categoria': self.cat.id_categoria,
+            'precio': 20, 'cantidad': 3,
+        }, **extra)
+
+    def test_spans_anidados_en_actualizar_producto(self):
+        resp = self._update()
+        request_id = resp['X-Request-ID']
+        self.assertTrue(request_id)
+
+        data = self.client.get('/core/debug/traces/', {'request_id': request_id}).json()
+        names = [s['name'] for s in data['spans']]
+        self.assertEqual(names[0], f'POST /core/producto/update/{self.prod.id_producto}/')
+        self.assertIn('view actualizar_producto', names)
+        self.assertIn('transaccion', names)
+        self.assertIn('full_clean', names)
+        spans = {s['name']: s for s in data['spans']}
+        transaccion = data['spans'].index(spans['transaccion'])
+        # las queries del UPDATE cuelgan del span de transacción
+        self.assertTrue(any(s['cat'] == 'sql' and s['parent'] == transaccion for s in data['spans']))
+        self.assertEqual(spans['view actualizar_producto']['depth'], 1)
+
+    def test_request_id_entrante_y_render_de_template(self):
+        resp = self.client.get('/core/categorias/', HTTP_X_REQUEST_ID='abc-123')
+        self.assertEqual(resp['X-Request-ID'], 'abc-123')
+        data = self.client.get('/core/debug/traces/', {'request_id': 'abc-123'}).json()
+        self.assertIn('render categorias.html', [s['name'] for s in data['spans']])
+
+    def test_export_chrome_trace(self):
+        request_id = self._update()['X-Request-ID']
+        resp = self.client.get('/core/debug/traces/', {'request_id': request_id, 'format': 'chrome'})
+        events = resp.json()['traceEvents']
+        self.assertTrue(events)
+        self.assertTrue(all(e['ph'] == 'X' and e['dur'] >= 0 for e in events))
+        self.assertTrue(all(e['args']['request_id'] == request_id for e in events))
+
+    @override_settings(TRACING_SAMPLE_RATE=0.0)
+    def test_sin_muestreo_no_guarda_traza(self):
+        request_id = self._update()['X-Request-ID']
+        resp = self.client.get('/core/debug/traces/', {'request_id': request_id})
+        self.assertEqual(resp.status_code, 404)
+
+    @override_settings(DEBUG=False)
+    def test_endpoint_oculto_sin_debug(self):
+        self.assertEqual(self.client.get('/core/debug/traces/').status_code, 404)
@@ -0,0 +1,115 @@
+"""Limitador de intentos de login con ventana deslizante sobre la cache compartida.
+
+Cuenta los intentos fallidos por usuario y por IP con el algoritmo de
+"ventana deslizante aproximada": dos contadores de ventana fija (la actual y la
+anterior) ponderados por el solapamiento con la ventana deslizante. Cuesta una
+lectura `get_many` para comprobar y un `incr` por clave al registrar un fallo,
+sin ningún hash de contraseña ni query a la BD.
+
+Con varios workers/procesos `CACHES['default']` debe ser compartida (Redis,
+Memcached o database); con LocMemCache cada proceso lleva su propia cuenta.
+"""
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger('request_metrics')
+
+# Contadores de rechazos del proceso (para métricas/tests)
+THROTTLE_STATS = {'rejected_username': 0, 'rejected_ip': 0, 'failures_recorded': 0}
+_stats_lock = threading.Lock()
+
+
+def _now():
+    return time.time()
+
+
+def _config():
+    return {
+        'window': getattr(settings, 'LOGIN_THROTTLE_WINDOW_S', 300),
+        'username': getattr(settings, 'LOGIN_THROTTLE_MAX_PER_USERNAME', 5),
+        'ip': getattr(settings, 'LOGIN_THROTTLE_MAX_PER_IP', 20),
+    }
+
+
+def _key(scope, value, window_index):
+    digest = hashlib.sha1(value.encode('utf-8')).hexdigest()[:20]
+    return f'login-throttle:{scope}:{digest}:{window_index}'
+
+
+def client_ip(request):
+    """IP del cliente. Sólo confía en X-Forwarded-For si `LOGIN_THROTTLE_TRUST_FORWARDED`."""
+    if getattr(settings, 'LOGIN_THROTTLE_TRUST_FORWARDED', False):
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '') or 'unknown'
+
+
+def _scopes(username, ip):
+    cfg = _config()
+    scopes = []
+    if username:
+        scopes.append(('username', username.strip().lower(), cfg['username']))
+    if ip:
+        scopes.append(('ip', ip, cfg['ip']))
+    return scopes, cfg['window']
+
+
+def _weighted_counts(scopes, window, now):
+    index = int(now // window)
+    elapsed_fraction = (now % window) / window
+    keys = {}
+    for scope, value, _ in scopes:
+        keys[scope] = (_key(scope, value, index), _key(scope, value, index - 1))
+    values = cache.get_many([k for pair in keys.values() for k in pair])
+    counts = {}
+    for scope, (current, previous) in keys.items():
+        counts[scope] = values.get(current, 0) + values.get(previous, 0) * (1.0 - elapsed_fraction)
+    return counts, elapsed_fraction
+
+
+def check_login_allowed(username, ip, now=None):
+    """Comprueba si se admite un intento. Devuelve (permitido, retry_after_s)."""
+    now = _now() if now is None else now
+    scopes, window = _scopes(username, ip)
+    if not scopes:
+        return True, 0
+    counts, elapsed_fraction = _weighted_counts(scopes, window, now)
+    for scope, value, limit in scopes:
+        if counts[scope] >= limit:
+            with _stats_lock:
+                THROTTLE_STATS[f'rejected_{scope}'] += 1
+            logger.warning('login bloqueado por exceso de intentos (%s) ip=%s', scope, ip)
+            retry_after = max(1, int(window * (1.0 - elapsed_fraction)))
+            return False, retry_after
+    return True, 0
+
+
+def register_login_failure(username, ip, now=None):
+    """Suma un fallo de credenciales a los contadores de usuario e IP."""
+    now = _now() if now is None else now
+    scopes, window = _scopes(username, ip)
+    index = int(now // window)
+    for scope, value, _ in scopes:
+        key = _key(scope, value, index)
+        # add() crea la clave con TTL de dos ventanas; incr() es atómico en backends compartidos
+        if not cache.add(key, 1, timeout=window * 2):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, timeout=window * 2)
+    with _stats_lock:
+        THROTTLE_STATS['failures_recorded'] += 1
+
+
+def reset_login_failures(username, now=None):
+    """Limpia los fallos del usuario tras un login correcto (los de la IP se mantienen)."""
+    now = _now() if now is None else now
+    scopes, window = _scopes(username, None)
+    index = int(now // window)
+    cache.delete_many([_key(scope, value, i) for scope, value, _ in scopes for i in (index, index - 1)])
@@ -0,0 +1,221 @@
+"""Trazas ligeras en proceso: spans anidados por request.
+
+Una traza se abre en `RequestMetricsMiddleware` (si la request sale muestreada)
+y acumula spans: request -> view -> bloques instrumentados con `span()` ->
+cada query SQL -> render de templates. Las trazas terminadas se guardan en un
+buffer circular (`TRACE_BUFFER`) consultable en /core/debug/traces/ y
+exportable como Chrome trace-event JSON (chrome://tracing, Perfetto,
+speedscope).
+
+Si no hay traza activa, `span()` es un no-op barato.
+"""
+import contextvars
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates, Template as DjangoTemplate
+
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+_buffer_lock = threading.Lock()
+TRACE_BUFFER = deque(maxlen=200)
+_REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+class Trace:
+    """Traza de una request: lista plana de spans con profundidad y padre."""
+
+    def __init__(self, request_id, method='', path=''):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.status = None
+        self.thread_id = threading.get_ident()
+        self.wall_start = time.time()
+        self._t0 = time.perf_counter()
+        self.spans = []
+        self._open = []
+
+    def _now_us(self):
+        return (time.perf_counter() - self._t0) * 1e6
+
+    def start(self, name, category='app', **attrs):
+        span = {
+            'name': name,
+            'cat': category,
+            'start_us': self._now_us(),
+            'end_us': None,
+            'depth': len(self._open),
+            'parent': self._open[-1]['id'] if self._open else None,
+            'id': len(self.spans),
+            'attrs': attrs,
+        }
+        self.spans.append(span)
+        self._open.append(span)
+        return span
+
+    def finish(self, span):
+        span['end_us'] = self._now_us()
+        if span in self._open:
+            # Cerrar también cualquier hijo que haya quedado abierto
+            while self._open:
+                if self._open.pop() is span:
+                    break
+
+    def record(self, name, category, start_perf, end_perf, **attrs):
+        """Añade un span ya terminado medido con time.perf_counter()."""
+        self.spans.append({
+            'name': name,
+            'cat': category,
+            'start_us': (start_perf - self._t0) * 1e6,
+            'end_us': (end_perf - self._t0) * 1e6,
+            'depth': len(self._open),
+            'parent': self._open[-1]['id'] if self._open else None,
+            'id': len(self.spans),
+            'attrs': attrs,
+        })
+
+    @property
+    def duration_ms(self):
+        ends = [s['end_us'] for s in self.spans if s['end_us'] is not None]
+        return max(ends) / 1000.0 if ends else 0.0
+
+    def summary(self):
+        return {
+            'request_id': self.request_id,
+            'method': self.method,
+            'path': self.path,
+            'status': self.status,
+            'start': self.wall_start,
+            'duration_ms': round(self.duration_ms, 3),
+            'spans': len(self.spans),
+        }
+
+    def to_dict(self):
+        data = self.summary()
+        data['spans'] = [
+            {
+                'name': s['name'],
+                'cat': s['cat'],
+                'start_ms': round(s['start_us'] / 1000.0, 3),
+                'duration_ms': round(((s['end_us'] or s['start_us']) - s['start_us']) / 1000.0, 3),
+                'depth': s['depth'],
+                'parent': s['parent'],
+                'attrs': s['attrs'],
+            }
+            for s in self.spans
+        ]
+        return data
+
+    def chrome_events(self):
+        """Eventos 'complete' (ph=X) del formato Chrome trace-event."""
+        base_us = self.wall_start * 1e6
+        pid = os.getpid()
+        events = []
+        for s in self.spans:
+            end = s['end_us'] if s['end_us'] is not None else s['start_us']
+            args = dict(s['attrs'], request_id=self.request_id)
+            events.append({
+                'name': s['name'],
+                'cat': s['cat'],
+                'ph': 'X',
+                'ts': round(base_us + s['start_us'], 3),
+                'dur': round(end - s['start_us'], 3),
+                'pid': pid,
+                'tid': self.thread_id,
+                'args': args,
+            })
+        return events
+
+
+def chrome_trace(traces):
+    """Documento Chrome trace-event JSON para una o varias trazas."""
+    events = []
+    for trace in traces:
+        events.extend(trace.chrome_events())
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def request_id_from(request):
+    """Usa el header X-Request-ID entrante si es válido; si no, genera uno."""
+    incoming = request.META.get('HTTP_X_REQUEST_ID', '')
+    if incoming and _REQUEST_ID_RE.match(incoming):
+        return incoming
+    return uuid.uuid4().hex
+
+
+def should_sample():
+    rate = getattr(settings, 'TRACING_SAMPLE_RATE', 0.0)
+    return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+
+def start_trace(request_id, method='', path=''):
+    """Activa una traza en el contexto actual. Devuelve (trace, token)."""
+    trace = Trace(request_id, method, path)
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(trace, token):
+    """Cierra la traza, la desactiva del contexto y la guarda en el buffer."""
+    _current_trace.reset(token)
+    while trace._open:
+        trace.finish(trace._open[-1])
+    size = getattr(settings, 'TRACING_BUFFER_SIZE', 200)
+    global TRACE_BUFFER
+    with _buffer_lock:
+        if TRACE_BUFFER.maxlen != size:
+            TRACE_BUFFER = deque(TRACE_BUFFER, maxlen=size)
+        TRACE_BUFFER.append(trace)
+
+
+def recent_traces():
+    with _buffer_lock:
+        return list(TRACE_BUFFER)
+
+
+def find_trace(request_id):
+    for trace in reversed(recent_traces()):
+        if trace.request_id == request_id:
+            return trace
+    return None
+
+
+@contextmanager
+def span(name, category='app', **attrs):
+    """Abre un span hijo del span actual si hay una traza activa."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    s = trace.start(name, category, **attrs)
+    try:
+        yield s
+    finally:
+        trace.finish(s)
+
+
+class TracedTemplate(DjangoTemplate):
+    def render(self, context=None, request=None):
+        with span(f'render {self.template.name or "<string>"}', 'template'):
+            return super().render(context, request)
+
+
+class TracingDjangoTemplates(DjangoTemplates):
+    """Backend de templates de Django que registra un span por render."""
+
+    def from_string(self, template_code):
+        return TracedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TracedTemplate(template.template, self)
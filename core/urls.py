@@ -11,18 +11,30 @@ urlpatterns = [
     path('producto/add/', views.agregar_producto, name='producto-add'),
     # Endpoint para eliminar un producto (POST)
     path('producto/delete/<int:producto_id>/', views.eliminar_producto, name='producto-eliminar'),
+    # Endpoint para eliminar productos en lote por ids o categoría (POST)
+    path('producto/delete/', views.eliminar_productos, name='producto-eliminar-lote'),
+    # Productos archivados (borrado lógico) con opción de restaurar
+    path('producto/archivados/', views.listar_archivados, name='producto-archivados'),
+    # Endpoint para restaurar un producto archivado (POST)
+    path('producto/restaurar/<int:producto_id>/', views.restaurar_producto, name='producto-restaurar'),
     # Endpoint JSON para obtener siguiente código por letra
     path('producto/next_code/<str:letter>/', views.next_codigo, name='producto-next-code'),
         # Endpoint para actualizar un producto (desde modal editar)
         path('producto/update/<int:producto_id>/', views.actualizar_producto, name='producto-update'),
+    # Endpoint JSON de sugerencias para la búsqueda mientras se escribe (?q=&seq=)
+    path('producto/sugerencias/', views.sugerencias_productos, name='producto-sugerencias'),
     # Endpoint JSON para obtener los datos de un producto
     path('producto/json/<int:producto_id>/', views.obtener_producto_json, name='producto-json'),
+    # Endpoint JSON del historial de movimientos (?desde=&hasta=&codigo=&tipo=&limite=)
+    path('movimientos/json/', views.movimientos_json, name='movimiento-json'),
     # Endpoint JSON para obtener lista de categorias
     path('categorias/json/', views.categorias_json, name='categoria-json'),
     # Lista de categorías en /core/categorias/
     path('categorias/', views.listar_categorias, name='categoria-list'),
     # Lista de usuarios en /core/usuarios/
     path('usuarios/', views.listar_usuarios, name='usuario-list'),
+    # Trazas recientes por request (sólo con DEBUG)
+    path('debug/traces/', views.debug_traces, name='debug-traces'),
     # Ruta para detalle de producto por id
     path('producto/<int:producto_id>/', views.obtener_productos, name='producto-detalle'),
 ]
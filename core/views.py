@@ -1,77 +1,37 @@
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.http import Http404
 from django.urls import reverse
 from django.contrib import messages
 from django.db import IntegrityError, transaction
 from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
 from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import datetime
 import json
 
-from .models import Producto, Categoria, MovimientoInventario, Stock, Usuario
+from .models import Producto, Categoria, Stock, Usuario
 from .decorators import require_session
+from . import auditoria, catalogo, serializers, tracing
+from .archivado import historial
+from .resumen import estado_producto
+from .serializers import FastJsonResponse
 from django.db.models import Q
 
 
-def _format_cambios_readable(cambios):
-    """Convierte el dict `cambios` en una cadena legible en español.
-
-    Espera un dict con claves de campo y valores {'antes': ..., 'despues': ...}.
-    Devuelve por ejemplo: "Cambios: Precio 500 a 201, Nombre asdf a asdfaa".
-    """
-    if not cambios:
-        return ''
-    parts = []
-    # mapeo de campos internos a etiquetas legibles
-    labels = {
-        'precio': 'Precio',
-        'nombre': 'Nombre',
-        'descripcion': 'Descripción',
-        'categoria': 'Categoría',
-        'cantidad': 'Cantidad',
-    }
-    for field, vals in cambios.items():
-        antes = vals.get('antes') if isinstance(vals, dict) else None
-        despues = vals.get('despues') if isinstance(vals, dict) else None
-        label = labels.get(field, field.capitalize())
-        # handle category specially if dict with id/nombre
-        if field == 'categoria':
-            name_before = antes.get('nombre') if isinstance(antes, dict) else (antes or '')
-            name_after = despues.get('nombre') if isinstance(despues, dict) else (despues or '')
-            parts.append(f"{label} {name_before or '(ninguna)'} a {name_after or '(ninguna)'}")
-        else:
-            parts.append(f"{label} {antes if antes is not None else '(ninguno)'} a {despues if despues is not None else '(ninguno)'}")
-    return 'Cambios: ' + ', '.join(parts)
-
-
 # Create your views here.
 def obtener_productos(request, producto_id=None):
-    """Renderiza la página `main.html` cargando todos los productos.
+    """Renderiza la página `main.html` con el listado de productos.
 
-    Si se proporciona `producto_id`, devuelve sólo ese producto en el contexto
-    (útil para una vista detalle). En caso contrario, carga todos los productos.
+    Búsqueda (`?q=`), filtro por categoría (`?categoria=`) y paginación
+    (`?pagina=`) los resuelve `core.catalogo`, igual que en `/main`.
     """
     # Bloquear acceso directo a detalles por id: siempre devolver 404
     if producto_id:
         raise Http404('Acceso directo a detalle de producto no permitido')
-    else:
-        # Soportar búsqueda por query string ?q=texto (por código o nombre)
-        q = request.GET.get('q', '').strip()
-        if q:
-            productos = Producto.objects.filter(
-                Q(codigo_producto__icontains=q) | Q(nombre__icontains=q)
-            ).order_by('codigo_producto')
-        else:
-            productos = Producto.objects.all().order_by('codigo_producto')
-
-    # También pasamos las categorías para poblar el modal de creación
-    categorias = Categoria.objects.all()
-
-    contexto = {
-        'productos': productos,
-        'categorias': categorias,
-        'q': q if 'q' in locals() else '',
-    }
-    return render(request, 'main.html', contexto)
+    return render(request, 'main.html', catalogo.contexto_listado(request))
 
 
 def listar_categorias(request):
@@ -83,6 +43,28 @@ def listar_categorias(request):
     return render(request, 'categorias.html', contexto)
 
 
+@require_session
+def listar_archivados(request):
+    """Renderiza `archivados.html`: productos archivados (borrado lógico) que se pueden restaurar.
+
+    Los más recientes primero, con búsqueda por código o nombre (`?q=`) y
+    paginación (`?pagina=`). No incluye los que la purga ya reclamó.
+    """
+    q = request.GET.get('q', '').strip()
+    archivados = (Producto.objects.filter(archivado=True, archivado_en__isnull=False)
+                  .select_related('categoria').order_by('-archivado_en', 'id_producto'))
+    if q:
+        archivados = archivados.filter(Q(codigo_producto__icontains=q) | Q(nombre__icontains=q))
+    paginator = Paginator(archivados, getattr(settings, 'PRODUCTOS_POR_PAGINA', 50))
+    page = paginator.get_page(request.GET.get('pagina'))
+    contexto = {
+        'productos': page.object_list,
+        'page_obj': page,
+        'q': q,
+    }
+    return render(request, 'archivados.html', contexto)
+
+
 def listar_usuarios(request):
     """Renderiza la página `usuarios.html` cargando todos los usuarios."""
     from .models import Usuario
@@ -91,9 +73,11 @@ def listar_usuarios(request):
     if q:
         usuarios = Usuario.objects.filter(
             Q(usuario__icontains=q) | Q(nombres__icontains=q)
-        ).order_by('id_usuario')
+        )
     else:
-        usuarios = Usuario.objects.all().order_by('id_usuario')
+        usuarios = Usuario.objects.all()
+    # Sólo las columnas de la tabla: nunca se traen los hashes de contraseña
+    usuarios = usuarios.only('id_usuario', 'usuario', 'nombres', 'email', 'fecha_creacion').order_by('id_usuario')
 
     contexto = {
         'usuarios': usuarios,
@@ -118,6 +102,36 @@ def _get_session_usuario(request):
         return None
 
 
+# Restricciones únicas de Producto -> mensaje de error. Se busca el nombre de
+# la restricción/columna en el error de la BD: SQLite "UNIQUE constraint
+# failed: core_producto.codigo_producto" / "index 'producto_nombre_lower_uniq'",
+# MySQL "Duplicate entry '...' for key 'core_producto.codigo_producto'".
+_MENSAJES_DUPLICADO = (
+    ('codigo_producto', 'El código {codigo} ya existe.'),
+    ('producto_nombre_lower_uniq', 'Ya existe un producto con el nombre "{nombre}".'),
+    ('nombre', 'Ya existe un producto con el nombre "{nombre}".'),
+)
+
+
+def _mensaje_duplicado(error, **valores):
+    """Mensaje en español para un IntegrityError de unicidad de Producto, o None."""
+    texto = str(error)
+    # En MySQL el valor duplicado va en el mensaje: mirar sólo el nombre de la clave
+    if ' for key ' in texto:
+        texto = texto.rsplit(' for key ', 1)[1]
+    for restriccion, plantilla in _MENSAJES_DUPLICADO:
+        if restriccion in texto:
+            return plantilla.format(**valores)
+    return None
+
+
+def _archivado_con(codigo, nombre):
+    """Producto archivado (restaurable) que ocupa `codigo` o `nombre`, o None."""
+    return (Producto.objects.filter(archivado=True, archivado_en__isnull=False)
+            .filter(Q(codigo_producto=codigo) | Q(nombre__iexact=nombre))
+            .only('id_producto', 'codigo_producto', 'nombre').first())
+
+
 @require_session
 def agregar_producto(request):
     """Procesa el POST del modal para crear un nuevo Producto.
@@ -236,44 +250,26 @@ def agregar_producto(request):
         cantidad=cantidad,
     )
 
-    # Check duplicates proactively to provide specific messages
-    if Producto.objects.filter(codigo_producto=codigo).exists():
-        msg = f'El código {codigo} ya existe.'
-        if wants_json:
-            return JsonResponse({'error': msg}, status=409)
-        messages.error(request, msg)
-        return redirect('producto-list')
-    if Producto.objects.filter(nombre__iexact=nombre).exists():
-        msg = f'Ya existe un producto con el nombre "{nombre}".'
-        if wants_json:
-            return JsonResponse({'error': msg}, status=409)
-        messages.error(request, msg)
-        return redirect('producto-list')
-
     try:
-        # Guardar producto, stock inicial y registro de movimiento en una transacción
-        with transaction.atomic():
-            producto.full_clean()
+        # Insertar primero: los duplicados de código/nombre los detectan las
+        # restricciones únicas de la BD (ver _mensaje_duplicado), sin exists()
+        # previos ni las queries de unicidad de full_clean().
+        with tracing.span('transaccion'), transaction.atomic():
+            with tracing.span('full_clean'):
+                # `categoria` ya se cargó arriba; precio/cantidad ya validados
+                producto.full_clean(exclude=['categoria'], validate_unique=False, validate_constraints=False)
             producto.save()
             # Crear stock inicial con la cantidad proporcionada y registrar movimiento de ALTA
             Stock.objects.create(producto=producto, cantidad=cantidad)
-            mov_usuario = _get_session_usuario(request)
-            # Registrar movimiento ALTA con resumen que incluye el estado 'antes' (null) y 'despues' (nuevo estado)
-            nuevo_estado = {
-                'nombre': producto.nombre,
-                'codigo': producto.codigo_producto,
-                'categoria': {'id': categoria.id_categoria, 'nombre': categoria.nombre} if categoria else None,
-                'precio': producto.precio,
-                'cantidad': cantidad,
-            }
-            MovimientoInventario.objects.create(
+            transaction.on_commit(catalogo.invalidar)
+            auditoria.registrar_movimiento(
                 producto=producto,
-                usuario_id=(mov_usuario.id_usuario if mov_usuario else None),
+                # require_session ya comprobó que el usuario de la sesión existe
+                usuario_id=request.session.get('conectado_usuario'),
                 cantidad=cantidad,
                 tipo='ALTA',
-                resumen_operacion=(f"Alta: Nombre {producto.nombre}, Código {producto.codigo_producto}, "
-                                   f"Categoría {categoria.nombre if categoria else '(ninguna)'}, "
-                                   f"Precio {producto.precio}, Cantidad {cantidad}"),
+                categoria=categoria,
+                cambios=estado_producto(producto, categoria, cantidad, 'despues'),
                 producto_nombre=producto.nombre,
                 producto_codigo=producto.codigo_producto,
             )
@@ -290,16 +286,19 @@ def agregar_producto(request):
             return JsonResponse({'error': msg, 'details': errores}, status=400)
         messages.error(request, msg)
         return redirect('producto-list')
-    except IntegrityError:
-        # Posible condición de carrera: si otro request creó el mismo código/nombre
-        if Producto.objects.filter(codigo_producto=codigo).exists():
-            msg = f'El código {codigo} ya existe.'
-            if wants_json:
-                return JsonResponse({'error': msg}, status=409)
-            messages.error(request, msg)
-            return redirect('producto-list')
-        if Producto.objects.filter(nombre__iexact=nombre).exists():
-            msg = f'Ya existe un producto con el nombre "{nombre}".'
+    except IntegrityError as e:
+        # Código o nombre duplicado (también si otro request lo creó a la vez)
+        msg = _mensaje_duplicado(e, codigo=codigo, nombre=nombre)
+        if msg:
+            # Los archivados conservan código y nombre: indicar cómo recuperarlo
+            archivado = _archivado_con(codigo, nombre)
+            if archivado is not None:
+                msg = (f'El producto "{archivado.nombre}" ({archivado.codigo_producto}) está archivado; '
+                       f'puede restaurarlo desde Productos archivados.')
+                if wants_json:
+                    return JsonResponse({'error': msg, 'archivado': archivado.id_producto,
+                                         'restaurar_url': reverse('producto-restaurar', args=[archivado.id_producto])},
+                                        status=409)
             if wants_json:
                 return JsonResponse({'error': msg}, status=409)
             messages.error(request, msg)
@@ -313,16 +312,7 @@ def agregar_producto(request):
     # Éxito: responder 201 para API o redirect con mensaje para HTML
     success_msg = f'Producto "{producto.nombre}" creado correctamente.'
     if wants_json:
-        data = {
-            'id': producto.id_producto,
-            'codigo_producto': producto.codigo_producto,
-            'nombre': producto.nombre,
-            'descripcion': producto.descripcion,
-            'categoria': producto.categoria.id_categoria,
-            'precio': producto.precio,
-            'cantidad': producto.cantidad,
-        }
-        return JsonResponse(data, status=201)
+        return FastJsonResponse(serializers.PRODUCTO.one(producto), status=201)
     messages.success(request, success_msg)
     return redirect('producto-list')
 
@@ -338,7 +328,7 @@ def next_codigo(request, letter):
 
     # Contar productos cuyo codigo comienza con la letra (A-Z)
     # Los códigos tienen formato LNNN (ej: M001)
-    existentes = Producto.objects.filter(codigo_producto__startswith=letter).values_list('codigo_producto', flat=True)
+    existentes = Producto.objects.con_prefijo_codigo(letter).values_list('codigo_producto', flat=True)
     max_seq = 0
     for c in existentes:
         try:
@@ -351,38 +341,71 @@ def next_codigo(request, letter):
     siguiente = max_seq + 1
     siguiente_str = str(siguiente).zfill(3)
     next_code = f"{letter}{siguiente_str}"
-    return JsonResponse({'next_code': next_code, 'next_seq': siguiente_str})
+    return FastJsonResponse({'next_code': next_code, 'next_seq': siguiente_str})
 
 
 def obtener_producto_json(request, producto_id):
     """Devuelve los datos del producto en JSON para rellenar el modal de edición."""
-    try:
-        producto = Producto.objects.select_related('categoria').get(id_producto=producto_id)
-    except Producto.DoesNotExist:
+    data = serializers.PRODUCTO.first(Producto.objects.activos().filter(id_producto=producto_id))
+    if data is None:
         return JsonResponse({'error': 'Producto no encontrado'}, status=404)
 
     # Incluir lista de categorías para que el cliente pueda rellenar el <select>
-    categorias_qs = Categoria.objects.all().order_by('nombre')
-    categorias_list = [{'id': c.id_categoria, 'nombre': c.nombre} for c in categorias_qs]
-
-    data = {
-        'id': producto.id_producto,
-        'codigo_producto': producto.codigo_producto,
-        'nombre': producto.nombre,
-        'descripcion': producto.descripcion,
-        'categoria': producto.categoria.id_categoria if producto.categoria else None,
-        'precio': producto.precio,
-        'cantidad': producto.cantidad,
-        'categorias': categorias_list,
-    }
-    return JsonResponse(data)
+    data['categorias'] = serializers.categorias_ordenadas()
+    return FastJsonResponse(data)
+
+
+def sugerencias_productos(request):
+    """Búsqueda mientras se escribe: JSON compacto con los primeros productos que empiezan por `q`.
+
+    Devuelve `{'seq', 'q', 'resultados': [{'id', 'codigo', 'nombre'}]}`. `seq`
+    (opcional) se devuelve tal cual para que el cliente descarte respuestas
+    de consultas anteriores que lleguen tarde (gana la última).
+    """
+    try:
+        seq = int(request.GET.get('seq'))
+    except (TypeError, ValueError):
+        seq = None
+    q = request.GET.get('q', '')
+    return FastJsonResponse({'seq': seq, 'q': catalogo.normalizar(q), 'resultados': catalogo.sugerencias(q)})
 
 
 def categorias_json(request):
     """Devuelve la lista de categorías en JSON (id, nombre)."""
-    qs = Categoria.objects.all().order_by('nombre')
-    data = [{'id': c.id_categoria, 'nombre': c.nombre} for c in qs]
-    return JsonResponse({'categorias': data})
+    return FastJsonResponse({'categorias': serializers.categorias_ordenadas()})
+
+
+def _fecha_param(valor):
+    """Inicio del día `AAAA-MM-DD` (zona actual), None si no se indica; ValueError si es inválida."""
+    if not valor:
+        return None
+    fecha = parse_date(valor)
+    if fecha is None:
+        raise ValueError(valor)
+    return timezone.make_aware(datetime.combine(fecha, datetime.min.time()))
+
+
+@require_session
+def movimientos_json(request):
+    """Historial de movimientos en JSON, del más reciente al más antiguo.
+
+    Filtros: `desde` y `hasta` (AAAA-MM-DD, `hasta` excluido), `codigo`, `tipo`
+    y `limite` (como mucho MOVIMIENTOS_HISTORIAL_LIMITE). Si el rango llega a
+    fechas archivadas, incluye los movimientos archivados (`core.archivado`).
+    """
+    try:
+        desde = _fecha_param(request.GET.get('desde'))
+        hasta = _fecha_param(request.GET.get('hasta'))
+        limite = int(request.GET.get('limite') or 0)
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos'}, status=400)
+    maximo = getattr(settings, 'MOVIMIENTOS_HISTORIAL_LIMITE', 200)
+    limite = min(limite, maximo) if limite > 0 else maximo
+    movimientos = historial(desde=desde, hasta=hasta, producto_codigo=request.GET.get('codigo') or None,
+                            tipo=request.GET.get('tipo') or None, limite=limite)
+    return FastJsonResponse({'movimientos': [
+        dict(serializers.MOVIMIENTO.one(mov), resumen=mov.resumen, archivado=mov.archivado) for mov in movimientos
+    ]})
 
 
 @require_session
@@ -394,7 +417,7 @@ def eliminar_producto(request, producto_id):
     if request.method != 'POST':
         return redirect('producto-list')
 
-    producto = get_object_or_404(Producto, id_producto=producto_id)
+    producto = get_object_or_404(Producto.objects.activos(), id_producto=producto_id)
     nombre = producto.nombre
 
     # Antes de eliminar, registrar en MovimientoInventario un movimiento de tipo BAJA
@@ -409,19 +432,18 @@ def eliminar_producto(request, producto_id):
         with transaction.atomic():
             # Registrar movimiento de BAJA (guardar también nombre y código para auditoría)
             mov_usuario = _get_session_usuario(request)
-            MovimientoInventario.objects.create(
+            auditoria.registrar_movimiento(
                 producto=producto,
                 usuario_id=(mov_usuario.id_usuario if mov_usuario else None),
                 cantidad=baja_cantidad,
                 tipo='BAJA',
-                resumen_operacion=(f"Baja: Nombre {producto.nombre}, Código {producto.codigo_producto}, "
-                                   f"Categoría {producto.categoria.nombre if producto.categoria else '(ninguna)'}, "
-                                   f"Precio {producto.precio}, Cantidad {baja_cantidad}"),
+                categoria=producto.categoria,
+                cambios=estado_producto(producto, producto.categoria, baja_cantidad, 'antes'),
                 producto_nombre=producto.nombre,
                 producto_codigo=producto.codigo_producto,
             )
-            # Borrar el producto (esto también eliminará Stock y relaciones por cascade)
-            producto.delete()
+            # Archivar el producto (borrado lógico) o borrarlo con su Stock en cascada
+            _eliminar([producto.id_producto])
     except Exception:
         messages.error(request, f'No se pudo eliminar el producto "{nombre}".')
         return redirect('producto-list')
@@ -430,6 +452,164 @@ def eliminar_producto(request, producto_id):
     return redirect('producto-list')
 
 
+def _eliminar(ids):
+    """Archiva los productos `ids` (PRODUCTOS_BORRADO_LOGICO) o los borra con su Stock."""
+    productos = Producto.objects.filter(id_producto__in=ids)
+    if getattr(settings, 'PRODUCTOS_BORRADO_LOGICO', True):
+        productos.archivar()
+    else:
+        productos.delete()
+    transaction.on_commit(catalogo.invalidar)
+
+
+def _cantidad_stock(producto):
+    """Cantidad para BAJA/REST: la de Stock si existe, si no la del producto."""
+    try:
+        return int(producto.stock.cantidad or 0)
+    except Stock.DoesNotExist:
+        return int(producto.cantidad or 0)
+
+
+def _dar_de_baja(productos, usuario_id=None, batch_size=None):
+    """Elimina los productos de `productos` (queryset) en lotes con sus movimientos BAJA.
+
+    Cada lote es una transacción corta: un SELECT con categoría y stock, un
+    `bulk_create` de los BAJA y el UPDATE de archivado (o el DELETE).
+    Devuelve el número de productos eliminados.
+    """
+    batch_size = batch_size or getattr(settings, 'PRODUCTOS_BAJA_LOTE', 200)
+    qs = productos.select_related('categoria', 'stock').order_by('id_producto')
+    eliminados = 0
+    ultimo_id = 0
+    while True:
+        with transaction.atomic():
+            lote = list(qs.filter(id_producto__gt=ultimo_id)[:batch_size])
+            if not lote:
+                break
+            ultimo_id = lote[-1].id_producto
+            movimientos = []
+            for producto in lote:
+                cantidad = _cantidad_stock(producto)
+                movimientos.append({
+                    'producto': producto,
+                    'usuario_id': usuario_id,
+                    'cantidad': cantidad,
+                    'tipo': 'BAJA',
+                    'categoria': producto.categoria,
+                    'cambios': estado_producto(producto, producto.categoria, cantidad, 'antes'),
+                    'producto_nombre': producto.nombre,
+                    'producto_codigo': producto.codigo_producto,
+                })
+            auditoria.registrar_movimientos(movimientos)
+            _eliminar([p.id_producto for p in lote])
+        eliminados += len(lote)
+    return eliminados
+
+
+@require_session
+def eliminar_productos(request):
+    """Elimina varios productos en lote, por lista de ids o por categoría.
+
+    Acepta POST con `ids` (lista, o separados por comas) o `categoria`, como
+    form-data o JSON. Registra un movimiento BAJA por producto. Responde JSON
+    `{'eliminados': n}` si la petición lo espera; si no, redirige con un mensaje.
+    """
+    if request.method != 'POST':
+        return redirect('producto-list')
+
+    wants_json = request.headers.get('x-requested-with') == 'XMLHttpRequest' or \
+        'application/json' in request.headers.get('accept', '')
+
+    if request.content_type == 'application/json':
+        try:
+            payload = json.loads(request.body.decode('utf-8') or '{}')
+        except Exception:
+            payload = {}
+        ids_raw = payload.get('ids') or []
+        categoria_id = payload.get('categoria')
+    else:
+        ids_raw = request.POST.getlist('ids')
+        categoria_id = request.POST.get('categoria')
+    if isinstance(ids_raw, str):
+        ids_raw = [ids_raw]
+
+    msg = None
+    try:
+        ids = [int(v) for valor in ids_raw for v in str(valor).split(',') if v.strip()]
+        categoria_id = int(categoria_id) if categoria_id not in (None, '') else None
+    except (TypeError, ValueError):
+        msg = 'Ids de producto o categoría inválidos.'
+    else:
+        if not ids and categoria_id is None:
+            msg = 'Indique los productos (ids) o la categoría a eliminar.'
+    if msg:
+        if wants_json:
+            return JsonResponse({'error': msg}, status=400)
+        messages.error(request, msg)
+        return redirect('producto-list')
+
+    productos = Producto.objects.activos()
+    if ids:
+        productos = productos.filter(id_producto__in=ids)
+    if categoria_id is not None:
+        productos = productos.filter(categoria_id=categoria_id)
+
+    try:
+        eliminados = _dar_de_baja(productos, usuario_id=request.session.get('conectado_usuario'))
+    except Exception:
+        # Los lotes ya confirmados quedan eliminados (con su BAJA); el resto no se toca
+        msg = 'No se pudieron eliminar los productos.'
+        if wants_json:
+            return JsonResponse({'error': msg}, status=500)
+        messages.error(request, msg)
+        return redirect('producto-list')
+
+    if wants_json:
+        return FastJsonResponse({'eliminados': eliminados})
+    messages.success(request, f'{eliminados} productos eliminados y movimientos BAJA registrados.')
+    return redirect('producto-list')
+
+
+@require_session
+def restaurar_producto(request, producto_id):
+    """Restaura un producto archivado (borrado lógico) identificado por `producto_id`.
+
+    Acepta sólo POST. Registra un movimiento REST con el estado restaurado
+    (cantidad desde Stock). Responde JSON si la petición lo espera; si no,
+    redirige a la lista con un mensaje.
+    """
+    if request.method != 'POST':
+        return redirect('producto-list')
+
+    wants_json = request.headers.get('x-requested-with') == 'XMLHttpRequest' or \
+        'application/json' in request.headers.get('accept', '')
+    # Sin `archivado_en`: reclamado por la purga (core.purga), ya no se restaura
+    archivado = Producto.objects.filter(id_producto=producto_id, archivado=True, archivado_en__isnull=False)
+    producto = get_object_or_404(archivado.select_related('categoria', 'stock'))
+    cantidad = _cantidad_stock(producto)
+    with transaction.atomic():
+        # El UPDATE condicionado evita restaurar dos veces en peticiones concurrentes
+        # o restaurar un producto que la purga acaba de reclamar
+        if not archivado.update(
+                archivado=False, archivado_en=None):
+            raise Http404('Producto no archivado')
+        transaction.on_commit(catalogo.invalidar)
+        auditoria.registrar_movimiento(
+            producto=producto,
+            usuario_id=request.session.get('conectado_usuario'),
+            cantidad=cantidad,
+            tipo='REST',
+            categoria=producto.categoria,
+            cambios=estado_producto(producto, producto.categoria, cantidad, 'despues'),
+            producto_nombre=producto.nombre,
+            producto_codigo=producto.codigo_producto,
+        )
+
+    if wants_json:
+        return FastJsonResponse(serializers.PRODUCTO.one(producto))
+    messages.success(request, f'Producto "{producto.nombre}" restaurado y movimiento REST registrado.')
+    return redirect('producto-list')
+
 @require_session
 def actualizar_producto(request, producto_id):
     """Actualiza un producto a partir de POST (desde modal de edición).
@@ -464,7 +644,7 @@ def actualizar_producto(request, producto_id):
         precio_raw = request.POST.get('precio')
         cantidad_raw = request.POST.get('cantidad')
 
-    producto = get_object_or_404(Producto, id_producto=producto_id)
+    producto = get_object_or_404(Producto.objects.activos(), id_producto=producto_id)
 
     # Validaciones básicas
     def _is_missing(v):
@@ -529,7 +709,7 @@ def actualizar_producto(request, producto_id):
         return redirect('producto-list')
 
     # Detección de duplicados: nombre (otro producto con mismo nombre)
-    if Producto.objects.filter(nombre__iexact=nombre).exclude(id_producto=producto.id_producto).exists():
+    if Producto.objects.con_nombre(nombre).exclude(id_producto=producto.id_producto).exists():
         msg = f'Ya existe otro producto con el nombre "{nombre}".'
         if wants_json:
             return JsonResponse({'error': msg}, status=409)
@@ -538,7 +718,8 @@ def actualizar_producto(request, producto_id):
 
     # Guardar cambios y gestionar stock/movimientos en transacción
     try:
-        with transaction.atomic():
+        with tracing.span('transaccion'), transaction.atomic():
+            transaction.on_commit(catalogo.invalidar)
             # Registrar valores previos
             try:
                 stock = Stock.objects.get(producto=producto)
@@ -562,7 +743,8 @@ def actualizar_producto(request, producto_id):
             producto.precio = precio
             producto.cantidad = cantidad
 
-            producto.full_clean()
+            with tracing.span('full_clean'):
+                producto.full_clean()
             producto.save()
 
             # Actualizar / crear stock
@@ -606,13 +788,13 @@ def actualizar_producto(request, producto_id):
                                 cambios[k if k != 'categoria_id' else 'categoria'] = {'antes': antes.get(k), 'despues': despues.get(k)}
 
                     if cambios:
-                        texto = _format_cambios_readable(cambios)
-                        MovimientoInventario.objects.create(
+                        auditoria.registrar_movimiento(
                             producto=producto,
                             usuario_id=(mov_usuario.id_usuario if mov_usuario else None),
                             cantidad=abs(cantidad),
                             tipo='MODI',
-                            resumen_operacion=texto,
+                            categoria=categoria,
+                            cambios=cambios,
                             producto_nombre=producto.nombre,
                             producto_codigo=producto.codigo_producto,
                         )
@@ -663,13 +845,13 @@ def actualizar_producto(request, producto_id):
                                 cambios[k if k != 'categoria_id' else 'categoria'] = {'antes': antes.get(k), 'despues': despues.get(k)}
 
                     if cambios:
-                        texto = _format_cambios_readable(cambios)
-                        MovimientoInventario.objects.create(
+                        auditoria.registrar_movimiento(
                             producto=producto,
                             usuario_id=(mov_usuario.id_usuario if mov_usuario else None),
                             cantidad=abs(diff),
                             tipo='MODI',
-                            resumen_operacion=texto,
+                            categoria=categoria,
+                            cambios=cambios,
                             producto_nombre=producto.nombre,
                             producto_codigo=producto.codigo_producto,
                         )
@@ -728,13 +910,13 @@ def actualizar_producto(request, producto_id):
                             cambios[k if k != 'categoria_id' else 'categoria'] = {'antes': antes.get(k), 'despues': despues.get(k)}
 
                 if cambios:
-                    texto = _format_cambios_readable(cambios)
-                    MovimientoInventario.objects.create(
+                    auditoria.registrar_movimiento(
                         producto=producto,
                         usuario_id=(mov_usuario.id_usuario if mov_usuario else None),
                         cantidad=0,
                         tipo='MODI',
-                        resumen_operacion=texto,
+                        categoria=categoria,
+                        cambios=cambios,
                         producto_nombre=producto.nombre,
                         producto_codigo=producto.codigo_producto,
                     )
@@ -762,4 +944,32 @@ def actualizar_producto(request, producto_id):
     if wants_json:
         return JsonResponse({'id': producto.id_producto, 'nombre': producto.nombre}, status=200)
     messages.success(request, success_msg)
-    return redirect('producto-list')
\ No newline at end of file
+    return redirect('producto-list')
+
+def debug_traces(request):
+    """Trazas recientes del buffer circular (sólo con DEBUG).
+
+    - Sin parámetros: resumen de las trazas guardadas (más recientes primero).
+    - `?request_id=<id>`: detalle de una traza con todos sus spans.
+    - `?format=chrome`: Chrome trace-event JSON (de una traza o de todas) para
+      abrir en chrome://tracing, Perfetto o speedscope.
+    """
+    if not settings.DEBUG:
+        raise Http404('No disponible')
+
+    request_id = request.GET.get('request_id')
+    if request_id:
+        trace = tracing.find_trace(request_id)
+        if trace is None:
+            return JsonResponse({'error': 'Traza no encontrada'}, status=404)
+        traces = [trace]
+    else:
+        traces = tracing.recent_traces()
+
+    if request.GET.get('format') == 'chrome':
+        response = JsonResponse(tracing.chrome_trace(traces))
+        response['Content-Disposition'] = 'attachment; filename="traces.json"'
+        return response
+    if request_id:
+        return JsonResponse(traces[0].to_dict())
+    return JsonResponse({'traces': [t.summary() for t in reversed(traces)]})
@@ -1,26 +1,37 @@
 from core.models import Usuario
 
+
+_ANONIMO = {
+    'session_user_is_authenticated': False,
+    'session_usuario_id': None,
+    'session_usuario_nombre': None,
+    'session_usuario_username': None,
+    'session_usuario_email': None,
+}
+
+
 def session_data(request):
     """
     Context processor to add user session data to templates.
+
+    Una sola consulta por render, proyectada a las columnas que se exponen: a
+    la vez comprueba que el Usuario de la sesión sigue existiendo (todos los
+    templates leen `session_user_is_authenticated`). Si ya no existe se limpia
+    la sesión y se trata como anónimo, igual que en `require_session`.
     """
     conectado_usuario = request.session.get('conectado_usuario', None)
-    if conectado_usuario:
-        try:
-            usuario = Usuario.objects.get(id_usuario=conectado_usuario)
-            return {
-                'session_user_is_authenticated': True,
-                'session_usuario_id': usuario.id_usuario,
-                'session_usuario_nombre': usuario.nombres,
-                'session_usuario_username': usuario.usuario,
-                'session_usuario_email': usuario.email,
-            }
-        except Usuario.DoesNotExist:
-            request.session.flush()
+    if not conectado_usuario:
+        return dict(_ANONIMO)
+
+    fila = Usuario.objects.filter(id_usuario=conectado_usuario).values_list('nombres', 'usuario', 'email').first()
+    if fila is None:
+        request.session.flush()
+        return dict(_ANONIMO)
+    nombres, usuario, email = fila
     return {
-        'session_user_is_authenticated': False,
-        'session_usuario_id': None,
-        'session_usuario_nombre': None,
-        'session_usuario_username': None,
-        'session_usuario_email': None,
-    }
\ No newline at end of file
+        'session_user_is_authenticated': True,
+        'session_usuario_id': conectado_usuario,
+        'session_usuario_nombre': nombres,
+        'session_usuario_username': usuario,
+        'session_usuario_email': email,
+    }
@@ -150,14 +150,18 @@ document.addEventListener('DOMContentLoaded', function () {
 				var modPrecio = document.getElementById('mod_precio');
 				var modCantidad = document.getElementById('mod_cantidad');
 				var modForm = document.getElementById('formModificarProducto');
+				var modError = document.getElementById('mod_error');
+				var modGuardar = document.getElementById('mod_guardar');
 
 				// Ajustar action del form para enviar al endpoint de actualización
 				if (modForm) {
 					modForm.action = '/core/producto/update/' + encodeURIComponent(id) + '/';
 					modForm.classList.remove('was-validated');
 				}
+				if (modError) modError.classList.add('d-none');
+				if (modGuardar) modGuardar.disabled = false;
 
-				// Intentar obtener datos reales desde el servidor (mejor que depender de data-attrs)
+				// Los datos (incluida la descripción completa) se obtienen del servidor
 				if (id) {
 					fetch('/core/producto/json/' + encodeURIComponent(id) + '/')
 						.then(function (resp) {
@@ -192,19 +196,11 @@ document.addEventListener('DOMContentLoaded', function () {
 							if (modCantidad) modCantidad.value = data.cantidad != null ? data.cantidad : '';
 						})
 						.catch(function () {
-							// Fallback: usar data-attrs si la petición falla
-							var codigo = btn.getAttribute('data-codigo') || '';
-							var nombreVal = btn.getAttribute('data-nombre') || '';
-							var descripcionVal = btn.getAttribute('data-descripcion') || '';
-							var categoriaVal = btn.getAttribute('data-categoria') || '';
-							var precioVal = btn.getAttribute('data-precio') || '';
-							var cantidadVal = btn.getAttribute('data-cantidad') || '';
-							if (modCodigo) modCodigo.value = codigo;
-							if (modNombre) modNombre.value = nombreVal;
-							if (modDescripcion) modDescripcion.value = descripcionVal;
-							if (modCategoria) modCategoria.value = categoriaVal;
-							if (modPrecio) modPrecio.value = precioVal;
-							if (modCantidad) modCantidad.value = cantidadVal;
+							// Sin datos del servidor no se puede editar: el listado no trae la
+							// descripción completa y guardar vaciaría o truncaría la existente
+							if (modForm) modForm.reset();
+							if (modError) modError.classList.remove('d-none');
+							if (modGuardar) modGuardar.disabled = true;
 						})
 						.finally(function () {
 							// permitir nuevo llenado
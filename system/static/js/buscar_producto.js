@@ -1,5 +1,8 @@
 // Listener that submits the search form only when Enter is pressed in the input.
-// The form already uses GET, so no live filtering occurs while typing.
+// The form already uses GET, so the full listing is only re-rendered on submit.
+// While typing, suggestions come from the compact JSON endpoint
+// (/core/producto/sugerencias/): debounced, previous request aborted, and each
+// response tagged with `seq` so only the latest one is shown (latest wins).
 document.addEventListener('DOMContentLoaded', function () {
     var input = document.getElementById('buscarProductoInput');
     var form = document.getElementById('buscarProductoForm');
@@ -33,4 +36,77 @@ document.addEventListener('DOMContentLoaded', function () {
             }
         });
     }
-});
\ No newline at end of file
+
+    // --- Typeahead suggestions ---
+    var menu = document.getElementById('buscarSugerencias');
+    var url = input.getAttribute('data-sugerencias-url');
+    if (!menu || !url || !window.fetch) return;
+
+    var DEBOUNCE_MS = 150;
+    var timer = null;
+    var seq = 0;
+    var controller = null;
+
+    function hide() {
+        menu.classList.remove('show');
+        menu.innerHTML = '';
+    }
+
+    function render(resultados) {
+        menu.innerHTML = '';
+        if (!resultados.length) {
+            hide();
+            return;
+        }
+        resultados.forEach(function (r) {
+            var item = document.createElement('button');
+            item.type = 'button';
+            item.className = 'dropdown-item';
+            item.setAttribute('role', 'option');
+            // textContent: product names are user data, never inject them as HTML
+            item.textContent = r.codigo + ' - ' + r.nombre;
+            item.addEventListener('mousedown', function (ev) {
+                // mousedown (not click) so it runs before the input's blur hides the menu
+                ev.preventDefault();
+                input.value = r.codigo;
+                hide();
+                form.submit();
+            });
+            menu.appendChild(item);
+        });
+        menu.classList.add('show');
+    }
+
+    function buscar() {
+        var q = input.value.trim();
+        var actual = ++seq;
+        if (controller) controller.abort();
+        if (!q) {
+            hide();
+            return;
+        }
+        controller = window.AbortController ? new AbortController() : null;
+        var params = new URLSearchParams({ q: q, seq: String(actual) });
+        fetch(url + '?' + params.toString(), {
+            headers: { 'Accept': 'application/json' },
+            signal: controller ? controller.signal : undefined
+        }).then(function (resp) {
+            return resp.ok ? resp.json() : null;
+        }).then(function (data) {
+            // Ignore late responses from earlier keystrokes
+            if (!data || data.seq !== seq) return;
+            render(data.resultados || []);
+        }).catch(function () {
+            // Aborted or network error: the next keystroke retries
+        });
+    }
+
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        timer = setTimeout(buscar, DEBOUNCE_MS);
+    });
+    input.addEventListener('blur', hide);
+    input.addEventListener('keydown', function (ev) {
+        if (ev.key === 'Escape') hide();
+    });
+});
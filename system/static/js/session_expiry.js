@@ -46,4 +46,49 @@
             });
         };
     }
+
+    // Heartbeat: consultar los segundos restantes de sesión sin renovarla.
+    // El endpoint responde 401 cuando la sesión ya expiró (el parche de fetch
+    // anterior redirige al login). Se consulta con más frecuencia al acercarse
+    // la expiración y se pausa mientras la pestaña está oculta. Sólo corre si
+    // la página se renderizó con sesión (`data-autenticado` en <body>): un
+    // visitante anónimo recibiría 401 y un aviso falso de sesión expirada.
+    var HEARTBEAT_URL = '/usuarios/sesion/';
+    var MAX_INTERVAL_MS = 30000;
+    var MIN_INTERVAL_MS = 5000;
+    var autenticado = document.body && document.body.getAttribute('data-autenticado') === 'true';
+    if (!autenticado || !window.fetch) {
+        return;
+    }
+
+    var timer = null;
+    function schedule(ms) {
+        if (timer) { clearTimeout(timer); }
+        timer = setTimeout(heartbeat, ms);
+    }
+
+    function heartbeat() {
+        if (document.hidden) {
+            return; // se reanuda en visibilitychange
+        }
+        window.fetch(HEARTBEAT_URL, { credentials: 'same-origin', headers: { 'Accept': 'application/json' } })
+            .then(function (resp) { return resp.json(); })
+            .then(function (data) {
+                if (!data || !data.autenticado) {
+                    return;
+                }
+                var remainingMs = data.segundos_restantes * 1000;
+                if (remainingMs <= 0) {
+                    window.location.href = '/?expired=1';
+                    return;
+                }
+                schedule(Math.max(MIN_INTERVAL_MS, Math.min(MAX_INTERVAL_MS, remainingMs / 2)));
+            })
+            .catch(function () { schedule(MAX_INTERVAL_MS); });
+    }
+
+    document.addEventListener('visibilitychange', function () {
+        if (!document.hidden) { schedule(0); }
+    });
+    schedule(MAX_INTERVAL_MS);
 })();
@@ -1,5 +1,5 @@
 from django.urls import path, include
-from .views import index, main, usuarios_login, usuarios_logout
+from .views import index, main, usuarios_login, usuarios_logout, sesion_estado
 
 urlpatterns = [
     path('', index, name='home'),
@@ -7,4 +7,5 @@ urlpatterns = [
     path('main', main, name='main'),
     path('usuarios/login/', usuarios_login, name='usuarios-login'),
     path('usuarios/logout/', usuarios_logout, name='usuarios-logout'),
+    path('usuarios/sesion/', sesion_estado, name='usuarios-sesion'),
 ]
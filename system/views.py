@@ -1,9 +1,14 @@
+from django.conf import settings
 from django.shortcuts import render, redirect
 from django.http import JsonResponse
+from django.views.decorators.http import require_GET
 import json
+import time
 
-from core.models import Usuario, Producto, Categoria
-from django.db.models import Q
+from core.models import Usuario
+from core import catalogo, throttling
+from core.decorators import session_refresh_exempt
+from core.middleware import SESSION_REFRESH_KEY
 
 
 def index(request):
@@ -12,23 +17,8 @@ def index(request):
 
 
 def main(request):
-	"""Renderiza la página `main.html` del app `system`."""
-	# Pasar la lista de productos al template para que se muestren en /main
-	q = request.GET.get('q', '').strip()
-	productos_qs = Producto.objects.select_related('categoria').all()
-	if q:
-		productos_qs = productos_qs.filter(
-			Q(codigo_producto__icontains=q) | Q(nombre__icontains=q)
-		)
-
-	productos = list(productos_qs)
-	categorias = Categoria.objects.all()
-	context = {
-		'productos': productos,
-		'q': q,
-		'categorias': categorias,
-	}
-	return render(request, 'main.html', context)
+	"""Renderiza la página `main.html` del app `system` (mismo listado que `/core/producto/`)."""
+	return render(request, 'main.html', catalogo.contexto_listado(request))
 
 
 def usuarios_login(request):
@@ -38,6 +28,8 @@ def usuarios_login(request):
 	Espera POST con JSON: {"username": "...", "password": "..."}
 	Si las credenciales son válidas, guarda `request.session['conectado_usuario']`.
 	Devuelve JSON 200 en éxito o 400 con {'error': '...'} en fallo.
+	Con demasiados fallos recientes para el usuario o la IP responde 429 con
+	`Retry-After` sin consultar la BD ni verificar la contraseña.
 	"""
 	if request.method != 'POST':
 		return JsonResponse({'error': 'Método no permitido'}, status=405)
@@ -53,14 +45,27 @@ def usuarios_login(request):
 	if not username or not password:
 		return JsonResponse({'error': 'Usuario y contraseña requeridos'}, status=400)
 
+	# Rechazo temprano (sólo cache, sin query ni hash) si el usuario o la IP
+	# acumulan demasiados fallos en la ventana deslizante
+	ip = throttling.client_ip(request)
+	allowed, retry_after = throttling.check_login_allowed(username, ip)
+	if not allowed:
+		response = JsonResponse({'error': 'Demasiados intentos fallidos. Intente nuevamente más tarde.'}, status=429)
+		response['Retry-After'] = str(retry_after)
+		return response
+
 	try:
 		usuario = Usuario.objects.get(usuario=username)
 	except Usuario.DoesNotExist:
+		throttling.register_login_failure(username, ip)
 		return JsonResponse({'error': 'Credenciales inválidas'}, status=401)
 
 	if not usuario.check_password(password):
+		throttling.register_login_failure(username, ip)
 		return JsonResponse({'error': 'Credenciales inválidas'}, status=401)
 
+	throttling.reset_login_failures(username)
+
 	# Autenticado: guardar id en sesión para que el context processor lo lea
 	request.session['conectado_usuario'] = usuario.id_usuario
 	request.session.modified = True
@@ -71,4 +76,24 @@ def usuarios_login(request):
 def usuarios_logout(request):
 	"""Cerrar sesión (flush) y redirigir a index."""
 	request.session.flush()
-	return redirect('index')
\ No newline at end of file
+	return redirect('index')
+
+
+@require_GET
+@session_refresh_exempt
+def sesion_estado(request):
+	"""Heartbeat JSON con los segundos que le quedan a la sesión.
+
+	No renueva ni escribe la sesión, no renderiza templates ni consulta la
+	tabla de usuarios: sólo lee la sesión (de cache con el engine cached_db).
+	Devuelve 401 si no hay sesión activa (session_expiry.js redirige al login).
+	"""
+	if not request.session.get('conectado_usuario'):
+		response = JsonResponse({'autenticado': False, 'segundos_restantes': 0}, status=401)
+	else:
+		age = settings.SESSION_COOKIE_AGE
+		refrescada = request.session.get(SESSION_REFRESH_KEY)
+		restantes = age if refrescada is None else max(0, int(refrescada + age - time.time()))
+		response = JsonResponse({'autenticado': True, 'segundos_restantes': restantes})
+	response['Cache-Control'] = 'no-store'
+	return response